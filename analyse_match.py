@@ -0,0 +1,67 @@
+from analytics import *
+from detection_io import *
+from utils import *
+import os
+import json
+import time
+import argparse
+
+def main(player_detections_path, ball_detections_path, keypoints_path, fps=None, video_path=None, min_shots=None, output_dir="./output_media"):
+    # Frame rate of the video the detections came from
+    if fps is None:
+        fps = probe_video(video_path)["fps"] if video_path is not None else 30.0
+    with open(keypoints_path, "r") as f:
+        keypoints = json.load(f)
+
+    # Project the match into court coordinates and index its events
+    player_detections = load_detections(player_detections_path)
+    ball_detections = load_detections(ball_detections_path)
+    start_time = time.perf_counter()
+    match = analyse_match(player_detections, ball_detections, keypoints, fps)
+    index = match["index"]
+    print(f"Analysed {len(ball_detections)} frames in {(time.perf_counter() - start_time) * 1000:.1f} ms: {index.n_rallies} rallies, {len(index)} events")
+
+    tracks = match["tracks"]
+    order = tracks["frames"].argsort()[::-1] # most seen tracks (the players) first
+    print(f"{'track':>6}{'frames':>8}{'distance m':>12}{'mean m/s':>10}{'max m/s':>9}")
+    for row in order[:8]:
+        print(f"{tracks['track_id'][row]:6d}{tracks['frames'][row]:8d}{tracks['distance_m'][row]:12.1f}{tracks['mean_speed'][row]:10.2f}{tracks['max_speed'][row]:9.2f}")
+
+    if min_shots is not None:
+        start_time = time.perf_counter()
+        rallies = index.query_rallies(min_shots=min_shots)
+        print(f"Rallies with at least {min_shots} shots ({(time.perf_counter() - start_time) * 1000:.3f} ms):")
+        for rally, start, end, shots in zip(rallies["rally"], rallies["start"], rallies["end"], rallies["shots"]):
+            print(f"    rally {rally}: frames {start}-{end}, {shots} shots, {(end - start) / fps:.1f} s")
+
+    # Save the event index and the per-track summary
+    os.makedirs(output_dir, exist_ok=True)
+    name, _ = os.path.splitext(os.path.basename(os.path.normpath(ball_detections_path)))
+    index_path = os.path.join(output_dir, f"{name}_events.npz")
+    index.save(index_path)
+    with open(os.path.join(output_dir, f"{name}_tracks.json"), "w") as f:
+        json.dump({column: values.tolist() for column, values in tracks.items()}, f, indent=2)
+    print("Event index saved to:", index_path)
+
+def add_arguments(parser):
+    parser.add_argument("player_detections", type=str, help="Path to the player detections (columnar directory, JSON or pickle)")
+    parser.add_argument("ball_detections", type=str, help="Path to the raw ball detections, before interpolation")
+    parser.add_argument("--keypoints", type=str, default="./tracker_stubs/court_keypoints.json", help="JSON file of the court keypoints")
+    parser.add_argument("--fps", type=float, default=None, help="Frame rate of the video, read from --video or 30 if not given")
+    parser.add_argument("--video", type=str, default=None, help="Video the detections came from, for its frame rate")
+    parser.add_argument("--min-shots", type=int, default=None, help="List the rallies with at least this many shots")
+    parser.add_argument("--output-dir", type=str, default="./output_media", help="Directory for the event index and track summary")
+
+def run(args):
+    main(args.player_detections, args.ball_detections, args.keypoints, fps=args.fps, video_path=args.video, min_shots=args.min_shots, output_dir=args.output_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Map detections to court coordinates and build an index of rallies, shots and bounces.")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    run(args)
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    print(f"Execution time: {elapsed_time:.2f} seconds")
@@ -0,0 +1,3 @@
+from .court_projection import *
+from .trajectory_analytics import *
+from .match_events import *
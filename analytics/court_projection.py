@@ -0,0 +1,101 @@
+import numpy as np
+import sys
+sys.path.append("../")
+from constants import *
+from utils import *
+from court_detector.court_line_detection import keypoints_homography
+
+class CourtProjection():
+    def __init__(self, keypoints):
+        """
+        Maps image pixels to court metres with a homography fitted once to the court keypoints.
+
+        Court coordinates are x across from the left side wall and y along from the far back wall, as in
+        COURT_KEYPOINTS. The homography is of the floor, so foot points land where the player stands; the ball is
+        mapped to the floor point behind it along the camera ray, which is exact only when it is on the ground.
+
+        Args:
+            keypoints (list): Flat keypoint list [x0, y0, x1, y1, ...] from CourtDetector.create_keypoints.
+        """
+        if keypoints is None or len(keypoints) < 8:
+            raise ValueError("At least 4 court keypoints are needed to fit a homography")
+        self.court_to_image = keypoints_homography(keypoints)
+        if self.court_to_image is None:
+            raise ValueError("Court keypoints are degenerate, no homography could be fitted")
+        self.image_to_court = np.linalg.inv(self.court_to_image)
+
+    # Function to apply a homography to an (N,2) array of points in one matrix product, NaN rows stay NaN
+    @staticmethod
+    def transform(homography, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        projected = points @ homography[:, :2].T + homography[:, 2]
+        return projected[:, :2] / projected[:, 2:3]
+
+    def to_court(self, image_points):
+        """Project (N,2) image points to court metres."""
+        return self.transform(self.image_to_court, image_points)
+
+    def to_image(self, court_points):
+        """Project (N,2) court points in metres to image pixels."""
+        return self.transform(self.court_to_image, court_points)
+
+    def on_court(self, court_points, margin=COURT_MARGIN):
+        """Return a mask of the court points inside the walls, allowing margin metres either side."""
+        court_points = np.asarray(court_points, dtype=float).reshape(-1, 2)
+        return (
+            (court_points[:, 0] >= -margin) & (court_points[:, 0] <= COURT_WIDTH + margin) &
+            (court_points[:, 1] >= -margin) & (court_points[:, 1] <= COURT_LENGTH + margin)
+        )
+
+def project_player_positions(player_detections, projection, on_court_only=True):
+    """
+    Project the foot point of every player box of a match to court metres in one transform.
+
+    Args:
+        player_detections (ColumnarDetections): Player detections of the whole match.
+        projection (CourtProjection): Image to court mapping.
+        on_court_only (bool): Drop boxes whose foot point falls outside the court (spectators, referees).
+
+    Returns:
+        dict: Columns "frame", "track_id", "image" (N,2) and "court" (N,2), sorted by track ID then frame.
+    """
+    image_points = get_foot_positions(player_detections.boxes)
+    court_points = projection.to_court(image_points)
+    keep = projection.on_court(court_points) if on_court_only else np.ones(len(court_points), dtype=bool)
+    frame = np.asarray(player_detections.frame)[keep]
+    track_id = np.asarray(player_detections.track_id)[keep]
+    order = np.lexsort((frame, track_id)) # each track's positions contiguous and in time order
+    return {"frame": frame[order], "track_id": track_id[order], "image": image_points[keep][order], "court": court_points[keep][order]}
+
+def project_ball_positions(ball_detections, projection, max_gap=None):
+    """
+    Project the ball centre of every frame of a match to court metres, filling short gaps in the detections.
+
+    Args:
+        ball_detections (ColumnarDetections): Ball detections of the whole match, raw or interpolated.
+        projection (CourtProjection): Image to court mapping.
+        max_gap (int, optional): Longest run of missing frames filled by linear interpolation, longer gaps stay
+            NaN. None leaves every gap NaN.
+
+    Returns:
+        dict: Per frame "image" (F,2) and "court" (F,2) positions (NaN where unknown) and "detected" (F,) mask.
+    """
+    n_frames = len(ball_detections)
+    counts = np.diff(np.asarray(ball_detections.offsets))
+    detected = counts > 0
+    image_points = np.full((n_frames, 2), np.nan)
+    first_rows = np.asarray(ball_detections.offsets[:-1])[detected] # one ball per frame, the first box if several
+    boxes = np.asarray(ball_detections.boxes, dtype=float)[first_rows]
+    image_points[detected] = (boxes[:, 0:2] + boxes[:, 2:4]) / 2
+
+    if max_gap and detected.sum() >= 2:
+        frames = np.flatnonzero(detected)
+        missing = np.flatnonzero(~detected)
+        missing = missing[(missing > frames[0]) & (missing < frames[-1])]
+        next_detection = frames[np.searchsorted(frames, missing)]
+        previous_detection = frames[np.searchsorted(frames, missing) - 1]
+        fill = missing[next_detection - previous_detection - 1 <= max_gap]
+        for axis in range(2):
+            image_points[fill, axis] = np.interp(fill, frames, image_points[frames, axis])
+
+    return {"image": image_points, "court": projection.to_court(image_points), "detected": detected}
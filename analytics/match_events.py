@@ -0,0 +1,211 @@
+import numpy as np
+import sys
+sys.path.append("../")
+from .court_projection import *
+from .trajectory_analytics import *
+
+EVENT_TYPES = ("rally_start", "rally_end", "shot", "bounce", "direction_change")
+EVENT_COLUMNS = ("frame", "type", "rally", "track_id", "x", "y", "value")
+RALLY_COLUMNS = ("start", "end", "shots", "bounces", "duration_s")
+
+class MatchEventIndex():
+    def __init__(self, events, rallies, fps):
+        """
+        Frame-indexed table of match events and the rallies they belong to, held as NumPy columns.
+
+        Events are sorted by frame so frame ranges are found by binary search, and each rally row carries its
+        shot and bounce counts, so queries like "rallies with more than 8 shots" are a mask over a few hundred
+        rows rather than a pass over the detections.
+
+        Args:
+            events (dict): Columns of EVENT_COLUMNS: frame, type (index into EVENT_TYPES), rally (-1 if between
+                rallies), track_id (player credited with a shot, -1 otherwise), x and y (ball position in court
+                metres, NaN if none) and value (ball speed in m/s after a shot, turn angle of a direction change).
+            rallies (dict): Columns of RALLY_COLUMNS, one row per rally in order, end is one past the last frame.
+            fps (float): Frame rate of the video the frames refer to.
+        """
+        order = np.argsort(events["frame"], kind="stable")
+        self.events = {column: np.asarray(events[column])[order] for column in EVENT_COLUMNS}
+        self.rallies = {column: np.asarray(rallies[column]) for column in RALLY_COLUMNS}
+        self.fps = fps
+
+    def __len__(self):
+        return len(self.events["frame"]) # number of events
+
+    @property
+    def n_rallies(self):
+        return len(self.rallies["start"])
+
+    @staticmethod
+    def type_code(kind):
+        if kind not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type {kind!r}, expected one of {', '.join(EVENT_TYPES)}")
+        return EVENT_TYPES.index(kind)
+
+    def query_events(self, kind=None, start=None, end=None, rally=None, track_id=None):
+        """
+        Events matching every given filter.
+
+        Args:
+            kind (str, optional): Event type from EVENT_TYPES.
+            start (int, optional): First frame.
+            end (int, optional): Frame after the last frame.
+            rally (int, optional): Rally number.
+            track_id (int, optional): Player the event is credited to.
+
+        Returns:
+            dict: Event columns of the matching events, in frame order.
+        """
+        first = 0 if start is None else int(np.searchsorted(self.events["frame"], start, side="left"))
+        last = len(self) if end is None else int(np.searchsorted(self.events["frame"], end, side="left"))
+        events = {column: values[first:last] for column, values in self.events.items()}
+        mask = np.ones(last - first, dtype=bool)
+        if kind is not None:
+            mask &= events["type"] == self.type_code(kind)
+        if rally is not None:
+            mask &= events["rally"] == rally
+        if track_id is not None:
+            mask &= events["track_id"] == track_id
+        return {column: values[mask] for column, values in events.items()}
+
+    def query_rallies(self, min_shots=None, max_shots=None, min_duration_s=None, max_duration_s=None):
+        """
+        Rallies matching every given bound (inclusive).
+
+        Returns:
+            dict: Rally columns plus "rally" (rally number) of the matching rallies.
+        """
+        shots, duration = self.rallies["shots"], self.rallies["duration_s"]
+        mask = np.ones(self.n_rallies, dtype=bool)
+        if min_shots is not None:
+            mask &= shots >= min_shots
+        if max_shots is not None:
+            mask &= shots <= max_shots
+        if min_duration_s is not None:
+            mask &= duration >= min_duration_s
+        if max_duration_s is not None:
+            mask &= duration <= max_duration_s
+        rallies = {column: values[mask] for column, values in self.rallies.items()}
+        rallies["rally"] = np.flatnonzero(mask)
+        return rallies
+
+    def rally_at(self, frames):
+        """Rally number of each frame, -1 for frames between rallies."""
+        return find_rally_numbers(frames, self.rallies["start"], self.rallies["end"])
+
+    def to_records(self, events=None):
+        """Events (all, or a query_events result) as a list of dicts with the type as its name, for JSON."""
+        events = self.events if events is None else events
+        records = []
+        for row in zip(*(events[column].tolist() for column in EVENT_COLUMNS)):
+            record = dict(zip(EVENT_COLUMNS, row))
+            record["type"] = EVENT_TYPES[record["type"]]
+            records.append(record)
+        return records
+
+    def save(self, path):
+        """Save the event and rally columns to one .npz file."""
+        columns = {f"event_{column}": values for column, values in self.events.items()}
+        columns.update({f"rally_{column}": values for column, values in self.rallies.items()})
+        np.savez(path, fps=self.fps, **columns)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            events = {column: data[f"event_{column}"] for column in EVENT_COLUMNS}
+            rallies = {column: data[f"rally_{column}"] for column in RALLY_COLUMNS}
+            return cls(events, rallies, float(data["fps"]))
+
+# Function to look up the rally number of each frame from sorted rally starts and ends, -1 between rallies
+def find_rally_numbers(frames, starts, ends):
+    frames = np.asarray(frames)
+    if len(starts) == 0:
+        return np.full(frames.shape, -1, dtype=np.int64)
+    rally = np.searchsorted(starts, frames, side="right") - 1
+    inside = (rally >= 0) & (frames < np.asarray(ends)[np.clip(rally, 0, None)])
+    return np.where(inside, rally, -1)
+
+# Function to credit each shot to the player whose foot point is closest to the ball in the image on that frame
+def find_hitters(shot_frames, ball_image, players):
+    hitters = np.full(len(shot_frames), -1, dtype=np.int32)
+    rows = np.flatnonzero(np.isin(players["frame"], shot_frames))
+    if len(rows) == 0:
+        return hitters
+    frames = players["frame"][rows]
+    distances = np.linalg.norm(players["image"][rows] - ball_image[frames], axis=1)
+    order = np.lexsort((distances, frames)) # closest player first within each frame
+    closest_frames, first = np.unique(frames[order], return_index=True)
+    hitters[np.searchsorted(shot_frames, closest_frames)] = players["track_id"][rows][order][first]
+    return hitters
+
+def analyse_match(player_detections, ball_detections, keypoints, fps, fill_gap_s=0.2, rally_gap_s=1.0, min_rally_s=1.0, smoothing=5, lag=3, min_turn_angle=60.0):
+    """
+    Project a whole match into court coordinates and derive player movement, ball events and rallies.
+
+    Every step works on whole-match arrays: one homography transform for all foot points and ball centres,
+    then shifted-array comparisons for speeds, turns, bounces and shots.
+
+    Args:
+        player_detections (ColumnarDetections): Player detections of the match.
+        ball_detections (ColumnarDetections): Raw ball detections of the match, before interpolation, whose gaps
+            mark the breaks between rallies.
+        keypoints (list): Flat court keypoint list from CourtDetector.create_keypoints.
+        fps (float): Frame rate of the video.
+        fill_gap_s (float): Gaps in the ball detections up to this long are interpolated.
+        rally_gap_s (float): Longer gaps without the ball end a rally.
+        min_rally_s (float): Shorter runs of ball detections are not rallies.
+        smoothing (int): Frames in the moving average applied to the ball trajectory.
+        lag (int): Frames either side compared when looking for turns.
+        min_turn_angle (float): Smallest change of ball direction in the image, in degrees, recorded as an event.
+
+    Returns:
+        dict: "index" (MatchEventIndex), "players" (projected positions with "speed"), "tracks" (per-track
+            distance and speeds) and "ball" (per-frame image and court positions).
+    """
+    projection = CourtProjection(keypoints)
+    players = project_player_positions(player_detections, projection)
+    players["speed"], tracks = player_movement(players, fps)
+
+    ball = project_ball_positions(ball_detections, projection, max_gap=int(fill_gap_s * fps))
+    ball_image = smooth_trajectory(ball["image"], smoothing)
+    ball_court = smooth_trajectory(ball["court"], smoothing)
+    ball_speed = np.linalg.norm(ball_velocity(ball_court, fps, lag), axis=1)
+
+    starts, ends = find_rallies(ball["detected"], fps, max_gap_s=rally_gap_s, min_duration_s=min_rally_s)
+
+    # Ball events only count inside rallies
+    shots = find_shot_candidates(ball_court, lag)
+    shots = shots[find_rally_numbers(shots, starts, ends) >= 0]
+    bounces = find_bounce_candidates(ball_image, ball_court, lag)
+    bounces = bounces[find_rally_numbers(bounces, starts, ends) >= 0]
+    turns, angles = find_direction_changes(ball_image, lag, min_angle=min_turn_angle)
+    in_rally = find_rally_numbers(turns, starts, ends) >= 0
+    turns, angles = turns[in_rally], angles[in_rally]
+
+    n_frames = len(ball_court)
+    after_shot = np.clip(shots + lag, 0, n_frames - 1) # speed once the ball has left the racket
+    frames = np.concatenate([starts, ends - 1, shots, bounces, turns])
+    types = np.concatenate([np.full(len(starts), EVENT_TYPES.index("rally_start")), np.full(len(ends), EVENT_TYPES.index("rally_end")),
+                            np.full(len(shots), EVENT_TYPES.index("shot")), np.full(len(bounces), EVENT_TYPES.index("bounce")),
+                            np.full(len(turns), EVENT_TYPES.index("direction_change"))])
+    track_id = np.concatenate([np.full(2 * len(starts), -1, dtype=np.int32), find_hitters(shots, ball["image"], players), np.full(len(bounces) + len(turns), -1, dtype=np.int32)])
+    value = np.concatenate([np.full(2 * len(starts), np.nan), ball_speed[after_shot], np.full(len(bounces), np.nan), angles])
+    positions = ball_court[frames]
+
+    events = {
+        "frame": frames.astype(np.int64),
+        "type": types.astype(np.int8),
+        "rally": find_rally_numbers(frames, starts, ends).astype(np.int32),
+        "track_id": track_id.astype(np.int32),
+        "x": positions[:, 0].astype(np.float32),
+        "y": positions[:, 1].astype(np.float32),
+        "value": value.astype(np.float32),
+    }
+    rallies = {
+        "start": starts,
+        "end": ends,
+        "shots": np.bincount(find_rally_numbers(shots, starts, ends), minlength=len(starts)).astype(np.int32),
+        "bounces": np.bincount(find_rally_numbers(bounces, starts, ends), minlength=len(starts)).astype(np.int32),
+        "duration_s": (ends - starts) / fps,
+    }
+    return {"index": MatchEventIndex(events, rallies, fps), "players": players, "tracks": tracks, "ball": {"image": ball["image"], "court": ball_court, "detected": ball["detected"]}}
@@ -0,0 +1,207 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import sys
+sys.path.append("../")
+from constants import *
+
+# Function to smooth an (F,2) trajectory with a centred moving average that ignores NaN positions
+def smooth_trajectory(points, window=5):
+    points = np.asarray(points, dtype=float)
+    if window <= 1:
+        return points.copy()
+    valid = ~np.isnan(points)
+    kernel = np.ones(window)
+    sums = np.stack([np.convolve(np.where(valid[:, axis], points[:, axis], 0.0), kernel, mode="same") for axis in range(points.shape[1])], axis=1)
+    counts = np.stack([np.convolve(valid[:, axis].astype(float), kernel, mode="same") for axis in range(points.shape[1])], axis=1)
+    smoothed = np.divide(sums, counts, out=np.full_like(sums, np.nan), where=counts > 0)
+    smoothed[~valid] = np.nan # only smooth known positions, gaps stay gaps
+    return smoothed
+
+# Function to mark the entries of a 1D array that are the maximum of the window centred on them
+def local_maxima(values, window):
+    padded = np.pad(np.nan_to_num(values, nan=-np.inf), window // 2, constant_values=-np.inf)
+    return values >= sliding_window_view(padded, window).max(axis=1)[:len(values)]
+
+# Function to find how many frames each of a sorted array of frames is from the nearest of another sorted array
+def frames_to_nearest(frames, others):
+    if len(others) == 0:
+        return np.full(len(frames), np.iinfo(np.int64).max)
+    right = np.clip(np.searchsorted(others, frames), 0, len(others) - 1)
+    left = np.clip(right - 1, 0, len(others) - 1)
+    return np.minimum(np.abs(frames - others[right]), np.abs(frames - others[left]))
+
+# Function to smooth positions sorted by track with a centred moving average that never mixes two tracks
+def smooth_track_positions(track_id, points, window=5):
+    points = np.asarray(points, dtype=float)
+    if window <= 1 or len(points) == 0:
+        return points.copy()
+    rows = np.arange(len(points))
+    new_track = np.r_[True, track_id[1:] != track_id[:-1]]
+    track_first = np.maximum.accumulate(np.where(new_track, rows, 0)) # first row of each row's track
+    track_last = np.minimum.accumulate(np.where(np.r_[new_track[1:], True], rows, len(points))[::-1])[::-1]
+    low = np.maximum(rows - window // 2, track_first)
+    high = np.minimum(rows + window // 2, track_last)
+    sums = np.concatenate([np.zeros((1, points.shape[1])), np.cumsum(points, axis=0)])
+    return (sums[high + 1] - sums[low]) / (high - low + 1)[:, None]
+
+def player_movement(positions, fps, max_speed=MAX_PLAYER_SPEED, max_gap=None, smoothing=5):
+    """
+    Speed of every projected player position and the distance each track covers.
+
+    Steps are only measured between consecutive positions of the same track; steps across a gap longer than
+    max_gap frames or faster than max_speed (identity switches, bad foot points) are left out.
+
+    Args:
+        positions (dict): Output of project_player_positions, sorted by track ID then frame.
+        fps (float): Frame rate of the video.
+        max_speed (float): Fastest plausible speed in m/s.
+        max_gap (int, optional): Longest gap in frames a step may span, defaults to half a second.
+        smoothing (int): Positions in the moving average applied along each track first, foot points jitter.
+
+    Returns:
+        tuple: (speed (N,) in m/s per position, NaN where no valid step ends there,
+            per-track dict of "track_id", "frames", "distance_m", "mean_speed", "max_speed" arrays)
+    """
+    max_gap = max_gap or max(1, int(fps / 2))
+    frame, track_id = positions["frame"], positions["track_id"]
+    court = smooth_track_positions(track_id, positions["court"], smoothing)
+    step_frames = np.diff(frame)
+    step_metres = np.linalg.norm(np.diff(court, axis=0), axis=1)
+    step_speed = np.divide(step_metres * fps, step_frames, out=np.full(len(step_metres), np.inf), where=step_frames > 0)
+    valid = (track_id[1:] == track_id[:-1]) & (step_frames <= max_gap) & (step_speed <= max_speed)
+
+    speed = np.full(len(frame), np.nan)
+    speed[1:][valid] = step_speed[valid]
+
+    track_ids, frames = np.unique(track_id, return_counts=True)
+    step_track = np.searchsorted(track_ids, track_id[1:])
+    distance = np.bincount(step_track[valid], weights=step_metres[valid], minlength=len(track_ids))
+    moving_time = np.bincount(step_track[valid], weights=step_frames[valid] / fps, minlength=len(track_ids))
+    max_track_speed = np.zeros(len(track_ids))
+    np.maximum.at(max_track_speed, step_track[valid], step_speed[valid])
+    tracks = {
+        "track_id": track_ids,
+        "frames": frames,
+        "distance_m": distance,
+        "mean_speed": np.divide(distance, moving_time, out=np.zeros_like(distance), where=moving_time > 0),
+        "max_speed": max_track_speed,
+    }
+    return speed, tracks
+
+def ball_velocity(points, fps, lag=1):
+    """Velocity (F,2) of a per-frame trajectory in units per second, measured over lag frames back (NaN at the start)."""
+    points = np.asarray(points, dtype=float)
+    velocity = np.full_like(points, np.nan)
+    velocity[lag:] = (points[lag:] - points[:-lag]) * fps / lag
+    return velocity
+
+def find_direction_changes(points, lag=3, min_angle=45.0, min_separation=None):
+    """
+    Frames where a trajectory turns sharply, comparing the heading over the lag frames before and after each frame.
+
+    Args:
+        points (numpy.ndarray): (F,2) positions per frame, NaN where unknown.
+        lag (int): Frames either side the headings are measured over.
+        min_angle (float): Smallest turn in degrees that counts.
+        min_separation (int, optional): Frames between two changes, the sharper one wins. Defaults to 2 * lag + 1.
+
+    Returns:
+        tuple: (frames (K,) of the turns, angles (K,) in degrees)
+    """
+    points = np.asarray(points, dtype=float)
+    n_frames = len(points)
+    angles = np.full(n_frames, np.nan)
+    if n_frames > 2 * lag:
+        before = points[lag:-lag] - points[:-2 * lag]
+        after = points[2 * lag:] - points[lag:-lag]
+        norms = np.linalg.norm(before, axis=1) * np.linalg.norm(after, axis=1)
+        cosines = np.divide((before * after).sum(axis=1), norms, out=np.full(len(norms), np.nan), where=norms > 0)
+        angles[lag:-lag] = np.degrees(np.arccos(np.clip(cosines, -1, 1)))
+
+    candidates = (angles >= min_angle) & local_maxima(angles, min_separation or 2 * lag + 1)
+    frames = np.flatnonzero(candidates)
+    return frames, angles[frames]
+
+def find_turning_points(values, lag=3, from_increasing=None, min_change=0.0):
+    """
+    Frames where a per-frame coordinate turns back: its change over the lag frames before and after has opposite signs.
+
+    Args:
+        values (numpy.ndarray): (F,) coordinate per frame, NaN where unknown.
+        lag (int): Frames either side that are compared.
+        from_increasing (bool, optional): Only peaks (True) or only troughs (False), both if None.
+        min_change (float): Smallest change either side that counts, so jitter of a still value isn't a turn.
+
+    Returns:
+        numpy.ndarray: First frame of each turn.
+    """
+    values = np.asarray(values, dtype=float)
+    changes = np.zeros(len(values), dtype=bool)
+    if len(values) > 2 * lag:
+        before = values[lag:-lag] - values[:-2 * lag]
+        after = values[2 * lag:] - values[lag:-lag]
+        flipped = (before * after < 0) & (np.abs(before) >= min_change) & (np.abs(after) >= min_change)
+        if from_increasing is not None:
+            flipped &= (before > 0) if from_increasing else (before < 0)
+        changes[lag:-lag] = flipped
+    return np.flatnonzero(changes & np.r_[True, ~changes[:-1]]) # first frame of each run of flips
+
+def find_bounce_candidates(ball_image, ball_court, lag=3, min_drop=3.0, min_travel=0.5):
+    """
+    Frames where the ball may have bounced: it stops falling in the image while still travelling the same way along the court.
+
+    Args:
+        ball_image (numpy.ndarray): (F,2) smoothed ball centres in pixels.
+        ball_court (numpy.ndarray): (F,2) smoothed ball positions in court metres.
+        lag (int): Frames either side that are compared.
+        min_drop (float): Pixels the ball must fall and rise again over lag frames.
+        min_travel (float): Metres along the court over lag frames that make a reversal a shot, see find_shot_candidates.
+
+    Returns:
+        numpy.ndarray: Frames of the candidate bounces.
+    """
+    landings = find_turning_points(ball_image[:, 1], lag, from_increasing=True, min_change=min_drop) # image y grows while the ball falls
+    turns = find_turning_points(ball_court[:, 1], lag, min_change=min_travel)
+    return landings[frames_to_nearest(landings, turns) > lag] # a reversal along the court is a shot, not a bounce
+
+def find_shot_candidates(ball_court, lag=3, min_travel=0.5, min_separation=None):
+    """
+    Frames where the ball may have been hit: its travel along the court (towards or away from the net) reverses.
+
+    Args:
+        ball_court (numpy.ndarray): (F,2) smoothed ball positions in court metres.
+        lag (int): Frames either side that are compared.
+        min_travel (float): Metres the ball must travel along the court over lag frames before and after.
+        min_separation (int, optional): Fewest frames between two shots, defaults to 2 * lag + 1.
+
+    Returns:
+        numpy.ndarray: Frames of the candidate shots.
+    """
+    frames = find_turning_points(ball_court[:, 1], lag, min_change=min_travel)
+    if len(frames) < 2:
+        return frames
+    min_separation = min_separation or 2 * lag + 1
+    keep = np.r_[True, np.diff(frames) >= min_separation]
+    return frames[keep]
+
+def find_rallies(ball_known, fps, max_gap_s=1.0, min_duration_s=1.0):
+    """
+    Split a match into rallies: runs of frames with the ball in view, broken by gaps longer than max_gap_s.
+
+    Args:
+        ball_known (numpy.ndarray): (F,) mask of frames with a ball position.
+        fps (float): Frame rate of the video.
+        max_gap_s (float): Longest time without the ball inside a rally.
+        min_duration_s (float): Shorter runs are dropped (stray detections between points).
+
+    Returns:
+        tuple: (starts (R,), ends (R,)) first and one-past-last frame of each rally.
+    """
+    frames = np.flatnonzero(ball_known)
+    if len(frames) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    breaks = np.flatnonzero(np.diff(frames) > max_gap_s * fps)
+    starts = frames[np.r_[0, breaks + 1]]
+    ends = frames[np.r_[breaks, len(frames) - 1]] + 1
+    keep = ends - starts >= min_duration_s * fps
+    return starts[keep], ends[keep]
@@ -0,0 +1,5 @@
+from .synthetic_video import *
+from .stand_in_detectors import *
+from .benchmark import *
+from .backend_comparison import *
+from .frame_transport import *
@@ -0,0 +1,97 @@
+import time
+import numpy as np
+import sys
+sys.path.append("../")
+from utils import *
+from .benchmark import summarise_latencies
+
+# Function to pull (boxes (N,4), confidences (N,), classes (N,)) out of one frame's YOLO results
+def results_to_arrays(results):
+    return (
+        results.boxes.xyxy.cpu().numpy().reshape(-1, 4),
+        results.boxes.conf.cpu().numpy().reshape(-1),
+        results.boxes.cls.cpu().numpy().reshape(-1),
+    )
+
+def compare_detections(reference, candidate, min_iou=0.5):
+    """
+    Agreement of one backend's detections with the reference backend's on the same frames.
+
+    Boxes of the same class are matched greedily by IoU on each frame. Without ground truth, the reference (PyTorch
+    FP32) plays its part: recall is the fraction of reference boxes the candidate also finds, precision the fraction
+    of candidate boxes the reference also has.
+
+    Args:
+        reference (list): (boxes, confidences, classes) per frame from the reference backend.
+        candidate (list): (boxes, confidences, classes) per frame from the backend being compared.
+        min_iou (float): Minimum IoU for two boxes to be the same detection.
+
+    Returns:
+        dict: precision, recall, mean_iou and mean_conf_delta of the matched boxes.
+    """
+    n_reference, n_candidate, ious, conf_deltas = 0, 0, [], []
+    for (ref_boxes, ref_conf, ref_cls), (boxes, conf, cls) in zip(reference, candidate):
+        n_reference += len(ref_boxes)
+        n_candidate += len(boxes)
+        if len(ref_boxes) == 0 or len(boxes) == 0:
+            continue
+        scores = measure_ious(ref_boxes, boxes)
+        scores[ref_cls[:, None] != cls[None, :]] = 0 # only boxes of the same class match
+        for row, col in match_greedy(scores, min_score=min_iou):
+            ious.append(scores[row, col])
+            conf_deltas.append(conf[col] - ref_conf[row])
+    return {
+        "precision": len(ious) / n_candidate if n_candidate else 1.0,
+        "recall": len(ious) / n_reference if n_reference else 1.0,
+        "mean_iou": float(np.mean(ious)) if ious else 0.0,
+        "mean_conf_delta": float(np.mean(conf_deltas)) if conf_deltas else 0.0,
+    }
+
+def compare_backends(model_path, frames, backends, conf=0.25, batch_size=1, warmup=3, min_iou=0.5):
+    """
+    Time a model on each backend over the same frames and measure how far its detections drift from the first backend's.
+
+    Args:
+        model_path (str): PyTorch weights, exported for each backend as needed.
+        frames (list): Frames to run on.
+        backends (list): InferenceBackend for each configuration, the first is the accuracy reference (normally torch:fp32).
+        conf (float): Confidence threshold of every run.
+        batch_size (int): Number of frames per inference call.
+        warmup (int): Untimed calls before timing, so lazy initialisation isn't counted.
+        min_iou (float): Minimum IoU for two boxes to be the same detection.
+
+    Returns:
+        list: One dict per backend with its latency summary, fps and agreement with the reference.
+    """
+    results, reference = [], None
+    for backend in backends:
+        load_start = time.perf_counter()
+        model = backend.load(model_path) # exports on first use, not part of the timings
+        load_s = time.perf_counter() - load_start
+        for _ in range(warmup):
+            model.predict(frames[0], conf=conf, verbose=False)
+
+        detections, latencies = [], []
+        start_time = time.perf_counter()
+        for batch in batch_frames(frames, batch_size):
+            call_start = time.perf_counter()
+            batch_results = model.predict(list(batch), conf=conf, verbose=False)
+            latencies.extend([(time.perf_counter() - call_start) / len(batch)] * len(batch)) # per-frame share of the call
+            detections.extend(results_to_arrays(frame_results) for frame_results in batch_results)
+        elapsed = time.perf_counter() - start_time
+
+        if reference is None:
+            reference = detections
+        result = {
+            "backend": str(backend),
+            "frames": len(frames),
+            "batch_size": batch_size,
+            "load_s": load_s,
+            "elapsed_s": elapsed,
+            "fps": len(frames) / elapsed if elapsed > 0 else 0.0,
+            "latency": summarise_latencies(latencies),
+            "detections": int(sum(len(boxes) for boxes, _, _ in detections)),
+        }
+        result.update(compare_detections(reference, detections, min_iou))
+        results.append(result)
+    return results
@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import cv2
+sys.path.append("../")
+from utils import *
+
+STAGES = ("read", "player_detect", "ball_detect", "interpolate", "draw", "save")
+
+def git_commit():
+    try:
+        repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=repo_dir, stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def summarise_latencies(latencies):
+    """Return total and percentile latencies (ms) of one stage from its per-frame durations (s)."""
+    latencies_ms = np.asarray(latencies, dtype=float) * 1000
+    if len(latencies_ms) == 0:
+        return {"total_s": 0.0, "mean_ms": 0.0, "p50_ms": 0.0, "p90_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    return {
+        "total_s": float(latencies_ms.sum() / 1000),
+        "mean_ms": float(latencies_ms.mean()),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p90_ms": float(np.percentile(latencies_ms, 90)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "max_ms": float(latencies_ms.max()),
+    }
+
+def run_benchmark(input_video_path, output_video_path, player_tracker, ball_tracker, batch_size=1, court_keypoints=None, court_detector=None):
+    """
+    Time the read -> detect -> interpolate -> draw -> save path on one video.
+
+    Args:
+        input_video_path (str): Video to process.
+        output_video_path (str): Where to write the annotated video.
+        player_tracker (PlayerTracker): Player tracker (real or stand-in).
+        ball_tracker (BallTracker): Ball tracker (real or stand-in).
+        batch_size (int): Number of frames per model inference call.
+        court_keypoints (list, optional): Court keypoints drawn through court_detector's overlay.
+        court_detector (CourtDetector, optional): Detector used to draw the court keypoints.
+
+    Returns:
+        dict: Frames, wall-clock time, frames/sec, per-stage latency summary and peak RSS.
+    """
+    latencies = {stage: [] for stage in STAGES}
+    start_time = time.perf_counter()
+
+    # Read, decoding on this thread so each latency is the decode itself
+    reader = VideoReader(input_video_path, prefetch=0)
+    frames = reader.read()
+    video_frames = []
+    while True:
+        stage_start = time.perf_counter()
+        frame = next(frames, None)
+        if frame is None:
+            break
+        latencies["read"].append(time.perf_counter() - stage_start)
+        video_frames.append(frame)
+
+    # Detect, latency per frame is the batch time shared across its frames
+    player_detections, ball_detections = [], []
+    for batch in batch_frames(video_frames, batch_size):
+        stage_start = time.perf_counter()
+        player_detections.extend(player_tracker.detect_batch(batch))
+        latencies["player_detect"].extend([(time.perf_counter() - stage_start) / len(batch)] * len(batch))
+
+        stage_start = time.perf_counter()
+        ball_detections.extend(ball_tracker.detect_batch(batch))
+        latencies["ball_detect"].extend([(time.perf_counter() - stage_start) / len(batch)] * len(batch))
+
+    # Interpolate
+    stage_start = time.perf_counter()
+    ball_detections = ball_tracker.interpolate_ball_position(ball_detections)
+    latencies["interpolate"].extend([(time.perf_counter() - stage_start) / max(1, len(video_frames))] * len(video_frames))
+
+    # Draw
+    court_overlay = None
+    if court_detector is not None and court_keypoints is not None and video_frames:
+        court_overlay = court_detector.create_keypoints_overlay(video_frames[0].shape, court_keypoints)
+    for frame_idx, (frame, player_dict, ball_dict) in enumerate(zip(video_frames, player_detections, ball_detections)):
+        stage_start = time.perf_counter()
+        player_tracker.draw_bounding_box(frame, player_dict)
+        ball_tracker.draw_bounding_box(frame, ball_dict)
+        if court_overlay is not None:
+            court_overlay.apply(frame)
+        cv2.putText(frame, f"Frame {frame_idx}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 255), 2)
+        latencies["draw"].append(time.perf_counter() - stage_start)
+
+    # Save, encoding on this thread so each latency is the encode itself
+    out = VideoWriter.like(reader, output_video_path, queue_size=0)
+    for frame in video_frames:
+        stage_start = time.perf_counter()
+        out.write(frame)
+        latencies["save"].append(time.perf_counter() - stage_start)
+    out.close()
+
+    elapsed = time.perf_counter() - start_time
+    n_frames = len(video_frames)
+    return {
+        "frames": n_frames,
+        "batch_size": batch_size,
+        "elapsed_s": elapsed,
+        "fps": n_frames / elapsed if elapsed > 0 else 0.0,
+        "stages": {stage: summarise_latencies(latencies[stage]) for stage in STAGES},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+# Function to run one stand-in benchmark configuration, creating its trackers in the process it runs in
+def _run_stand_in_benchmark(input_video_path, output_video_path, batch_size, per_image_ms, call_overhead_ms, court_keypoints):
+    from court_detector import CourtDetector
+    from .stand_in_detectors import create_stand_in_trackers
+    player_tracker, ball_tracker = create_stand_in_trackers(per_image_ms=per_image_ms, call_overhead_ms=call_overhead_ms)
+    return run_benchmark(input_video_path, output_video_path, player_tracker, ball_tracker, batch_size=batch_size, court_keypoints=court_keypoints, court_detector=CourtDetector())
+
+def benchmark_batch_sizes(input_video_path, output_video_path, batch_sizes, per_image_ms=0.0, call_overhead_ms=0.0, court_keypoints=None):
+    """
+    Run run_benchmark with stand-in trackers once per batch size, each in a fresh process.
+
+    Peak RSS is a high-water mark over the life of a process, so configurations run one after another in the same
+    process would each report the largest peak of any before them. A fresh spawned process per configuration
+    makes each peak_rss_mb its own.
+
+    Args:
+        input_video_path (str): Video to process.
+        output_video_path (str): Where to write the annotated video.
+        batch_sizes (list): Batch sizes to run, in order.
+        per_image_ms (float): Simulated model time per image.
+        call_overhead_ms (float): Simulated model overhead per call.
+        court_keypoints (list, optional): Court keypoints drawn on every frame.
+
+    Returns:
+        list: Results from run_benchmark, one per batch size.
+    """
+    results = []
+    for batch_size in batch_sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results.append(pool.submit(_run_stand_in_benchmark, input_video_path, output_video_path, batch_size, per_image_ms, call_overhead_ms, court_keypoints).result())
+    return results
+
+def save_results(results, output_dir, config=None):
+    """
+    Save benchmark results as a JSON file per run and one CSV row per result for comparing commits.
+
+    Args:
+        results (list): Results from run_benchmark.
+        output_dir (str): Directory holding all benchmark results.
+        config (dict, optional): Settings of the run (resolution, frames, stand-in latencies...).
+
+    Returns:
+        str: Path of the JSON file written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    commit = git_commit()
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    run = {
+        "commit": commit,
+        "timestamp": timestamp,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": config or {},
+        "results": results,
+    }
+
+    json_path = os.path.join(output_dir, f"{timestamp}_{commit}.json")
+    with open(json_path, "w") as f:
+        json.dump(run, f, indent=2)
+
+    csv_path = os.path.join(output_dir, "history.csv")
+    columns = ["timestamp", "commit", "frames", "batch_size", "elapsed_s", "fps", "peak_rss_mb"] + [f"{stage}_p50_ms" for stage in STAGES] + [f"{stage}_p99_ms" for stage in STAGES]
+    write_header = not os.path.exists(csv_path)
+    with open(csv_path, "a") as f:
+        if write_header:
+            f.write(",".join(columns) + "\n")
+        for result in results:
+            row = [timestamp, commit, result["frames"], result["batch_size"], f"{result['elapsed_s']:.4f}", f"{result['fps']:.2f}", f"{result['peak_rss_mb']:.1f}"]
+            row += [f"{result['stages'][stage]['p50_ms']:.3f}" for stage in STAGES]
+            row += [f"{result['stages'][stage]['p99_ms']:.3f}" for stage in STAGES]
+            f.write(",".join(str(v) for v in row) + "\n")
+
+    return json_path
@@ -0,0 +1,134 @@
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import sys
+sys.path.append("../")
+from utils import *
+from pipeline.frame_ring import FrameRing
+
+# Function to fill a frame in place with a pattern identifying its index, so consumers can check what they got
+def fill_test_frame(frame, frame_idx):
+    frame[:, :, 0] = frame_idx % 256
+    frame[:, :, 1] = (frame_idx // 256) % 256
+    frame[0, :8, 2] = np.frombuffer(np.int64(frame_idx).tobytes(), dtype=np.uint8)
+
+# Function to read back the index written by fill_test_frame, touching every pixel of the frame like a detector would
+def check_test_frame(frame, frame_idx):
+    expected = np.frombuffer(np.int64(frame_idx).tobytes(), dtype=np.uint8)
+    return bool(np.array_equal(frame[0, :8, 2], expected)) and int(frame[:, :, 0].max()) == frame_idx % 256
+
+def _ring_consumer(ring_name, frame_shape, n_slots, n_consumers, consumer, work_ms, results):
+    ring = FrameRing(frame_shape, n_slots=n_slots, n_consumers=n_consumers, name=ring_name, create=False)
+    n_frames, n_bad = 0, 0
+    for frame_idx, frame in ring.frames(consumer): # views into the slots, nothing is copied
+        n_bad += not check_test_frame(frame, frame_idx)
+        if work_ms:
+            time.sleep(work_ms / 1000)
+        n_frames += 1
+    ring.detach()
+    results.put({"consumer": consumer, "frames": n_frames, "bad_frames": n_bad, "peak_rss_mb": peak_rss_mb()})
+
+def _queue_consumer(frames, consumer, work_ms, results):
+    n_frames, n_bad = 0, 0
+    while True:
+        item = frames.get()
+        if item is None:
+            break
+        frame_idx, frame = item # unpickled into a fresh array
+        n_bad += not check_test_frame(frame, frame_idx)
+        if work_ms:
+            time.sleep(work_ms / 1000)
+        n_frames += 1
+    results.put({"consumer": consumer, "frames": n_frames, "bad_frames": n_bad, "peak_rss_mb": peak_rss_mb()})
+
+def _collect(processes, results, n_consumers):
+    reports = sorted((results.get() for _ in range(n_consumers)), key=lambda report: report["consumer"])
+    for process in processes:
+        process.join()
+    return reports
+
+def run_ring_transport(n_frames, frame_shape, n_consumers=2, n_slots=8, work_ms=0.0, context=None):
+    """Send n_frames test frames to every consumer process through a FrameRing and time it."""
+    context = context or multiprocessing.get_context("spawn")
+    ring = FrameRing(frame_shape, n_slots=n_slots, n_consumers=n_consumers)
+    results = context.Queue()
+    processes = [context.Process(target=_ring_consumer, args=(ring.name, frame_shape, n_slots, n_consumers, consumer, work_ms, results)) for consumer in range(n_consumers)]
+    for process in processes:
+        process.start()
+    try:
+        start = time.perf_counter()
+        for frame_idx in range(n_frames):
+            fill_test_frame(ring.acquire(), frame_idx) # the writer fills the slot in place, as a decoder would
+            ring.publish(frame_idx)
+        ring.close()
+        reports = _collect(processes, results, n_consumers)
+        elapsed = time.perf_counter() - start
+    except BaseException: # e.g. RingStalled after a consumer died, don't leave the others blocked on the ring
+        for process in processes:
+            process.terminate()
+        raise
+    finally:
+        ring.detach()
+    return {"transport": "ring", "elapsed_s": elapsed, "consumers": reports, "shared_mb": ring.nbytes / 1024 ** 2}
+
+def run_queue_transport(n_frames, frame_shape, n_consumers=2, n_slots=8, work_ms=0.0, context=None):
+    """Send n_frames test frames to every consumer process by pickling them onto a queue per consumer and time it."""
+    context = context or multiprocessing.get_context("spawn")
+    queues = [context.Queue(maxsize=n_slots) for _ in range(n_consumers)] # same number of frames in flight as the ring
+    results = context.Queue()
+    processes = [context.Process(target=_queue_consumer, args=(queues[consumer], consumer, work_ms, results)) for consumer in range(n_consumers)]
+    for process in processes:
+        process.start()
+    start = time.perf_counter()
+    for frame_idx in range(n_frames):
+        frame = np.empty(frame_shape, dtype=np.uint8) # a new array per frame, as cap.read() returns, the queue pickles it later
+        fill_test_frame(frame, frame_idx)
+        for frames in queues:
+            frames.put((frame_idx, frame)) # pickled for each consumer
+    for frames in queues:
+        frames.put(None)
+    reports = _collect(processes, results, n_consumers)
+    elapsed = time.perf_counter() - start
+    return {"transport": "queue", "elapsed_s": elapsed, "consumers": reports, "shared_mb": 0.0}
+
+# Function to run one transport with its producer in a fresh process, so each producer's peak RSS is its own
+def _run_transport(transport, *args, **kwargs):
+    result = {"ring": run_ring_transport, "queue": run_queue_transport}[transport](*args, **kwargs)
+    result["producer_peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def benchmark_frame_transport(n_frames=300, frame_shape=(1080, 1920, 3), n_consumers=2, n_slots=8, work_ms=0.0, transports=("queue", "ring")):
+    """
+    Compare handing frames from one producer to several consumer processes through a FrameRing and through queues.
+
+    The queue baseline pickles every frame once per consumer and each consumer unpickles a fresh copy; the ring
+    writes each frame once into shared memory and every consumer reads it in place. Both allow n_slots frames in
+    flight per consumer, and every consumer checks each frame it gets is the one that was sent.
+
+    Args:
+        n_frames (int): Number of frames sent.
+        frame_shape (tuple): (height, width, 3) of the frames, 1080p BGR by default.
+        n_consumers (int): Number of consumer processes, e.g. a detector and a renderer.
+        n_slots (int): Frames in flight (ring slots, queue size).
+        work_ms (float): Simulated processing time per frame in each consumer.
+        transports (tuple): Transports to run, "queue" and/or "ring".
+
+    Returns:
+        list: Per transport, frames/sec, MB/sec moved to consumers, frames that failed the check and peak RSS of the
+            producer and each consumer.
+    """
+    frame_mb = int(np.prod(frame_shape)) / 1024 ** 2
+    results = []
+    for transport in transports:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            result = pool.submit(_run_transport, transport, n_frames, frame_shape, n_consumers=n_consumers, n_slots=n_slots, work_ms=work_ms).result()
+        result.update({
+            "frames": n_frames,
+            "fps": n_frames / result["elapsed_s"],
+            "mb_per_s": n_frames * n_consumers * frame_mb / result["elapsed_s"],
+            "bad_frames": sum(report["bad_frames"] for report in result["consumers"]),
+            "frames_received": min(report["frames"] for report in result["consumers"]),
+        })
+        results.append(result)
+    return results
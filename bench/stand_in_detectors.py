@@ -0,0 +1,113 @@
+import time
+import cv2
+import numpy as np
+import sys
+sys.path.append("../")
+from trackers import *
+from .synthetic_video import PLAYER_COLOURS, BALL_COLOUR
+
+class TensorLike(np.ndarray):
+    """NumPy array with the few torch.Tensor methods the trackers call on YOLO results."""
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.view(np.ndarray)
+
+    def int(self):
+        return self.astype(np.int64).view(TensorLike)
+
+def tensor_like(values, dtype, shape):
+    return np.asarray(values, dtype=dtype).reshape(shape).view(TensorLike)
+
+class StandInBoxes():
+    def __init__(self, xyxy, ids, cls, conf):
+        self.xyxy = tensor_like(xyxy, np.float32, (-1, 4))
+        self.id = None if ids is None else tensor_like(ids, np.float32, (-1,))
+        self.cls = tensor_like(cls, np.float32, (-1,))
+        self.conf = tensor_like(conf, np.float32, (-1,))
+
+    def __len__(self):
+        return len(self.xyxy)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield StandInBoxes(self.xyxy[i:i + 1], None if self.id is None else self.id[i:i + 1], self.cls[i:i + 1], self.conf[i:i + 1])
+
+class StandInResults():
+    def __init__(self, boxes, names, orig_img):
+        self.boxes = boxes
+        self.names = names
+        self.orig_img = orig_img
+
+class StandInModel():
+    def __init__(self, colours, names, with_ids, per_image_ms=0.0, call_overhead_ms=0.0, min_area=4):
+        """
+        Deterministic stand-in for a YOLO model that finds solid-colour objects in synthetic clips.
+
+        Each colour is a class of object; with_ids gives every colour a fixed track ID like model.track would.
+        Optional sleeps model the per-call overhead and per-image cost of a real model, so batching can be
+        benchmarked without weights.
+
+        Args:
+            colours (list): BGR colour of each object to find, in track ID order.
+            names (dict): Class ID to class name, like YOLO.names.
+            with_ids (bool): Whether results carry track IDs (model.track) or not (model.predict).
+            per_image_ms (float): Simulated inference time per image.
+            call_overhead_ms (float): Simulated fixed cost per predict/track call.
+            min_area (int): Minimum blob area in pixels to count as a detection.
+        """
+        self.colours = colours
+        self.names = names
+        self.with_ids = with_ids
+        self.per_image_ms = per_image_ms
+        self.call_overhead_ms = call_overhead_ms
+        self.min_area = min_area
+
+    def detect_image(self, image, classes=None):
+        boxes, ids, cls, conf = [], [], [], []
+        for track_id, colour in enumerate(self.colours, start=1):
+            lower = np.clip(np.array(colour) - 60, 0, 255).astype(np.uint8)
+            upper = np.clip(np.array(colour) + 60, 0, 255).astype(np.uint8)
+            mask = cv2.inRange(image, lower, upper)
+            n_labels, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+            if n_labels < 2:
+                continue
+            largest = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+            x, y, w, h, area = stats[largest]
+            if area < self.min_area:
+                continue
+            boxes.append([x, y, x + w, y + h])
+            ids.append(track_id)
+            cls.append(0)
+            conf.append(min(1.0, area / float(w * h))) # fill ratio as a stand-in confidence
+
+        if classes is not None: # class filter applied inside the model call, like YOLO(classes=...)
+            keep = [i for i, c in enumerate(cls) if c in classes]
+            boxes, ids, cls, conf = [boxes[i] for i in keep], [ids[i] for i in keep], [cls[i] for i in keep], [conf[i] for i in keep]
+
+        return StandInResults(StandInBoxes(boxes, ids if self.with_ids else None, cls, conf), self.names, image)
+
+    def __call__(self, source, classes=None, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        time.sleep((self.call_overhead_ms + self.per_image_ms * len(images)) / 1000)
+        return [self.detect_image(image, classes) for image in images]
+
+    def predict(self, source, **kwargs):
+        return self(source, **kwargs)
+
+    def track(self, source, persist=True, **kwargs):
+        return self(source, **kwargs)
+
+def create_stand_in_trackers(per_image_ms=0.0, call_overhead_ms=0.0, ball_roi=None):
+    """
+    Create PlayerTracker and BallTracker instances backed by stand-in models for synthetic clips.
+
+    Returns:
+        tuple: (player_tracker, ball_tracker) with the same interface as the real trackers.
+    """
+    player_model = StandInModel(PLAYER_COLOURS, {0: "person"}, with_ids=True, per_image_ms=per_image_ms, call_overhead_ms=call_overhead_ms)
+    ball_model = StandInModel([BALL_COLOUR], {0: "ball"}, with_ids=False, per_image_ms=per_image_ms, call_overhead_ms=call_overhead_ms)
+    player_tracker = PlayerTracker(model_path="stand_in_player", model=player_model)
+    ball_tracker = BallTracker(model_path="stand_in_ball", roi_size=ball_roi, model=ball_model)
+    return player_tracker, ball_tracker
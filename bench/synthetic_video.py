@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+
+COURT_COLOUR = (170, 80, 20) # BGR blue court
+LINE_COLOUR = (255, 255, 255)
+PLAYER_COLOURS = [(0, 0, 230), (0, 200, 0), (230, 0, 230), (0, 140, 255)] # BGR, one per player track ID
+BALL_COLOUR = (0, 255, 255) # BGR yellow
+
+def draw_court(frame):
+    """Draw a padel-like court (10m x 20m) in perspective-free top-down view."""
+    height, width = frame.shape[:2]
+    frame[:] = (60, 60, 60) # surround
+    x0, x1 = int(width * 0.3), int(width * 0.7)
+    y0, y1 = int(height * 0.05), int(height * 0.95)
+    cv2.rectangle(frame, (x0, y0), (x1, y1), COURT_COLOUR, -1)
+    cv2.rectangle(frame, (x0, y0), (x1, y1), LINE_COLOUR, 2)
+    mid_y = (y0 + y1) // 2
+    service_offset = int((y1 - y0) * 6.95 / 20) # service lines 6.95m from the net
+    cv2.line(frame, (x0, mid_y), (x1, mid_y), LINE_COLOUR, 3) # net
+    cv2.line(frame, (x0, mid_y - service_offset), (x1, mid_y - service_offset), LINE_COLOUR, 2)
+    cv2.line(frame, (x0, mid_y + service_offset), (x1, mid_y + service_offset), LINE_COLOUR, 2)
+    cv2.line(frame, ((x0 + x1) // 2, mid_y - service_offset), ((x0 + x1) // 2, mid_y + service_offset), LINE_COLOUR, 2)
+    return (x0, y0, x1, y1)
+
+def generate_synthetic_match(output_path, width=1280, height=720, n_frames=300, fps=30, n_players=4, ball_miss_rate=0.1, seed=0):
+    """
+    Write a synthetic padel-like clip with moving player rectangles and a small fast ball.
+
+    Players are solid rectangles in a distinct colour per track ID and the ball is a yellow disc bouncing around
+    the court, hidden on a random fraction of frames to exercise interpolation.
+
+    Args:
+        output_path (str): Path of the video to write (MJPG).
+        width (int): Frame width in pixels.
+        height (int): Frame height in pixels.
+        n_frames (int): Number of frames.
+        fps (float): Frame rate of the clip.
+        n_players (int): Number of players (up to 4).
+        ball_miss_rate (float): Fraction of frames where the ball is not drawn.
+        seed (int): Random seed, the same seed always gives the same clip.
+
+    Returns:
+        tuple: (player_detections, ball_detections) ground truth in the detect_frames layout.
+    """
+    rng = np.random.default_rng(seed)
+    background = np.empty((height, width, 3), dtype=np.uint8)
+    x0, y0, x1, y1 = draw_court(background)
+    court_width, court_height = x1 - x0, y1 - y0
+
+    player_width, player_height = max(8, int(court_width * 0.08)), max(16, int(court_height * 0.12))
+    player_phases = rng.uniform(0, 2 * np.pi, size=(n_players, 2))
+    player_speeds = rng.uniform(0.01, 0.04, size=(n_players, 2))
+
+    ball_radius = max(2, int(min(width, height) * 0.006))
+    ball_position = np.array([x0 + court_width / 2, y0 + court_height / 4])
+    ball_velocity = rng.uniform(-1, 1, size=2) * min(width, height) * 0.02
+
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    player_detections, ball_detections = [], []
+    for frame_idx in range(n_frames):
+        frame = background.copy()
+
+        player_dict = {}
+        for player_idx in range(n_players):
+            half = 0 if player_idx < 2 else 1 # two players per side of the net
+            lane = player_idx % 2
+            centre_x = x0 + court_width * (0.25 + 0.5 * lane) + np.sin(frame_idx * player_speeds[player_idx, 0] + player_phases[player_idx, 0]) * court_width * 0.15
+            centre_y = y0 + court_height * (0.25 + 0.5 * half) + np.sin(frame_idx * player_speeds[player_idx, 1] + player_phases[player_idx, 1]) * court_height * 0.12
+            bbox = [int(centre_x - player_width / 2), int(centre_y - player_height / 2), int(centre_x + player_width / 2), int(centre_y + player_height / 2)]
+            cv2.rectangle(frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]), PLAYER_COLOURS[player_idx % len(PLAYER_COLOURS)], -1)
+            player_dict[player_idx + 1] = [float(v) for v in bbox]
+        player_detections.append(player_dict)
+
+        ball_position += ball_velocity
+        for axis, (low, high) in enumerate([(x0, x1), (y0, y1)]): # bounce off the walls
+            if not low + ball_radius <= ball_position[axis] <= high - ball_radius:
+                ball_velocity[axis] = -ball_velocity[axis]
+                ball_position[axis] = np.clip(ball_position[axis], low + ball_radius, high - ball_radius)
+
+        if rng.random() >= ball_miss_rate:
+            centre = (int(ball_position[0]), int(ball_position[1]))
+            cv2.circle(frame, centre, ball_radius, BALL_COLOUR, -1)
+            ball_detections.append({1: [float(centre[0] - ball_radius), float(centre[1] - ball_radius), float(centre[0] + ball_radius), float(centre[1] + ball_radius)]})
+        else:
+            ball_detections.append({})
+
+        writer.write(frame)
+    writer.release()
+
+    return player_detections, ball_detections
@@ -0,0 +1,45 @@
+from bench import *
+from utils import *
+import os
+import json
+import time
+import argparse
+
+def main(width, height, n_frames, n_consumers, n_slots, work_ms, transports, output_dir):
+    results = benchmark_frame_transport(n_frames, (height, width, 3), n_consumers=n_consumers, n_slots=n_slots, work_ms=work_ms, transports=transports)
+
+    print(f"{'transport':<11}{'fps':>9}{'MB/s':>9}{'producer MB':>13}{'consumer MB':>13}{'shared MB':>11}{'bad':>5}")
+    for result in results:
+        consumer_mb = max(report["peak_rss_mb"] for report in result["consumers"])
+        print(f"{result['transport']:<11}{result['fps']:9.1f}{result['mb_per_s']:9.0f}{result['producer_peak_rss_mb']:13.0f}{consumer_mb:13.0f}{result['shared_mb']:11.0f}{result['bad_frames']:5d}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    json_path = os.path.join(output_dir, f"transport_{time.strftime('%Y%m%d-%H%M%S')}_{git_commit()}.json")
+    config = {"width": width, "height": height, "frames": n_frames, "consumers": n_consumers, "slots": n_slots, "work_ms": work_ms, "cpu_count": os.cpu_count()}
+    with open(json_path, "w") as f:
+        json.dump({"config": config, "results": results}, f, indent=2)
+    print("Results saved to:", json_path)
+
+def add_arguments(parser):
+    parser.add_argument("--width", type=int, default=1920, help="Width of the frames")
+    parser.add_argument("--height", type=int, default=1080, help="Height of the frames")
+    parser.add_argument("--frames", type=int, default=300, help="Number of frames sent to each consumer")
+    parser.add_argument("--consumers", type=int, default=2, help="Number of consumer processes (e.g. detector and renderer)")
+    parser.add_argument("--slots", type=int, default=8, help="Frames in flight, ring slots and queue size")
+    parser.add_argument("--work-ms", type=float, default=0.0, help="Simulated processing time per frame in each consumer")
+    parser.add_argument("--transports", type=str, nargs="+", default=["queue", "ring"], choices=("queue", "ring"), help="Transports to benchmark")
+    parser.add_argument("--output-dir", type=str, default="./bench_results", help="Directory for the result files")
+
+def run(args):
+    main(args.width, args.height, args.frames, args.consumers, args.slots, args.work_ms, args.transports, args.output_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark handing frames to consumer processes through a shared-memory ring against pickling them onto queues.")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    run(args)
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    print(f"Execution time: {elapsed_time:.2f} seconds")
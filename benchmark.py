@@ -0,0 +1,46 @@
+from bench import *
+import os
+import time
+import argparse
+import tempfile
+
+def main(width, height, n_frames, batch_sizes, per_image_ms, call_overhead_ms, output_dir):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Generate a synthetic clip, the same arguments always give the same clip
+        input_video_path = os.path.join(tmp_dir, "synthetic_match.avi")
+        generate_synthetic_match(input_video_path, width=width, height=height, n_frames=n_frames)
+        court_keypoints = [int(width * 0.3), int(height * 0.5), int(width * 0.7), int(height * 0.5)] # net ends
+
+        # Each batch size runs in its own process, so every peak RSS is that configuration's own
+        results = benchmark_batch_sizes(input_video_path, os.path.join(tmp_dir, "output.avi"), batch_sizes, per_image_ms, call_overhead_ms, court_keypoints)
+        for result in results:
+            print(f"batch_size={result['batch_size']}: {result['fps']:.1f} frames/sec, peak RSS {result['peak_rss_mb']:.0f} MB")
+            for stage, summary in result["stages"].items():
+                print(f"    {stage:<14} p50 {summary['p50_ms']:7.2f} ms   p99 {summary['p99_ms']:7.2f} ms   total {summary['total_s']:6.2f} s")
+
+    config = {"width": width, "height": height, "frames": n_frames, "per_image_ms": per_image_ms, "call_overhead_ms": call_overhead_ms}
+    json_path = save_results(results, output_dir, config)
+    print("Results saved to:", json_path)
+
+def add_arguments(parser):
+    parser.add_argument("--width", type=int, default=1280, help="Width of the synthetic clip")
+    parser.add_argument("--height", type=int, default=720, help="Height of the synthetic clip")
+    parser.add_argument("--frames", type=int, default=300, help="Number of frames in the synthetic clip")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16], help="Batch sizes to benchmark")
+    parser.add_argument("--per-image-ms", type=float, default=0.0, help="Simulated model time per image")
+    parser.add_argument("--call-overhead-ms", type=float, default=0.0, help="Simulated model overhead per call")
+    parser.add_argument("--output-dir", type=str, default="./bench_results", help="Directory for the result files")
+
+def run(args):
+    main(args.width, args.height, args.frames, args.batch_sizes, args.per_image_ms, args.call_overhead_ms, args.output_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the tracking pipeline on a synthetic clip with stand-in detectors.")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    run(args)
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    print(f"Execution time: {elapsed_time:.2f} seconds")
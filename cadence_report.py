@@ -0,0 +1,39 @@
+from utils import *
+from trackers import *
+import os
+import json
+import time
+import argparse
+
+def main(input_video_path, keyframe_interval, motion_threshold, output_path=None):
+    # Full-rate reference and keyframe cadence need separate models so their tracker state stays independent
+    full_rate_tracker = PlayerTracker(model_path="./models/yolov5nu.pt")
+    cadence_tracker = KeyframePlayerTracker(PlayerTracker(model_path="./models/yolov5nu.pt"), keyframe_interval=keyframe_interval, motion_threshold=motion_threshold)
+
+    report = compare_cadence(read_video_stream(input_video_path), full_rate_tracker, cadence_tracker)
+    report.update(video=input_video_path, keyframe_interval=keyframe_interval, motion_threshold=motion_threshold)
+
+    print(f"Keyframes: {report['keyframes']}/{report['frames']}")
+    print(f"Detector time saved: {report['time_saved']:.1%}")
+    print(f"Box drift: mean {report['mean_drift']:.1f}px, p95 {report['p95_drift']:.1f}px, mean IoU {report['mean_iou']:.3f}")
+
+    if output_path is None:
+        _, file_name = os.path.split(input_video_path)
+        name, _ = os.path.splitext(file_name)
+        output_path = f"./output_media/{name}_cadence_report.json"
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare keyframe player detection against full-rate detection.")
+    parser.add_argument("input_video_path", type=str, help="Path to the input video file")
+    parser.add_argument("--keyframe-interval", type=int, default=5, help="Maximum number of frames between detector runs")
+    parser.add_argument("--motion-threshold", type=float, default=6.0, help="Mean grey level change that forces a keyframe")
+    parser.add_argument("--output", type=str, default=None, help="Path to save the JSON report")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    main(args.input_video_path, args.keyframe_interval, args.motion_threshold, args.output)
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    print(f"Execution time: {elapsed_time:.2f} seconds")
@@ -1,13 +1,15 @@
 from utils import *
 from trackers import *
 from court_detector import *
+from pipeline import *
+from detection_io import *
 import os
 import time
 import cv2
 import argparse
 import yt_dlp
 
-def main(input_video):
+def main(input_video, batch_size=1, output_format="columnar", metrics_dir=None, trace=False, segments=1, overlap=30):
     if "youtube.com" in input_video:
         # Extract direct stream URL from youtube
         ydl_opts = {"format": "best[ext=mp4]"}
@@ -21,62 +23,75 @@ def main(input_video):
         _, file_name = os.path.split(input_video_path)
         name, _ = os.path.splitext(file_name)
 
-    # Open video file with OpenCV
-    cap = cv2.VideoCapture(input_video_path)
-    if not cap.isOpened():
+    metrics = Metrics(trace=trace) if metrics_dir is not None else None
+    if segments > 1:
+        # Split the video into overlapping segments processed by a pool of worker processes
+        with time_stage(metrics, "segment_detection"):
+            player_detections, ball_detections = detect_segments_parallel(input_video_path, n_workers=segments, overlap=overlap, batch_size=batch_size)
+        save_all_detections(name, player_detections, ball_detections, output_format, metrics, metrics_dir)
+        return
+
+    # Open video, decoding ahead of the models on a background thread
+    reader = VideoReader(input_video_path, prefetch=8 * batch_size, metrics=metrics)
+    if not reader.opened:
         print(f"Error: Unable to open video {input_video_path}")
         return
     
     # Initialize trackers
-    player_tracker = PlayerTracker(model_path="./models/yolov5nu.pt")
-    ball_tracker = BallTracker(model_path="./models/yolov5n6u_ball.pt")
+    player_tracker = PlayerTracker(model_path="./models/yolov5nu.pt", metrics=metrics)
+    ball_tracker = BallTracker(model_path="./models/yolov5n6u_ball.pt", metrics=metrics)
     # court_detector = CourtDetector(is_manual=True)
 
     # Initialise complete tracker lists
     player_detections = []
     ball_detections = []
 
+    # Decode on one worker while the player and ball models run in parallel on others
+    executor = ConcurrentExecutor(player_tracker, ball_tracker, batch_size=batch_size, metrics=metrics)
+    video_frames = reader.read()
+
     # Process video frame by frame
     frame_count = 0
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        # Detect players and ball
-        frame_player_detections = player_tracker.detect_frames([frame])
-        if len(frame_player_detections) > 0:
-            player_detections.extend(frame_player_detections)
-        frame_ball_detections = ball_tracker.detect_frames([frame])
-        if len(frame_ball_detections) > 0:
-            ball_detections.extend(frame_ball_detections)
+    for frame, player_dict, ball_dict in executor.detect(video_frames):
+        player_detections.append(player_dict)
+        ball_detections.append(ball_dict)
         
         # Detect court lines
         # if frame_count == 0:  # Use the first frame to detect court keypoints
             # court_keypoints = court_detector.create_keypoints(frame, save_path="./tracker_stubs/court_keypoints.json")
         
         frame_count += 1
-    
-    # Release resources
-    cap.release()
 
+    save_all_detections(name, player_detections, ball_detections, output_format, metrics, metrics_dir)
+
+def save_all_detections(name, player_detections, ball_detections, output_format="columnar", metrics=None, metrics_dir=None):
     # Interpolate ball detections
-    ball_detections = ball_tracker.interpolate_ball_position(ball_detections)
+    with time_stage(metrics, "interpolation"):
+        ball_detections = interpolate_ball_positions(ball_detections)
 
-    # Save detections
-    with open(f"./output_media/{name}_player_detections.json", "w") as f:
-        json.dump(player_detections, f)
+    # Save detections (columnar stores can be memory-mapped and read lazily by draw_video.py)
+    extension = {"columnar": "", "json": ".json", "pickle": ".pkl"}[output_format]
+    save_detections(player_detections, f"./output_media/{name}_player_detections{extension}")
+    save_detections(ball_detections, f"./output_media/{name}_ball_detections{extension}")
 
-    with open(f"./output_media/{name}_ball_detections.json", "w") as f:
-        json.dump(ball_detections, f)
+    if metrics is not None:
+        metrics.count("frames_detected", len(player_detections))
+        metrics.sample_memory()
+        metrics.export(metrics_dir, name)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process a video file for player and ball tracking.")
     parser.add_argument("input_video", type=str, help="Path to the input video file")
+    parser.add_argument("--batch-size", type=int, default=1, help="Number of frames per model inference call")
+    parser.add_argument("--format", type=str, default="columnar", choices=["columnar", "json", "pickle"], help="Format of the saved detections")
+    parser.add_argument("--segments", type=int, default=1, help="Split the video into this many segments processed in parallel worker processes")
+    parser.add_argument("--overlap", type=int, default=30, help="Frames shared by consecutive segments to warm up the tracker and match player IDs")
+    parser.add_argument("--metrics-dir", type=str, default=None, help="Export per-stage timings as JSON and Prometheus text to this directory")
+    parser.add_argument("--trace", action="store_true", help="Also export a Chrome trace (chrome://tracing, Perfetto) of every timed stage")
     args = parser.parse_args()
 
     start_time = time.time()
-    main(args.input_video)
+    main(args.input_video, batch_size=args.batch_size, output_format=args.format, metrics_dir=args.metrics_dir, trace=args.trace, segments=args.segments, overlap=args.overlap)
     end_time = time.time()
     elapsed_time = end_time - start_time
     print(f"Execution time: {elapsed_time:.2f} seconds")
\ No newline at end of file
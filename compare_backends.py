@@ -0,0 +1,59 @@
+from bench import *
+from trackers import *
+from utils import *
+import os
+import json
+import time
+import argparse
+
+def main(model_path, video_path, backend_specs, n_frames=100, start=0, batch_size=1, conf=0.25, imgsz=640, calibration_videos=None, calibration_frames=200, output_dir="./bench_results"):
+    # Frames every backend runs on, decoded once
+    frames = list(VideoReader(video_path).read(start, start + n_frames))
+    if not frames:
+        raise ValueError(f"No frames could be read from {video_path}")
+
+    # The first backend is the accuracy reference, INT8 models are calibrated on our own footage
+    calibration_videos = calibration_videos or [video_path]
+    calibrated_on_video = os.path.abspath(video_path) in map(os.path.abspath, calibration_videos) and any(spec.endswith(":int8") for spec in backend_specs)
+    if calibrated_on_video:
+        print(f"Warning: INT8 models are calibrated on {video_path}, the video they are evaluated on, so their accuracy is optimistic. Pass --calibration-videos with other footage.")
+    backends = [InferenceBackend.parse(spec, imgsz=imgsz, calibration_videos=calibration_videos, calibration_frames=calibration_frames) for spec in backend_specs]
+    results = compare_backends(model_path, frames, backends, conf=conf, batch_size=batch_size)
+
+    print(f"{'backend':<16}{'fps':>8}{'p50 ms':>9}{'p99 ms':>9}{'precision':>11}{'recall':>8}{'mean IoU':>10}")
+    for result in results:
+        print(f"{result['backend']:<16}{result['fps']:8.1f}{result['latency']['p50_ms']:9.2f}{result['latency']['p99_ms']:9.2f}{result['precision']:11.3f}{result['recall']:8.3f}{result['mean_iou']:10.3f}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    json_path = os.path.join(output_dir, f"backends_{time.strftime('%Y%m%d-%H%M%S')}_{git_commit()}.json")
+    config = {"model_path": model_path, "video_path": video_path, "frames": len(frames), "start": start, "conf": conf, "imgsz": imgsz, "calibration_videos": calibration_videos, "calibrated_on_video": calibrated_on_video, "cpu_count": os.cpu_count()}
+    with open(json_path, "w") as f:
+        json.dump({"config": config, "results": results}, f, indent=2)
+    print("Results saved to:", json_path)
+
+def add_arguments(parser):
+    parser.add_argument("model_path", type=str, help="Path to the PyTorch weights (.pt)")
+    parser.add_argument("video_path", type=str, help="Video whose frames every backend runs on")
+    parser.add_argument("--backends", type=str, nargs="+", default=["torch:fp32", "onnx:fp32", "onnx:int8", "openvino:fp32", "openvino:int8"], help="Backends as name:precision, the first is the accuracy reference")
+    parser.add_argument("--frames", type=int, default=100, help="Number of frames to run on")
+    parser.add_argument("--start", type=int, default=0, help="First frame to run on")
+    parser.add_argument("--batch-size", type=int, default=1, help="Number of frames per inference call")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold")
+    parser.add_argument("--imgsz", type=int, default=640, help="Image size the models are exported at")
+    parser.add_argument("--calibration-videos", type=str, nargs="+", default=None, help="Footage to calibrate int8 models on, other than the video (defaults to the video, with a warning)")
+    parser.add_argument("--calibration-frames", type=int, default=200, help="Number of calibration frames sampled from the footage")
+    parser.add_argument("--output-dir", type=str, default="./bench_results", help="Directory for the result files")
+
+def run(args):
+    main(args.model_path, args.video_path, args.backends, n_frames=args.frames, start=args.start, batch_size=args.batch_size, conf=args.conf, imgsz=args.imgsz, calibration_videos=args.calibration_videos, calibration_frames=args.calibration_frames, output_dir=args.output_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the speed and accuracy of the model on PyTorch, ONNX Runtime and OpenVINO in FP32 and INT8.")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    run(args)
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    print(f"Execution time: {elapsed_time:.2f} seconds")
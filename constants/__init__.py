@@ -0,0 +1,8 @@
+# Padel court dimensions in metres
+COURT_WIDTH = 10.0 # side wall to side wall
+COURT_LENGTH = 20.0 # back wall to back wall
+SERVICE_LINE_DISTANCE_FROM_NET = 6.95
+COURT_MARGIN = 1.0 # how far outside the walls a projected foot point may fall and still count as on court
+
+# Limits used to reject tracking noise in the analytics
+MAX_PLAYER_SPEED = 9.0 # m/s, faster steps are identity switches or bad foot points
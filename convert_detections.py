@@ -0,0 +1,21 @@
+from detection_io import *
+import argparse
+import time
+
+def add_arguments(parser):
+    parser.add_argument("input_path", type=str, help="Path to the input detections (columnar directory, .json or .pkl)")
+    parser.add_argument("output_path", type=str, help="Path to the output detections (directory for columnar, .json or .pkl)")
+
+def run(args):
+    convert_detections(args.input_path, args.output_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert detections between the columnar, JSON and pickle formats.")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    run(args)
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    print(f"Execution time: {elapsed_time:.2f} seconds")
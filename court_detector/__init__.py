@@ -1 +1,2 @@
-from .court_detector import *
\ No newline at end of file
+from .court_detector import *
+from .court_line_detection import *
@@ -1,22 +1,26 @@
 import cv2
 import json
-import torchvision.models as models
+import sys
+sys.path.append("../")
+from utils import *
+from .court_line_detection import *
 
 class CourtDetector():
-    def __init__(self, is_manual=True, model_path=None):
+    def __init__(self, is_manual=True, model_path=None, cache_path="./tracker_stubs/cache/court_keypoints.json", recheck_interval=250, min_fit=0.3):
         """
-        Initializes the class to either use manual keypoints selection or auto-detect using a model.
+        Initializes the class to either use manual keypoints selection or auto-detect them from the court lines.
         
         Args:
             is_manual (bool): Flag indicating whether to use manual keypoints selection.
-            model_path (str, optional): Path to the model for automatic keypoint detection. Required if is_manual=False.
+            model_path (str, optional): Unused, automatic detection needs no model. Kept for existing callers.
+            cache_path (str, optional): JSON file caching auto-detected keypoints per camera view. None disables it.
+            recheck_interval (int): Frames between checks that auto-detected keypoints still match the court lines.
+            min_fit (float): Minimum fraction of sampled line points that must still look like lines, see measure_keypoints_fit.
         """
         self.is_manual = is_manual  # Whether to manually select keypoints or not
-
-        if not is_manual:
-            if model_path is None:
-                raise ValueError("model_path must be provided when is_manual is False.")
-            self.model = models.resnet50(weights=None)  # load resnet50 model for placeholder
+        self.cache = CourtKeypointCache(cache_path) if cache_path is not None and not is_manual else None
+        self.recheck_interval = recheck_interval
+        self.min_fit = min_fit
 
     def click_event(self, event, x, y, flags, param):
         """Handles mouse click events to store selected keypoints."""
@@ -55,11 +59,45 @@ class CourtDetector():
 
             return selected_keypoints
         else:
-            # Automatic keypoint detection using the model
-            return self.auto_detect_keypoints(frame)
+            # Automatic keypoint detection from the court lines, reusing the keypoints of a camera view seen before
+            keypoints = self.cache.lookup(frame) if self.cache is not None else None
+            if keypoints is None or measure_keypoints_fit(frame, keypoints) < self.min_fit:
+                keypoints = self.auto_detect_keypoints(frame)
+                if keypoints is not None and self.cache is not None:
+                    self.cache.store(frame, keypoints)
+
+            # Save keypoints if a save path is provided
+            if save_path and keypoints is not None:
+                with open(save_path, "w") as f:
+                    json.dump(keypoints, f)
+
+            return keypoints
 
     def auto_detect_keypoints(self, frame):
-        print("Functionality not added yet.")
+        """Detect the keypoints from the court lines, returns None (with a warning) if no court is found."""
+        keypoints, _ = detect_court_keypoints(frame)
+        if keypoints is None or measure_keypoints_fit(frame, keypoints) < self.min_fit:
+            print("Warning: court lines not found, no court keypoints for this frame.")
+            return None
+        return keypoints
+
+    def update_keypoints(self, frame, keypoints, frame_idx):
+        """
+        Re-check auto-detected keypoints every recheck_interval frames and detect them again if the camera moved.
+
+        Args:
+            frame (numpy.ndarray): Current frame.
+            keypoints (list): Keypoints in use, may be None if none were found yet.
+            frame_idx (int): Index of the frame in the video.
+
+        Returns:
+            list: The same keypoints object if still valid, otherwise newly detected keypoints (or None).
+        """
+        if self.is_manual or frame_idx % self.recheck_interval != 0:
+            return keypoints
+        if keypoints is not None and measure_keypoints_fit(frame, keypoints) >= self.min_fit:
+            return keypoints
+        return self.create_keypoints(frame)
 
     def draw_keypoints(self, image, keypoints):
         """Draw selected keypoints on the image."""
@@ -71,10 +109,28 @@ class CourtDetector():
 
         return image
 
+    def create_keypoints_overlay(self, frame_shape, keypoints):
+        """
+        Render the keypoints once into a cached overlay that can be composited onto every frame.
+
+        Args:
+            frame_shape (tuple): Shape of the video frames, (height, width, 3).
+            keypoints (list): Flat list of keypoint coordinates [x0, y0, x1, y1, ...].
+
+        Returns:
+            StaticOverlay: Overlay giving the same pixels as draw_keypoints.
+        """
+        return StaticOverlay(frame_shape).add(self.draw_keypoints, keypoints).build()
+
     def draw_keypoints_on_video(self, video_frames, keypoints):
         """Draw keypoints on all video frames."""
+        if keypoints is None: # no court found
+            return video_frames
         output_video_frames = []
+        overlay = None
         for frame in video_frames:
-            frame = self.draw_keypoints(frame, keypoints)
+            if overlay is None or overlay.frame_shape != frame.shape: # keypoints are only rendered once
+                overlay = self.create_keypoints_overlay(frame.shape, keypoints)
+            frame = overlay.apply(frame)
             output_video_frames.append(frame)
         return output_video_frames
\ No newline at end of file
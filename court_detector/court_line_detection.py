@@ -0,0 +1,277 @@
+import os
+import json
+import cv2
+import numpy as np
+import sys
+sys.path.append("../")
+from constants import *
+
+# Court positions (metres, x across from the left side wall, y along from the far back wall) of the keypoints,
+# in the order they are stored: near service line left, T, right, then far service line left, T, right
+NEAR_SERVICE_LINE_Y = COURT_LENGTH / 2 + SERVICE_LINE_DISTANCE_FROM_NET
+FAR_SERVICE_LINE_Y = COURT_LENGTH / 2 - SERVICE_LINE_DISTANCE_FROM_NET
+COURT_KEYPOINTS = np.float32([
+    [0, NEAR_SERVICE_LINE_Y], [COURT_WIDTH / 2, NEAR_SERVICE_LINE_Y], [COURT_WIDTH, NEAR_SERVICE_LINE_Y],
+    [0, FAR_SERVICE_LINE_Y], [COURT_WIDTH / 2, FAR_SERVICE_LINE_Y], [COURT_WIDTH, FAR_SERVICE_LINE_Y],
+])
+COURT_CORNERS = COURT_KEYPOINTS[[3, 5, 0, 2]] # far left, far right, near left, near right
+
+def keypoints_homography(keypoints):
+    """Homography from court metres to image pixels fitted to a flat keypoint list."""
+    image_points = np.float32(keypoints).reshape(-1, 2)
+    homography, _ = cv2.findHomography(COURT_KEYPOINTS[:len(image_points)], image_points)
+    return homography
+
+def project_court_points(homography, court_points):
+    return cv2.perspectiveTransform(np.float32(court_points).reshape(-1, 1, 2), homography).reshape(-1, 2)
+
+def court_line_points(n_points=40):
+    """Points along the painted lines of the template: both service lines and the centre line between them."""
+    xs = np.linspace(0, COURT_WIDTH, n_points)
+    ys = np.linspace(FAR_SERVICE_LINE_Y, NEAR_SERVICE_LINE_Y, n_points)
+    return np.concatenate([
+        np.stack([xs, np.full(n_points, FAR_SERVICE_LINE_Y)], axis=1),
+        np.stack([xs, np.full(n_points, NEAR_SERVICE_LINE_Y)], axis=1),
+        np.stack([np.full(n_points, COURT_WIDTH / 2), ys], axis=1),
+    ])
+
+def find_floor_mask(hsv, kernel_size):
+    """Mask of the blue playing surface, with lines, net and players closed over."""
+    floor = cv2.inRange(hsv, (100, 120, 120), (130, 255, 255))
+    floor = cv2.morphologyEx(floor, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size)))
+    n_labels, labels, stats, _ = cv2.connectedComponentsWithStats(floor)
+    if n_labels < 2:
+        return None
+    areas = stats[:, cv2.CC_STAT_AREA].copy()
+    areas[0] = 0 # background
+    return np.isin(labels, np.flatnonzero(areas >= 0.15 * areas.max())).astype(np.uint8) * 255 # both halves if the net splits them
+
+def find_line_mask(hsv, kernel_size):
+    """Mask of thin white lines: unsaturated and brighter than their surroundings."""
+    whiteness = np.clip(hsv[..., 2].astype(np.int16) - hsv[..., 1], 0, 255).astype(np.uint8)
+    tophat = cv2.morphologyEx(whiteness, cv2.MORPH_TOPHAT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size)))
+    return ((tophat > 40) & (whiteness > 60)).astype(np.uint8) * 255
+
+def fit_line_robust(ys, xs, tolerance, n_iterations=5):
+    """Fit x = slope * y + intercept, dropping the points furthest from the line on each pass."""
+    keep = np.ones(len(ys), dtype=bool)
+    slope, intercept = 0.0, float(np.median(xs))
+    for _ in range(n_iterations):
+        if keep.sum() < 2:
+            break
+        slope, intercept = np.polyfit(ys[keep], xs[keep], 1)
+        residuals = np.abs(xs - (slope * ys + intercept))
+        keep = residuals < max(tolerance, np.percentile(residuals, 50))
+    return float(slope), float(intercept)
+
+def find_sidelines(floor_mask, tolerance):
+    """Fit the left and right edges of the floor, returns ((slope, intercept), (slope, intercept)) with x = slope * y + intercept."""
+    rows = np.flatnonzero(floor_mask.any(axis=1))
+    if len(rows) < 10:
+        return None
+    columns = floor_mask[rows] > 0
+    left = np.argmax(columns, axis=1) # first floor pixel of each row
+    right = columns.shape[1] - 1 - np.argmax(columns[:, ::-1], axis=1) # last floor pixel of each row
+    return fit_line_robust(rows.astype(float), left.astype(float), tolerance), fit_line_robust(rows.astype(float), right.astype(float), tolerance)
+
+def find_horizontal_lines(line_mask, kernel_size):
+    """Cluster near-horizontal Hough segments into lines, returns (slope, y at the image centre, length) sorted top to bottom."""
+    width = line_mask.shape[1]
+    segments = cv2.HoughLinesP(line_mask, 1, np.pi / 360, threshold=40, minLineLength=width // 15, maxLineGap=kernel_size * 2)
+    if segments is None:
+        return []
+    segments = segments.reshape(-1, 4).astype(float)
+    dx, dy = segments[:, 2] - segments[:, 0], segments[:, 3] - segments[:, 1]
+    segments = segments[np.abs(dy) < 0.15 * np.abs(dx)]
+
+    clusters = [] # [y at centre, [(slope, y at centre, length)]]
+    for x1, y1, x2, y2 in segments:
+        slope = (y2 - y1) / (x2 - x1)
+        centre_y = y1 + slope * (width / 2 - x1)
+        member = (slope, centre_y, np.hypot(x2 - x1, y2 - y1))
+        for cluster in clusters:
+            if abs(cluster[0] - centre_y) < kernel_size:
+                cluster[1].append(member)
+                break
+        else:
+            clusters.append([centre_y, [member]])
+
+    lines = []
+    for _, members in clusters:
+        members = np.array(members)
+        weights = members[:, 2] # longer segments count more
+        lines.append((float(np.average(members[:, 0], weights=weights)), float(np.average(members[:, 1], weights=weights)), float(weights.sum())))
+    return sorted(lines, key=lambda line: line[1])
+
+def intersect_lines(sideline, horizontal_line, width):
+    """Intersection of a sideline x = a * y + b with a horizontal line y = y0 + s * (x - width / 2)."""
+    a, b = sideline
+    s, y0, _ = horizontal_line
+    y = (y0 + s * (b - width / 2)) / (1 - s * a)
+    return a * y + b, y
+
+def line_coverage(line_mask, image_points):
+    """Fraction of the points that land on the line mask."""
+    xs, ys = np.round(image_points[:, 0]).astype(int), np.round(image_points[:, 1]).astype(int)
+    inside = (xs >= 0) & (xs < line_mask.shape[1]) & (ys >= 0) & (ys < line_mask.shape[0])
+    return float((line_mask[ys[inside], xs[inside]] > 0).sum()) / len(image_points)
+
+def detect_court_keypoints(frame, working_width=960):
+    """
+    Find the six service line keypoints of a padel court without a model.
+
+    The blue floor gives the sidelines, thin white lines found with Hough give the candidate service lines, and
+    every pair of candidates is scored by how well the regulation court projected through it matches the lines
+    and the ends of the floor. The centre line then refines the two T points.
+
+    Args:
+        frame (numpy.ndarray): BGR frame showing the court.
+        working_width (int): Width the frame is resized to before detection.
+
+    Returns:
+        tuple: (keypoints, score). keypoints is a flat list [x0, y0, x1, y1, ...] in frame pixels in the order
+            near service line left, T, right, far service line left, T, right, or None if no court was found.
+    """
+    scale = min(1.0, working_width / frame.shape[1])
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else frame
+    height, width = small.shape[:2]
+    kernel_size = max(3, width // 100) | 1 # odd, about 1% of the width
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+
+    floor_mask = find_floor_mask(hsv, kernel_size)
+    if floor_mask is None:
+        return None, 0.0
+    sidelines = find_sidelines(floor_mask, tolerance=3)
+    if sidelines is None:
+        return None, 0.0
+    line_mask = cv2.bitwise_and(find_line_mask(hsv, kernel_size), cv2.dilate(floor_mask, np.ones((kernel_size, kernel_size), np.uint8)))
+    horizontal_lines = find_horizontal_lines(line_mask, kernel_size)
+    hit_mask = cv2.dilate(line_mask, np.ones((3, 3), np.uint8)) # tolerate a pixel of error
+
+    # Where the floor starts and ends down the middle of the court, i.e. the bottom of both back walls
+    floor_rows = np.flatnonzero(floor_mask[:, width // 2])
+    if len(floor_rows) == 0:
+        return None, 0.0
+    floor_top, floor_bottom = floor_rows[0], floor_rows[-1]
+
+    # Template fit: try every pair of candidate lines as the far and near service lines
+    best_score, best_corners, best_homography = -np.inf, None, None
+    centre_points = court_line_points()[-40:]
+    for i, far_line in enumerate(horizontal_lines):
+        for near_line in horizontal_lines[i + 1:]:
+            corners = np.float32([
+                intersect_lines(sidelines[0], far_line, width), intersect_lines(sidelines[1], far_line, width),
+                intersect_lines(sidelines[0], near_line, width), intersect_lines(sidelines[1], near_line, width),
+            ])
+            homography = cv2.getPerspectiveTransform(COURT_CORNERS, corners)
+            line_score = line_coverage(hit_mask, project_court_points(homography, court_line_points()))
+            back_walls = project_court_points(homography, [[COURT_WIDTH / 2, 0], [COURT_WIDTH / 2, COURT_LENGTH]])
+            wall_error = (abs(back_walls[0, 1] - floor_top) + abs(back_walls[1, 1] - floor_bottom)) / height
+            score = line_score - 2 * wall_error
+            if score > best_score:
+                best_score, best_corners, best_homography = score, corners, homography
+    if best_corners is None:
+        return None, 0.0
+
+    # T points: where the painted centre line crosses the service lines, falling back to the template's centre
+    keypoints = project_court_points(best_homography, COURT_KEYPOINTS)
+    centre_line = find_centre_line(line_mask, project_court_points(best_homography, centre_points), kernel_size)
+    if centre_line is not None:
+        for t_idx, left_idx, right_idx in ((1, 0, 2), (4, 3, 5)):
+            (x0, y0), (x1, y1) = keypoints[left_idx], keypoints[right_idx]
+            a, b = centre_line
+            line_slope = (y1 - y0) / (x1 - x0)
+            y = (y0 + line_slope * (b - x0)) / (1 - line_slope * a) # service line through left and right, centre x = a * y + b
+            keypoints[t_idx] = (a * y + b, y)
+
+    keypoints = keypoints / scale
+    return [int(round(v)) for v in keypoints.reshape(-1)], float(best_score)
+
+def find_centre_line(line_mask, expected_points, kernel_size):
+    """Fit x = slope * y + intercept to the line pixels near the template's centre line, or None if too few."""
+    ys, xs = [], []
+    for y in np.arange(int(expected_points[:, 1].min()), int(expected_points[:, 1].max()) + 1):
+        expected_x = np.interp(y, expected_points[:, 1], expected_points[:, 0])
+        x0 = max(0, int(expected_x) - kernel_size)
+        columns = np.flatnonzero(line_mask[y, x0:int(expected_x) + kernel_size + 1])
+        if len(columns):
+            ys.append(y)
+            xs.append(x0 + columns.mean())
+    if len(ys) < 0.3 * (expected_points[:, 1].max() - expected_points[:, 1].min()): # mostly hidden by players
+        return None
+    return fit_line_robust(np.array(ys, dtype=float), np.array(xs, dtype=float), tolerance=1)
+
+def measure_keypoints_fit(frame, keypoints, n_points=40, offset=4):
+    """
+    Cheap check that the court lines are still where the keypoints say they are.
+
+    Samples points along the service and centre lines and counts those brighter and less saturated than the
+    floor a few pixels to either side. Only the sampled pixels are read, so it takes well under a millisecond.
+
+    Args:
+        frame (numpy.ndarray): BGR frame.
+        keypoints (list): Flat keypoint list from detect_court_keypoints.
+        n_points (int): Points sampled along each line.
+        offset (int): Distance in pixels of the floor pixels compared against.
+
+    Returns:
+        float: Fraction of sampled points that look like a painted line (players hide some of them).
+    """
+    homography = keypoints_homography(keypoints)
+    points = project_court_points(homography, court_line_points(n_points))
+    height, width = frame.shape[:2]
+
+    def whiteness(xs, ys):
+        xs, ys = np.clip(np.round(xs).astype(int), 0, width - 1), np.clip(np.round(ys).astype(int), 0, height - 1)
+        pixels = frame[ys, xs].astype(np.int16)
+        return pixels.min(axis=1) # white lines are bright in every channel, the blue floor is not
+
+    on_line = whiteness(points[:, 0], points[:, 1])
+    n_horizontal = 2 * n_points # service line points are compared above and below, centre line points left and right
+    dx = np.r_[np.zeros(n_horizontal), np.full(len(points) - n_horizontal, offset)]
+    dy = np.r_[np.full(n_horizontal, offset), np.zeros(len(points) - n_horizontal)]
+    background = np.maximum(whiteness(points[:, 0] - dx, points[:, 1] - dy), whiteness(points[:, 0] + dx, points[:, 1] + dy))
+    return float(np.mean(on_line > background + 30))
+
+def frame_fingerprint(frame, hash_size=16):
+    """Difference hash of the frame, nearly identical for frames of the same camera view."""
+    grey = cv2.cvtColor(cv2.resize(frame, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    bits = (grey[:, 1:] > grey[:, :-1]).reshape(-1)
+    return np.packbits(bits).tobytes().hex()
+
+def fingerprint_distance(fingerprint_a, fingerprint_b):
+    return bin(int(fingerprint_a, 16) ^ int(fingerprint_b, 16)).count("1")
+
+class CourtKeypointCache():
+    def __init__(self, cache_path, max_distance=24):
+        """
+        Court keypoints of every camera view seen before, looked up by frame fingerprint.
+
+        Args:
+            cache_path (str): JSON file holding the cached views.
+            max_distance (int): Maximum number of differing fingerprint bits (of 256) for the same view.
+        """
+        self.cache_path = cache_path
+        self.max_distance = max_distance
+        self.entries = []
+        if os.path.exists(cache_path):
+            with open(cache_path, "r") as f:
+                self.entries = json.load(f)
+
+    def lookup(self, frame):
+        fingerprint = frame_fingerprint(frame)
+        candidates = [entry for entry in self.entries if entry["frame_shape"] == list(frame.shape)]
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda entry: fingerprint_distance(entry["fingerprint"], fingerprint))
+        if fingerprint_distance(best["fingerprint"], fingerprint) > self.max_distance:
+            return None
+        return best["keypoints"]
+
+    def store(self, frame, keypoints):
+        self.entries.append({"fingerprint": frame_fingerprint(frame), "frame_shape": list(frame.shape), "keypoints": keypoints})
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.cache_path) # atomic, a crash never leaves a partial cache
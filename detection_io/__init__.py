@@ -0,0 +1,2 @@
+from .detection_cache import *
+from .columnar_detections import *
\ No newline at end of file
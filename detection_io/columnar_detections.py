@@ -0,0 +1,155 @@
+import os
+import json
+import pickle
+import numpy as np
+
+COLUMNS = ("frame", "track_id", "cls", "conf", "boxes", "offsets")
+
+class ColumnarDetections():
+    def __init__(self, frame, track_id, cls, conf, boxes, offsets):
+        """
+        Detections for a whole video stored as flat NumPy columns, one row per box.
+
+        Rows are sorted by frame and offsets[i]:offsets[i + 1] gives the rows of frame i, so any frame range can
+        be read without touching the rest of the file when the columns are memory-mapped.
+
+        Args:
+            frame (numpy.ndarray): (N,) int32 frame index of each box.
+            track_id (numpy.ndarray): (N,) int32 track ID of each box.
+            cls (numpy.ndarray): (N,) int16 class ID of each box, -1 if unknown.
+            conf (numpy.ndarray): (N,) float32 confidence of each box, NaN if unknown.
+            boxes (numpy.ndarray): (N, 4) float64 x1, y1, x2, y2 of each box, so converting from JSON or pickle is lossless.
+            offsets (numpy.ndarray): (n_frames + 1,) int64 row offset of each frame.
+        """
+        self.frame = frame
+        self.track_id = track_id
+        self.cls = cls
+        self.conf = conf
+        self.boxes = boxes
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1 # number of frames
+
+    @classmethod
+    def from_frame_dicts(cls, detections, object_cls=-1):
+        """
+        Build columns from the list-of-dicts layout ({track_id: [x1, y1, x2, y2]} per frame).
+
+        Args:
+            detections (list): Per-frame detection dicts, as returned by detect_frames or loaded from JSON.
+            object_cls (int): Class ID stored for every box, -1 if unknown.
+        """
+        counts = np.fromiter((len(frame_dict) for frame_dict in detections), dtype=np.int64, count=len(detections))
+        offsets = np.zeros(len(detections) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        n_rows = int(offsets[-1])
+        track_id = np.empty(n_rows, dtype=np.int32)
+        boxes = np.empty((n_rows, 4), dtype=np.float64) # float32 would round interpolated positions on conversion
+        row = 0
+        for frame_dict in detections:
+            for key, bbox in frame_dict.items():
+                track_id[row] = int(key) # JSON turns the integer keys into strings
+                boxes[row] = bbox
+                row += 1
+
+        frame = np.repeat(np.arange(len(detections), dtype=np.int32), counts)
+        return cls(frame, track_id, np.full(n_rows, object_cls, dtype=np.int16), np.full(n_rows, np.nan, dtype=np.float32), boxes, offsets)
+
+    def rows(self, start, stop=None):
+        """Return the (first, last) row range covering frames start to stop (exclusive)."""
+        stop = start + 1 if stop is None else stop
+        return int(self.offsets[start]), int(self.offsets[stop])
+
+    def frame_dict(self, frame_idx):
+        """Return the detections of one frame as {track_id: [x1, y1, x2, y2]}."""
+        first, last = self.rows(frame_idx)
+        return dict(zip(self.track_id[first:last].tolist(), self.boxes[first:last].tolist()))
+
+    def iter_frame_dicts(self, start=0, stop=None):
+        """Yield per-frame detection dicts for frames start to stop (exclusive), reading only those rows."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for frame_idx in range(start, stop):
+            yield self.frame_dict(frame_idx)
+
+    def to_frame_dicts(self):
+        return list(self.iter_frame_dicts())
+
+    def frame_range(self, start, stop):
+        """Return the detections of frames start to stop (exclusive) as a new ColumnarDetections of views."""
+        first, last = self.rows(start, stop)
+        offsets = self.offsets[start:stop + 1] - first
+        return ColumnarDetections(self.frame[first:last] - start, self.track_id[first:last], self.cls[first:last], self.conf[first:last], self.boxes[first:last], offsets)
+
+    def select_rows(self, mask):
+        """Return a new ColumnarDetections keeping only the rows where mask is True, with the same frames."""
+        mask = np.asarray(mask, dtype=bool)
+        counts = np.bincount(self.frame[mask], minlength=len(self))
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return ColumnarDetections(self.frame[mask], self.track_id[mask], self.cls[mask], self.conf[mask], self.boxes[mask], offsets)
+
+    def filter_track_ids(self, track_ids):
+        """Return a new ColumnarDetections keeping only the boxes of the given track IDs."""
+        return self.select_rows(np.isin(self.track_id, np.asarray(list(track_ids), dtype=self.track_id.dtype)))
+
+    def save(self, path):
+        """Save each column as a .npy file inside the directory at path."""
+        os.makedirs(path, exist_ok=True)
+        for column in COLUMNS:
+            np.save(os.path.join(path, f"{column}.npy"), np.ascontiguousarray(getattr(self, column)))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"format": "columnar_detections", "version": 1, "n_frames": len(self), "n_rows": len(self.frame)}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a saved store; with mmap=True rows are only read from disk when they are accessed."""
+        mmap_mode = "r" if mmap else None
+        columns = {column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode=mmap_mode) for column in COLUMNS}
+        return cls(**columns)
+
+def is_columnar_detections(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, "meta.json"))
+
+def load_detections(path, mmap=True):
+    """
+    Load detections from a columnar store, a JSON list of dicts or a pickle stub.
+
+    Returns:
+        ColumnarDetections: The detections, memory-mapped when read from a columnar store.
+    """
+    if is_columnar_detections(path):
+        return ColumnarDetections.load(path, mmap=mmap)
+    if path.endswith(".json"):
+        with open(path, "r") as f:
+            return ColumnarDetections.from_frame_dicts(json.load(f))
+    with open(path, "rb") as f:
+        return ColumnarDetections.from_frame_dicts(pickle.load(f))
+
+def save_detections(detections, path):
+    """
+    Save detections as a columnar store, or as JSON/pickle when path ends with .json/.pkl.
+
+    Args:
+        detections (list or ColumnarDetections): Per-frame detection dicts or columnar detections.
+        path (str): Output path; a directory for the columnar store.
+    """
+    if path.endswith(".json") or path.endswith(".pkl"):
+        if isinstance(detections, ColumnarDetections):
+            detections = detections.to_frame_dicts()
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump(detections, f)
+        else:
+            with open(path, "wb") as f:
+                pickle.dump(detections, f)
+        return
+
+    if not isinstance(detections, ColumnarDetections):
+        detections = ColumnarDetections.from_frame_dicts(detections)
+    detections.save(path)
+
+def convert_detections(input_path, output_path):
+    """Convert detections between the columnar, JSON and pickle layouts."""
+    save_detections(load_detections(input_path, mmap=False), output_path)
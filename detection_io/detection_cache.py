@@ -0,0 +1,154 @@
+import os
+import json
+import pickle
+import hashlib
+import sys
+sys.path.append("../")
+from utils import *
+
+def hash_file(path, block_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's contents."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+class DetectionCache():
+    def __init__(self, cache_dir, video_path, model_path, inference_params=None, chunk_size=500, overlap=30):
+        """
+        Content-addressed store for per-frame detections, split into fixed-size chunks.
+
+        The cache key is built from the video contents, the model weights and the inference parameters, so
+        changing any of them starts a fresh cache instead of reusing stale detections. Every finished chunk is
+        written to its own file, so an interrupted run resumes from the last finished chunk.
+
+        Tracked detections (inference_params method "track") carry tracker state from chunk to chunk. Resuming
+        them re-runs the overlap frames before the first missing chunk to warm the tracker up, maps the new
+        track IDs onto the cached ones by box overlap on those frames, and recomputes every chunk after it.
+
+        Args:
+            cache_dir (str): Directory holding all detection caches.
+            video_path (str): Path to the video file the detections belong to.
+            model_path (str): Path to the model weights used for detection.
+            inference_params (dict, optional): Parameters that change the detections (e.g. conf threshold).
+            chunk_size (int): Number of frames stored per chunk file.
+            overlap (int): Frames before the first missing chunk used to warm up a resumed tracker and match its IDs.
+        """
+        self.cache_dir = cache_dir
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.tracked = (inference_params or {}).get("method") == "track" # IDs depend on every earlier frame
+        os.makedirs(cache_dir, exist_ok=True)
+
+        key_fields = {
+            "video": self.file_hash(video_path),
+            "model": self.file_hash(model_path),
+            "params": inference_params or {},
+            "chunk_size": chunk_size,
+        }
+        self.key = hashlib.sha256(json.dumps(key_fields, sort_keys=True).encode()).hexdigest()[:24]
+        self.path = os.path.join(cache_dir, self.key)
+        os.makedirs(self.path, exist_ok=True)
+
+        manifest = dict(key_fields, video_path=video_path, model_path=model_path)
+        with open(os.path.join(self.path, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    def file_hash(self, path):
+        """Hash a file, reusing the previous digest while its size and modification time are unchanged."""
+        index_path = os.path.join(self.cache_dir, "file_hashes.json")
+        index = {}
+        if os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                index = json.load(f)
+
+        stat = os.stat(path)
+        entry_key = os.path.abspath(path)
+        entry = index.get(entry_key)
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return entry["sha256"]
+
+        digest = hash_file(path)
+        index[entry_key] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": digest}
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+
+        return digest
+
+    def chunk_path(self, chunk_idx):
+        return os.path.join(self.path, f"chunk_{chunk_idx:06d}.pkl")
+
+    def load_chunk(self, chunk_idx):
+        """Return the detections stored for a chunk, or None if the chunk has not been finished."""
+        chunk_path = self.chunk_path(chunk_idx)
+        if not os.path.exists(chunk_path):
+            return None
+        with open(chunk_path, "rb") as f:
+            return pickle.load(f)
+
+    def save_chunk(self, chunk_idx, detections):
+        """Write a finished chunk atomically so a crash never leaves a partial chunk behind."""
+        chunk_path = self.chunk_path(chunk_idx)
+        tmp_path = f"{chunk_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(detections, f)
+        os.replace(tmp_path, chunk_path)
+
+    def detect(self, frames, detect_batch, batch_size=1):
+        """
+        Yield detections for every frame, running inference only on chunks that are not cached yet.
+
+        Frames of cached chunks are still consumed from the iterable but never reach the model. For tracked
+        detections, once a chunk is missing that chunk and every later one are recomputed with one continuous
+        tracker, warmed over the overlap frames and with its IDs mapped onto the cached chunks' IDs.
+
+        Args:
+            frames (iterable): Frames in video order.
+            detect_batch (callable): Function that takes a list of frames and returns a list of detection dicts.
+            batch_size (int): Number of frames sent through the model per inference call.
+
+        Yields:
+            dict: Detections for each frame, in video order.
+        """
+        resumed = False # a tracked run recomputes everything after its first missing chunk
+        id_map, next_free_id = None, 1
+        previous_frames, previous_detections = [], []
+        for chunk_idx, chunk_frames in enumerate(batch_frames(frames, self.chunk_size)):
+            chunk_detections = None if resumed else self.load_chunk(chunk_idx)
+            if chunk_detections is None or len(chunk_detections) != len(chunk_frames): # not cached or truncated
+                if self.tracked and not resumed and previous_frames: # warm the tracker up and match its IDs to the cached ones
+                    warm_detections = []
+                    for batch in batch_frames(previous_frames, batch_size):
+                        warm_detections.extend(detect_batch(batch))
+                    id_map = match_track_ids(previous_detections, warm_detections)
+                resumed = self.tracked
+                chunk_detections = []
+                for batch in batch_frames(chunk_frames, batch_size):
+                    chunk_detections.extend(detect_batch(batch))
+                if id_map is not None:
+                    chunk_detections, next_free_id = self.remap_ids(chunk_detections, id_map, next_free_id)
+                self.save_chunk(chunk_idx, chunk_detections)
+            elif self.tracked:
+                next_free_id = max([next_free_id] + [track_id + 1 for frame_dict in chunk_detections for track_id in frame_dict])
+
+            if self.tracked and not resumed:
+                previous_frames = chunk_frames[-self.overlap:] if self.overlap > 0 else []
+                previous_detections = chunk_detections[-len(previous_frames):] if previous_frames else []
+            yield from chunk_detections
+
+    # Function to rename track IDs with a map from a resumed tracker's IDs to cached ones, unmatched IDs get new ones
+    @staticmethod
+    def remap_ids(detections, id_map, next_free_id):
+        remapped = []
+        for frame_dict in detections:
+            remapped_dict = {}
+            for track_id, bbox in frame_dict.items():
+                if track_id not in id_map: # player the cached chunks never saw
+                    id_map[track_id] = next_free_id
+                    next_free_id += 1
+                remapped_dict[id_map[track_id]] = bbox
+            remapped.append(remapped_dict)
+        return remapped, next_free_id
@@ -1,20 +1,17 @@
 import os
 import cv2
-import json
 import argparse
 import time
-import yt_dlp
+from detection_io import *
+from utils import *
+from pipeline.parallel_render import draw_saved_detections, render_video_parallel
 
-def main(input_video, player_detections, ball_detections):
-    # Load YOLO detections (list where each item is detections for a frame)
-    with open(player_detections, "r") as file:
-        player_detections = json.load(file)
-
-    with open(ball_detections, "r") as file:
-        ball_detections = json.load(file)
+def main(input_video, player_detections, ball_detections, metrics_dir=None, trace=False, workers=1, segment_length=None):
+    metrics = Metrics(trace=trace) if metrics_dir is not None else None
 
     if "youtube.com" in input_video:
         # Extract direct stream URL from youtube
+        import yt_dlp # only needed for youtube sources
         ydl_opts = {"format": "best[ext=mp4]"}
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             info_dict = ydl.extract_info(input_video, download=False)
@@ -26,43 +23,35 @@ def main(input_video, player_detections, ball_detections):
         _, file_name = os.path.split(input_video_path)
         name, _ = os.path.splitext(file_name)
 
-    # Open video
-    cap = cv2.VideoCapture(input_video_path)
-
-    # Get video properties
-    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-
-    # Define codec and create VideoWriter object for AVI output
     # output_path = f"/content/drive/MyDrive/Colab Notebooks/padel_vision/{name}_output.avi"
     output_path = f"./output_media/{name}_output.avi"
-    fourcc = cv2.VideoWriter_fourcc(*"XVID")  # Use XVID for AVI format
-    out = cv2.VideoWriter(output_path, fourcc, fps, (frame_width, frame_height))
-
-    # Function to draw bounding boxes
-    def draw_bounding_boxes(frame, detections, color):
-        for obj_id, coords in detections.items():
-            x1, y1, x2, y2 = coords  # [x1, y1, x2, y2]
-            thickness = 2
-            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, thickness)
-            cv2.putText(frame, f"ID: {obj_id}", (int(x1), int(y1)-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-        return frame
 
-    # Process frame by frame
-    frame_idx = 0
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break  # End of video
+    # Render frame-range segments on worker processes and join them (needs a seekable file, not a stream)
+    if workers > 1 and os.path.isfile(input_video_path):
+        result = render_video_parallel(input_video_path, player_detections, ball_detections, output_path, n_workers=workers, segment_length=segment_length, metrics=metrics)
+        print(f"Rendered {result['frames']} frames in {result['segments']} segments (joined by {result['join']}). Output saved to:", output_path)
+        if metrics is not None:
+            metrics.count("frames_drawn", result["frames"])
+            metrics.sample_memory()
+            metrics.export(metrics_dir, f"{name}_draw")
+        return
+
+    # Load YOLO detections (columnar stores are memory-mapped, JSON and pickle files are converted on load)
+    player_detections = load_detections(player_detections)
+    ball_detections = load_detections(ball_detections)
 
-        # Get detections for this frame (assuming yolo_detections matches video length)
-        p_detections = player_detections[frame_idx] if frame_idx < len(player_detections) else []
-        b_detections = ball_detections[frame_idx] if frame_idx < len(ball_detections) else []
+    # Open video, decoding ahead on a background thread
+    reader = VideoReader(input_video_path, metrics=metrics)
 
-        # Draw bounding boxes
-        processed_frame = draw_bounding_boxes(frame, p_detections, (0, 255, 0))
-        processed_frame = draw_bounding_boxes(processed_frame, b_detections, (0, 0, 255))
+    # Create a writer with the source fps and resolution for AVI output, encoding on a background thread
+    out = VideoWriter.like(reader, output_path, fourcc="XVID", metrics=metrics)  # Use XVID for AVI format
+
+    # Process frame by frame
+    frame_idx = 0
+    for frame in reader.read():
+        # Draw bounding boxes for this frame (assuming yolo_detections matches video length)
+        with time_stage(metrics, "drawing", frame_idx):
+            processed_frame = draw_saved_detections(frame, frame_idx, player_detections, ball_detections)
 
         # Write processed frame to output video
         out.write(processed_frame)
@@ -70,22 +59,34 @@ def main(input_video, player_detections, ball_detections):
         frame_idx += 1
 
     # Release resources
-    cap.release()
-    out.release()
-    cv2.destroyAllWindows()
+    out.close()
 
     print("Processing complete. Output saved to:", output_path)
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Add bbox to a video file for player and ball tracking.")
+    if metrics is not None:
+        metrics.count("frames_drawn", frame_idx)
+        metrics.sample_memory()
+        metrics.export(metrics_dir, f"{name}_draw")
+
+def add_arguments(parser):
     parser.add_argument("input_video", type=str, help="Path to the input video file")
-    parser.add_argument("player_detections", type=str, help="Path to the player detections JSON file")
-    parser.add_argument("ball_detections", type=str, help="Path to the ball detections JSON file")
+    parser.add_argument("player_detections", type=str, help="Path to the player detections (columnar directory, JSON or pickle)")
+    parser.add_argument("ball_detections", type=str, help="Path to the ball detections (columnar directory, JSON or pickle)")
+    parser.add_argument("--metrics-dir", type=str, default=None, help="Export per-stage timings as JSON and Prometheus text to this directory")
+    parser.add_argument("--trace", action="store_true", help="Also export a Chrome trace (chrome://tracing, Perfetto) of every timed stage")
+    parser.add_argument("--workers", type=int, default=1, help="Render frame-range segments on this many processes and join them")
+    parser.add_argument("--segment-length", type=int, default=None, help="Frames per segment, defaults to an even split over the workers")
 
+def run(args):
+    main(args.input_video, args.player_detections, args.ball_detections, metrics_dir=args.metrics_dir, trace=args.trace, workers=args.workers, segment_length=args.segment_length)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add bbox to a video file for player and ball tracking.")
+    add_arguments(parser)
     args = parser.parse_args()
 
     start_time = time.time()
-    main(args.input_video, args.player_detections, args.ball_detections)
+    run(args)
     end_time = time.time()
     elapsed_time = end_time - start_time
-    print(f"Execution time: {elapsed_time:.2f} seconds")
\ No newline at end of file
+    print(f"Execution time: {elapsed_time:.2f} seconds")
@@ -0,0 +1,67 @@
+from detection_io import *
+from utils import *
+from pipeline.clip_export import export_clips, find_play_ranges
+import os
+import time
+import argparse
+
+# Function to parse a START-END range in frames, or in seconds when both ends end with "s" (e.g. 12.5s-20s)
+def parse_range(text, reader):
+    start, _, end = text.partition("-")
+    if start.endswith("s") and end.endswith("s"):
+        return reader.frame_at_time(float(start[:-1])), reader.frame_at_time(float(end[:-1]))
+    return int(start), int(end)
+
+def main(input_video_path, ranges=None, player_detections=None, ball_detections=None, reel=False, output_path=None, max_gap_s=1.0, min_duration_s=2.0, padding_s=1.0, metrics_dir=None, trace=False):
+    metrics = Metrics(trace=trace) if metrics_dir is not None else None
+    name, _ = os.path.splitext(os.path.basename(input_video_path))
+    reader = VideoReader(input_video_path, prefetch=0)
+
+    # Explicit ranges, or the stretches with the ball in play from the saved ball detections
+    if ranges:
+        frame_ranges = [parse_range(text, reader) for text in ranges]
+    elif ball_detections is not None:
+        frame_ranges = find_play_ranges(load_detections(ball_detections), reader.fps, max_gap_s=max_gap_s, min_duration_s=min_duration_s, padding_s=padding_s)
+    else:
+        raise ValueError("Give --ranges or --ball-detections to find the ranges from")
+    if not frame_ranges:
+        print("No ranges to export.")
+        return
+
+    output_path = output_path or (f"./output_media/{name}_reel.avi" if reel else f"./output_media/{name}_clips")
+    result = export_clips(input_video_path, frame_ranges, output_path, player_detections, ball_detections, reel=reel, metrics=metrics)
+    print(f"Exported {result['frames']} of {reader.n_frames} frames in {len(result['ranges'])} ranges, decoding {result['frames_decoded']}:")
+    for start, end in result["ranges"]:
+        print(f"    frames {start}-{end} ({(end - start) / reader.fps:.1f} s)")
+    print("Output saved to:", output_path)
+
+    if metrics is not None:
+        metrics.sample_memory()
+        metrics.export(metrics_dir, f"{name}_clips")
+
+def add_arguments(parser):
+    parser.add_argument("input_video", type=str, help="Path to the input video file")
+    parser.add_argument("--ranges", type=str, nargs="+", default=None, help="Ranges to export as START-END frames (end exclusive) or seconds (12.5s-20s)")
+    parser.add_argument("--player-detections", type=str, default=None, help="Player detections to draw (columnar directory, JSON or pickle)")
+    parser.add_argument("--ball-detections", type=str, default=None, help="Raw ball detections to draw, and to find the ranges with the ball in play when --ranges isn't given")
+    parser.add_argument("--reel", action="store_true", help="Join the ranges into one video instead of a clip per range")
+    parser.add_argument("--output-path", type=str, default=None, help="Reel file or clip directory, under ./output_media by default")
+    parser.add_argument("--max-gap-s", type=float, default=1.0, help="Longer stretches without the ball end a range")
+    parser.add_argument("--min-duration-s", type=float, default=2.0, help="Shorter ranges with the ball in play are skipped")
+    parser.add_argument("--padding-s", type=float, default=1.0, help="Time added before and after each range found from the ball detections")
+    parser.add_argument("--metrics-dir", type=str, default=None, help="Export per-stage timings as JSON and Prometheus text to this directory")
+    parser.add_argument("--trace", action="store_true", help="Also export a Chrome trace (chrome://tracing, Perfetto) of every timed stage")
+
+def run(args):
+    main(args.input_video, ranges=args.ranges, player_detections=args.player_detections, ball_detections=args.ball_detections, reel=args.reel, output_path=args.output_path, max_gap_s=args.max_gap_s, min_duration_s=args.min_duration_s, padding_s=args.padding_s, metrics_dir=args.metrics_dir, trace=args.trace)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export frame ranges of a video as clips or a highlight reel, decoding from the keyframe before each range.")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    run(args)
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    print(f"Execution time: {elapsed_time:.2f} seconds")
@@ -1,82 +1,74 @@
-import cv2
 import os
+import json
 import time
+import shlex
+import argparse
 from utils import *
 from trackers import *
 from court_detector import *
-import matplotlib.pyplot as plt
-
-
-def main():
-    # Read video (simulating a live video feed)
-    input_video_path = "./input_media/padel_point.mp4"
-    cap = cv2.VideoCapture(input_video_path)
-
-    if not cap.isOpened():
+from pipeline import *
+
+
+def create_sink(sink, frame_size, fps, output_path=None, pipe_command=None, shm_name="padel_vision_live", metrics=None):
+    # Outputs never block the tracking loop, frames they can't keep up with are dropped
+    if sink == "file":
+        return create_file_sink(output_path or "./output_media/live_output.avi", fps, frame_size, metrics=metrics)
+    if sink == "pipe":
+        return create_pipe_sink(shlex.split(pipe_command) if pipe_command else None, metrics=metrics)
+    if sink == "shm":
+        return create_shared_memory_sink(shm_name, (frame_size[1], frame_size[0], 3), metrics=metrics)
+    raise ValueError(f"Unknown sink {sink!r}, expected file, pipe or shm")
+
+def main(source="./input_media/padel_point.mp4", metrics_dir=None, trace=False, budget_ms=None, sink="file", output_path=None, pipe_command=None, shm_name="padel_vision_live", pace=None):
+    # Read video (a video file is paced at its frame rate to simulate a live feed)
+    metrics = Metrics(trace=trace)
+    reader = VideoReader(source, prefetch=0) # opened once, a pipe or camera loses frames if probed separately
+    if not reader.opened:
         print("Error: Could not open video file.")
         return
 
     # Instantiate models
-    player_tracker = PlayerTracker(model_path="./models/yolo11n.pt")
-    ball_tracker = BallTracker(model_path="./models/yolov5n6u_ball.pt")
-    court_detector = CourtDetector(is_manual=True)
-
-    # Get the first frame to detect court keypoints
-    ret, first_frame = cap.read()
-    if not ret:
-        print("Error: Could not read first frame.")
-        return
-
-    court_keypoints = court_detector.create_keypoints(first_frame, save_path="./tracker_stubs/court_keypoints.json")
-    print("Manual Court Keypoints:", court_keypoints)
-
-    # Prepare for real-time processing
-    frame_idx = 0
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break  # Break if video ends
-
-        start_time = time.time()  # Measure per-frame processing time
+    player_tracker = PlayerTracker(model_path="./models/yolo11n.pt", metrics=metrics)
+    ball_tracker = BallTracker(model_path="./models/yolov5n6u_ball.pt", metrics=metrics)
+    court_detector = CourtDetector(is_manual=False) # no one to click keypoints on a live feed
+
+    # Always work on the newest frame within the latency budget (one frame interval by default), degrading under load
+    output = create_sink(sink, (reader.width, reader.height), reader.fps, output_path, pipe_command, shm_name, metrics)
+    processor = RealtimeProcessor(player_tracker, ball_tracker, output, budget_s=budget_ms / 1000 if budget_ms else None, court_detector=court_detector, metrics=metrics)
+    try:
+        report = processor.run(reader, pace=pace)
+    finally:
+        output.close()
 
-        # Track players and ball
-        player_detections = player_tracker.detect_frame(frame)
-        ball_detections = ball_tracker.detect_frame(frame)
-        if ball_detections:
-            ball_detections = ball_tracker.interpolate_ball_position([ball_detections])[0]
-        else:
-            ball_detections = []
-
-        # Draw detections
-        frame = player_tracker.draw_bounding_boxes([frame], [player_detections])[0]
-        if len(ball_detections) > 0:
-            frame = ball_tracker.draw_bounding_boxes([frame], [ball_detections])[0]
-        frame = court_detector.draw_keypoints(frame, court_keypoints)
-
-        # Add frame number
-        cv2.putText(frame, f"Frame {frame_idx}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 255), 2)
-
-        # Show frame (simulating live video)
-        # cv2.imshow("Simulated Live Tracking", frame)
-
-        plt.imshow(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        plt.show()
-
-        # Simulate real-time speed (assuming 30 FPS video)
-        elapsed_time = time.time() - start_time
-        wait_time = max(1, int(33 - (elapsed_time * 1000)))  # 33ms for ~30 FPS
-        if cv2.waitKey(wait_time) & 0xFF == ord('q'):
-            break  # Exit if 'q' is pressed
-
-        frame_idx += 1
-
-    cap.release()
-    cv2.destroyAllWindows()
     print("Processing complete.")
+    print(json.dumps(report, indent=2))
+
+    if metrics_dir is not None:
+        metrics.sample_memory()
+        metrics.export(metrics_dir, "live")
+        with open(os.path.join(metrics_dir, "live_report.json"), "w") as f:
+            json.dump(report, f, indent=2)
+
+def add_arguments(parser):
+    parser.add_argument("--source", type=str, default="./input_media/padel_point.mp4", help="Camera, pipe, URL or video file to track")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Per-frame latency budget, defaults to one frame interval of the source")
+    parser.add_argument("--sink", type=str, default="file", choices=("file", "pipe", "shm"), help="Where annotated frames go: a video file, raw BGR on a pipe, or shared memory")
+    parser.add_argument("--output-path", type=str, default=None, help="Video file for the file sink")
+    parser.add_argument("--pipe-command", type=str, default=None, help="Command reading raw BGR frames on stdin for the pipe sink (e.g. ffplay), stdout if not given")
+    parser.add_argument("--shm-name", type=str, default="padel_vision_live", help="Name of the shared memory block for the shm sink")
+    parser.add_argument("--no-pace", action="store_true", help="Process a video file as fast as possible instead of at its frame rate")
+    parser.add_argument("--metrics-dir", type=str, default=None, help="Export per-stage timings as JSON and Prometheus text to this directory")
+    parser.add_argument("--trace", action="store_true", help="Also export a Chrome trace (chrome://tracing, Perfetto) of every timed stage")
+
+def run(args):
+    main(args.source, metrics_dir=args.metrics_dir, trace=args.trace, budget_ms=args.budget_ms, sink=args.sink, output_path=args.output_path, pipe_command=args.pipe_command, shm_name=args.shm_name, pace=False if args.no_pace else None)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track players and ball on a live feed in real time, dropping stale frames to stay within a latency budget.")
+    add_arguments(parser)
+    args = parser.parse_args()
+
     start_time = time.time()
-    main()
+    run(args)
     elapsed_time = time.time() - start_time
-    print(f"Total execution time: {elapsed_time:.2f} seconds")
\ No newline at end of file
+    print(f"Total execution time: {elapsed_time:.2f} seconds")
@@ -1,52 +1,129 @@
 from utils import *
 from trackers import *
 from court_detector import *
+from pipeline import *
 import os
 import time
 import cv2
 import argparse
 
-def main(input_video_path):
+def create_trackers(ball_roi=None, player_keyframe_interval=1, metrics=None, model_cache=None, backend=None):
+    # Models come from the cache when running in a model worker, otherwise they are loaded for this run
+    player_model_path, ball_model_path = "./models/yolov5nu.pt", "./models/yolov5n6u_ball.pt"
+    player_model = model_cache.get(player_model_path, backend) if model_cache is not None else None
+    ball_model = model_cache.get(ball_model_path, backend) if model_cache is not None else None
+
+    player_tracker = PlayerTracker(model_path=player_model_path, model=player_model, metrics=metrics, backend=backend)
+    if player_keyframe_interval > 1: # run the player detector on keyframes only, optical flow in between
+        player_tracker = KeyframePlayerTracker(player_tracker, keyframe_interval=player_keyframe_interval)
+    ball_tracker = BallTracker(model_path=ball_model_path, roi_size=ball_roi, model=ball_model, metrics=metrics, backend=backend)
+
+    return player_tracker, ball_tracker
+
+def print_tracker_stats(player_tracker, ball_tracker):
+    if ball_tracker.roi_size is not None:
+        print(f"Ball search pixels saved: {ball_tracker.roi_stats()['pixels_saved']:.1%}")
+    if isinstance(player_tracker, KeyframePlayerTracker):
+        print(f"Player detector keyframes: {player_tracker.cadence_stats()['keyframe_fraction']:.1%} of frames")
+
+def main(input_video_path, stream=False, batch_size=1, concurrent=False, ball_roi=None, player_keyframe_interval=1, metrics_dir=None, trace=False, manual_court=False, model_cache=None, backend="torch", precision="fp32", calibration_videos=None):
+    # Per-stage timings, queue depths and memory, exported when metrics_dir is given
+    metrics = Metrics(trace=trace) if metrics_dir is not None else None
+
+    # Optional ONNX Runtime / OpenVINO backend, INT8 is calibrated on the input video unless other footage is given
+    backend = InferenceBackend(backend, precision, calibration_videos=calibration_videos or [input_video_path]) if backend != "torch" else None
+    _, file_name = os.path.split(input_video_path)
+    name, _ = os.path.splitext(file_name)
+
+    if stream or concurrent:
+        main_stream(input_video_path, batch_size, concurrent, ball_roi, player_keyframe_interval, metrics, manual_court, model_cache, backend)
+    else:
+        main_batch(input_video_path, batch_size, ball_roi, player_keyframe_interval, metrics, manual_court, model_cache, backend)
+
+    if metrics is not None:
+        metrics.sample_memory()
+        metrics.export(metrics_dir, name)
+
+def main_batch(input_video_path, batch_size=1, ball_roi=None, player_keyframe_interval=1, metrics=None, manual_court=False, model_cache=None, backend=None):
     # Read video
     # input_video_path = "./input_media/padel_point.mp4"
-    video_frames = read_video(input_video_path)
+    reader = VideoReader(input_video_path, metrics=metrics)
+    video_frames = list(reader.read())
 
     # Detect players and ball
-    player_tracker = PlayerTracker(model_path="./models/yolov5nu.pt")
-    ball_tracker = BallTracker(model_path="./models/yolov5n6u_ball.pt")
+    player_tracker, ball_tracker = create_trackers(ball_roi, player_keyframe_interval, metrics, model_cache, backend)
 
-    player_detections = player_tracker.detect_frames(video_frames, read_from_stub=False, stub_path="./tracker_stubs/player_detections.pkl")
-    ball_detections = ball_tracker.detect_frames(video_frames, read_from_stub=False, stub_path="./tracker_stubs/ball_detections.pkl")
+    # Reuse detections cached for this video, model and parameters, resuming from the last finished chunk
+    player_detections = player_tracker.detect_frames(video_frames, batch_size=batch_size, cache=player_tracker.create_cache(input_video_path))
+    ball_detections = ball_tracker.detect_frames(video_frames, batch_size=batch_size, cache=ball_tracker.create_cache(input_video_path))
     ball_detections = ball_tracker.interpolate_ball_position(ball_detections)
+    print_tracker_stats(player_tracker, ball_tracker)
 
     # Detect court lines (choice of manual or auto detection) (pass first frame of video)
-    court_detector = CourtDetector(is_manual=True)
+    court_detector = CourtDetector(is_manual=manual_court)
     court_keypoints = court_detector.create_keypoints(video_frames[0], save_path="./tracker_stubs/court_keypoints.json")
     
-    # Draw bounding boxes around players and ball
-    output_video_frames = player_tracker.draw_bounding_boxes(video_frames, player_detections)
-    output_video_frames = ball_tracker.draw_bounding_boxes(output_video_frames, ball_detections)
+    with time_stage(metrics, "drawing"):
+        # Draw bounding boxes around players and ball
+        output_video_frames = player_tracker.draw_bounding_boxes(video_frames, player_detections)
+        output_video_frames = ball_tracker.draw_bounding_boxes(output_video_frames, ball_detections)
 
-    # Draw court lines
-    output_video_frames = court_detector.draw_keypoints_on_video(output_video_frames, court_keypoints)
+        # Draw court lines
+        output_video_frames = court_detector.draw_keypoints_on_video(output_video_frames, court_keypoints)
 
-    # Add frame number to video
-    for i, frame in enumerate(output_video_frames):
-        cv2.putText(frame, f"Frame {i}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 255), 2)
+        # Add frame number to video
+        for i, frame in enumerate(output_video_frames):
+            cv2.putText(frame, f"Frame {i}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 255), 2)
 
     # Save video with player detections and bounding boxes overlay
     _, file_name = os.path.split(input_video_path)
     name, _ = os.path.splitext(file_name)
     output_video_path = f"./output_media/{name}_output.avi"
-    save_video(output_video_frames, output_video_path)
+    with time_stage(metrics, "encoding"):
+        save_video(output_video_frames, output_video_path, fps=reader.fps) # keep the source frame rate
+
+def main_stream(input_video_path, batch_size=1, concurrent=False, ball_roi=None, player_keyframe_interval=1, metrics=None, manual_court=False, model_cache=None, backend=None):
+    # Detect players and ball
+    player_tracker, ball_tracker = create_trackers(ball_roi, player_keyframe_interval, metrics, model_cache, backend)
+
+    # Detect court lines (choice of manual or auto detection) (uses first frame of video)
+    court_detector = CourtDetector(is_manual=manual_court)
+
+    # Decode, detect, draw and save one frame at a time instead of holding the whole video in memory
+    _, file_name = os.path.split(input_video_path)
+    name, _ = os.path.splitext(file_name)
+    output_video_path = f"./output_media/{name}_output.avi"
+    if concurrent: # decode, player model, ball model, draw and encode on separate workers
+        run_concurrent_pipeline(input_video_path, output_video_path, player_tracker, ball_tracker, court_detector, court_keypoints_path="./tracker_stubs/court_keypoints.json", batch_size=batch_size, metrics=metrics)
+    else:
+        run_streaming_pipeline(input_video_path, output_video_path, player_tracker, ball_tracker, court_detector, court_keypoints_path="./tracker_stubs/court_keypoints.json", batch_size=batch_size, metrics=metrics)
+
+    print_tracker_stats(player_tracker, ball_tracker)
+
+def add_arguments(parser):
+    parser.add_argument("input_video_path", type=str, help="Path to the input video file")
+    parser.add_argument("--stream", action="store_true", help="Process the video one frame at a time to bound memory use")
+    parser.add_argument("--batch-size", type=int, default=1, help="Number of frames per model inference call")
+    parser.add_argument("--concurrent", action="store_true", help="Run decode, detection, drawing and encoding on parallel workers")
+    parser.add_argument("--ball-roi", type=int, default=None, help="Search for the ball in a crop of this size around its last position")
+    parser.add_argument("--player-keyframe-interval", type=int, default=1, help="Run the player detector every N frames and propagate boxes in between")
+    parser.add_argument("--metrics-dir", type=str, default=None, help="Export per-stage timings as JSON and Prometheus text to this directory")
+    parser.add_argument("--trace", action="store_true", help="Also export a Chrome trace (chrome://tracing, Perfetto) of every timed stage")
+    parser.add_argument("--manual-court", action="store_true", help="Click the court keypoints instead of detecting them from the court lines")
+    parser.add_argument("--backend", type=str, default="torch", choices=BACKENDS, help="Run the models on PyTorch or exported to ONNX Runtime / OpenVINO")
+    parser.add_argument("--precision", type=str, default="fp32", choices=PRECISIONS, help="Precision of the exported models, int8 is calibrated on our own footage")
+    parser.add_argument("--calibration-videos", type=str, nargs="+", default=None, help="Footage to calibrate int8 models on, defaults to the input video")
+
+def run(args, model_cache=None):
+    main(args.input_video_path, stream=args.stream, batch_size=args.batch_size, concurrent=args.concurrent, ball_roi=args.ball_roi, player_keyframe_interval=args.player_keyframe_interval, metrics_dir=args.metrics_dir, trace=args.trace, manual_court=args.manual_court, model_cache=model_cache, backend=args.backend, precision=args.precision, calibration_videos=args.calibration_videos)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process a video file for player and ball tracking.")
-    parser.add_argument("input_video_path", type=str, help="Path to the input video file")
+    add_arguments(parser)
     args = parser.parse_args()
 
     start_time = time.time()
-    main(args.input_video_path)
+    run(args)
     end_time = time.time()
     elapsed_time = end_time - start_time
-    print(f"Execution time: {elapsed_time:.2f} seconds")
\ No newline at end of file
+    print(f"Execution time: {elapsed_time:.2f} seconds")
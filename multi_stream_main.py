@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import argparse
+from utils import *
+from trackers import *
+from pipeline import *
+
+def main(sources, ball_roi=None, max_batch=None, output_dir=None, metrics_dir=None, baseline=False):
+    # Load each model once, every stream shares them
+    metrics = Metrics()
+    player_tracker = PlayerTracker(model_path="./models/yolo11n.pt", metrics=metrics)
+    ball_tracker = BallTracker(model_path="./models/yolov5n6u_ball.pt", roi_size=ball_roi, metrics=metrics)
+    server = MultiStreamServer(player_tracker, ball_tracker, max_batch=max_batch, metrics=metrics)
+
+    # One stream per camera (video files or pipes stand in for cameras)
+    writers = {}
+    for source in sources:
+        _, file_name = os.path.split(source)
+        name, _ = os.path.splitext(file_name)
+        while name in writers: # same file given twice
+            name = f"{name}_"
+        stream = server.add_stream(source, name)
+        writers[name] = VideoWriter.like(stream.reader, os.path.join(output_dir, f"{name}_output.avi")) if output_dir is not None else None
+
+    # Draw detections on each stream's own output video
+    def on_frame(stream, frame_idx, frame, player_dict, ball_dict):
+        writer = writers[stream.name]
+        if writer is None:
+            return
+        frame = player_tracker.draw_bounding_box(frame, player_dict)
+        frame = ball_tracker.draw_bounding_box(frame, ball_dict)
+        writer.write(frame)
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    report = server.run(on_frame)
+    for writer in writers.values():
+        if writer is not None:
+            writer.close()
+
+    for name, stream_report in report["streams"].items():
+        print(f"{name}: {stream_report['frames']} frames, {stream_report['fps']:.1f} fps, latency p50 {stream_report['latency_p50_ms']:.1f} ms, p99 {stream_report['latency_p99_ms']:.1f} ms")
+    frames = sum(stream_report["frames"] for stream_report in report["streams"].values())
+    print(f"Shared server: {frames} frames in {report['elapsed_s']:.2f} s, {report['cpu_s']:.2f} s CPU, {report['peak_rss_mb']:.0f} MB peak memory, mean batch {report['mean_batch_size']:.1f} frames")
+
+    # The same streams and the same work on separate processes, each loading its own models
+    if baseline:
+        if output_dir is not None:
+            print("Warning: the separate processes don't draw or encode, leave out --output-dir for a like-for-like comparison")
+        baseline_args = ("--ball-roi", str(ball_roi)) if ball_roi is not None else ()
+        report["baseline"] = baseline_report = run_separate_processes(sources, extra_args=baseline_args)
+        if baseline_report["cpu_s"] is None:
+            print(f"Separate processes: {baseline_report['frames']} frames in {baseline_report['elapsed_s']:.2f} s (CPU time and memory per process are only measured on Unix)")
+        else:
+            print(f"Separate processes: {baseline_report['frames']} frames in {baseline_report['elapsed_s']:.2f} s, {baseline_report['cpu_s']:.2f} s CPU, {baseline_report['peak_rss_mb']:.0f} MB peak memory (summed over {len(sources)} processes)")
+
+    if metrics_dir is not None:
+        os.makedirs(metrics_dir, exist_ok=True)
+        with open(os.path.join(metrics_dir, "multi_stream_report.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        metrics.export(metrics_dir, "multi_stream")
+
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track players and ball on several camera streams sharing one copy of each model.")
+    parser.add_argument("sources", type=str, nargs="+", help="Video files, pipes or URLs, one per camera")
+    parser.add_argument("--ball-roi", type=int, default=None, help="Search for the ball in a crop of this size around its last position")
+    parser.add_argument("--max-batch", type=int, default=None, help="Maximum frames per inference call (default: one per stream)")
+    parser.add_argument("--output-dir", type=str, default=None, help="Write an annotated video per stream to this directory")
+    parser.add_argument("--metrics-dir", type=str, default=None, help="Export the per-stream report and stage timings to this directory")
+    parser.add_argument("--baseline", action="store_true", help="Also run each stream on its own process doing the same work and report their frames, CPU time and memory")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    main(args.sources, ball_roi=args.ball_roi, max_batch=args.max_batch, output_dir=args.output_dir, metrics_dir=args.metrics_dir, baseline=args.baseline)
+    elapsed_time = time.time() - start_time
+    print(f"Execution time: {elapsed_time:.2f} seconds")
@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import argparse
+import importlib
+
+# Subcommand -> (module implementing it, description). A module is only imported when its subcommand runs, so
+# render and convert never import ultralytics or torch.
+COMMANDS = {
+    "detect": ("main", "Track players and ball in a video file"),
+    "render": ("draw_video", "Draw saved detections onto a video"),
+    "clips": ("export_clips", "Export frame ranges or the rallies of a video as clips or a highlight reel"),
+    "live": ("live_main", "Simulate live player and ball tracking on a video file"),
+    "analyse": ("analyse_match", "Map detections to court coordinates and index rallies, shots and bounces"),
+    "bench": ("benchmark", "Benchmark the pipeline on a synthetic clip with stand-in detectors"),
+    "convert": ("convert_detections", "Convert detections between the columnar, JSON and pickle formats"),
+    "backends": ("compare_backends", "Compare model speed and accuracy on PyTorch, ONNX Runtime and OpenVINO in FP32 and INT8"),
+    "transport": ("bench_transport", "Benchmark handing frames to other processes through a shared-memory ring against queues"),
+    "worker": (None, "Keep the models loaded in a long-lived process serving detect jobs"),
+}
+
+# Function to parse a HOST:PORT worker address, anything else is a socket path
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return (host, int(port)) if host and port.isdigit() else address
+
+def add_worker_arguments(parser):
+    parser.add_argument("--address", type=str, default="127.0.0.1:47251", help="HOST:PORT (or socket path) of the model worker")
+
+def build_parser(command=None):
+    """
+    Build the padel_vision argument parser, importing only the module of the given subcommand for its arguments.
+
+    Args:
+        command (str, optional): Subcommand being run, None only lists the subcommands.
+
+    Returns:
+        argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(prog="padel_vision", description="Padel player and ball tracking.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (module_name, description) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=description, description=description)
+        if name != command:
+            continue
+        if module_name is not None:
+            importlib.import_module(module_name).add_arguments(subparser)
+        if name in ("detect", "worker"):
+            add_worker_arguments(subparser)
+        if name == "detect":
+            subparser.add_argument("--worker", action="store_true", help="Run on the model worker if one is running, reusing its loaded models")
+        if name == "worker":
+            subparser.add_argument("--stop", action="store_true", help="Stop the running model worker")
+    return parser
+
+# Job run by the model worker, the arguments are those of the detect subcommand
+def detect_job(model_cache, **kwargs):
+    import main
+    main.run(argparse.Namespace(**kwargs), model_cache=model_cache)
+
+def run_detect(args):
+    from pipeline.model_worker import submit_job
+    kwargs = {key: value for key, value in vars(args).items() if key not in ("command", "address", "worker")}
+    kwargs["input_video_path"] = os.path.abspath(args.input_video_path) # the worker may run in another directory
+    if args.metrics_dir is not None:
+        kwargs["metrics_dir"] = os.path.abspath(args.metrics_dir)
+    if args.calibration_videos is not None:
+        kwargs["calibration_videos"] = [os.path.abspath(path) for path in args.calibration_videos]
+    try:
+        submit_job("detect", kwargs, address=parse_address(args.address))
+    except (ConnectionRefusedError, FileNotFoundError):
+        print(f"No model worker at {args.address}, running locally.")
+        importlib.import_module("main").run(args)
+
+def run_worker(args):
+    from pipeline.model_worker import ModelWorker, submit_job
+    address = parse_address(args.address)
+    if args.stop:
+        submit_job("shutdown", address=address)
+        return
+    ModelWorker({"detect": detect_job}, address=address).serve()
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    command = next((arg for arg in argv if not arg.startswith("-")), None) # first positional is the subcommand
+    args = build_parser(command if command in COMMANDS else None).parse_args(argv)
+
+    start_time = time.time()
+    if args.command == "worker":
+        run_worker(args)
+    elif args.command == "detect" and args.worker:
+        run_detect(args)
+    else:
+        importlib.import_module(COMMANDS[args.command][0]).run(args)
+    if args.command != "worker":
+        print(f"Execution time: {time.time() - start_time:.2f} seconds")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+from .streaming_pipeline import *
+from .concurrent_executor import *
+from .segment_parallel import *
+from .multi_stream_server import *
+from .model_worker import *
+from .realtime import *
+from .parallel_render import *
+from .frame_ring import *
+from .clip_export import *
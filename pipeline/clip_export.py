@@ -0,0 +1,105 @@
+import os
+import sys
+import numpy as np
+sys.path.append("../")
+from utils import *
+from detection_io import *
+from analytics.trajectory_analytics import find_rallies
+from .parallel_render import draw_saved_detections
+
+# Function to pad frame ranges, clip them to the video and merge the ones that overlap or touch, returns sorted (start, end) pairs
+def merge_ranges(ranges, n_frames=None, padding=0):
+    merged = []
+    for start, end in sorted((max(0, int(start) - padding), int(end) + padding) for start, end in ranges):
+        end = min(end, n_frames) if n_frames else end
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def find_play_ranges(ball_detections, fps, max_gap_s=1.0, min_duration_s=2.0, padding_s=1.0):
+    """
+    Frame ranges where the ball is in play, from the gaps in the saved ball detections.
+
+    Args:
+        ball_detections (ColumnarDetections): Raw ball detections (before interpolation), only the offsets are read.
+        fps (float): Frame rate of the video.
+        max_gap_s (float): Longer stretches without the ball end a range.
+        min_duration_s (float): Shorter ranges are dropped.
+        padding_s (float): Time added before and after each range, so clips start before the serve.
+
+    Returns:
+        list: Sorted, non-overlapping (start, end) frame ranges, end exclusive.
+    """
+    ball_known = np.diff(np.asarray(ball_detections.offsets)) > 0
+    starts, ends = find_rallies(ball_known, fps, max_gap_s=max_gap_s, min_duration_s=min_duration_s)
+    return merge_ranges(zip(starts.tolist(), ends.tolist()), len(ball_detections), padding=int(round(padding_s * fps)))
+
+def export_clips(video_path, ranges, output_path, player_detections_path=None, ball_detections_path=None, reel=False, fourcc="XVID", metrics=None):
+    """
+    Write frame ranges of a video as separate clips or one reel, encoding only those frames.
+
+    Each range is read by jumping to the keyframe before it and decoding forward (see VideoReader.seek), so
+    besides the exported frames up to one keyframe interval per range is decoded and thrown away; the cost
+    follows the length of the clips and the keyframe spacing rather than the length of the video. Finding the
+    keyframes takes one pass over the video's packets (no decoding) the first time a video is exported, after
+    which the index is cached. Detections are drawn when given; a columnar store is memory-mapped, so only the
+    rows of the exported frames are read.
+
+    Args:
+        video_path (str): Path to a seekable video file.
+        ranges (list): (start, end) frame ranges, end exclusive. Overlapping ranges are merged.
+        output_path (str): Video file of the reel, or directory for the clips.
+        player_detections_path (str, optional): Player detections to draw.
+        ball_detections_path (str, optional): Ball detections to draw.
+        reel (bool): Join every range into one video instead of writing a clip per range.
+        fourcc (str): Four-character codec code.
+        metrics (Metrics, optional): Collects decode, drawing and encoding timings.
+
+    Returns:
+        dict: Paths written, frames written, frames decoded (written plus those decoded to reach each range) and
+            the merged ranges.
+    """
+    reader = VideoReader(video_path, prefetch=4, metrics=metrics)
+    if not reader.opened:
+        raise ValueError(f"Could not open video {video_path}")
+    ranges = merge_ranges(ranges, reader.n_frames) # builds the keyframe index on the first export of a video
+    draw = player_detections_path is not None or ball_detections_path is not None
+    player_detections = load_detections(player_detections_path) if player_detections_path is not None else ColumnarDetections.from_frame_dicts([])
+    ball_detections = load_detections(ball_detections_path) if ball_detections_path is not None else ColumnarDetections.from_frame_dicts([])
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)) if reel else output_path, exist_ok=True)
+    paths, n_written = [], 0
+    out = VideoWriter.like(reader, output_path, fourcc=fourcc, metrics=metrics) if reel else None
+    try:
+        for start, end in ranges:
+            if not reel:
+                paths.append(os.path.join(output_path, f"clip_{start:07d}_{end:07d}.avi"))
+                out = VideoWriter.like(reader, paths[-1], fourcc=fourcc, metrics=metrics)
+            frame_idx = start
+            for frame in reader.read(start, end):
+                if draw:
+                    with time_stage(metrics, "drawing", frame_idx):
+                        frame = draw_saved_detections(frame, frame_idx, player_detections, ball_detections)
+                out.write(frame)
+                frame_idx += 1
+            n_written += frame_idx - start
+            if not reel:
+                out.close()
+                out = None
+    finally:
+        if out is not None:
+            out.close()
+    if reel:
+        paths.append(output_path)
+
+    n_decoded = n_written
+    if reader.index is not None: # frames grabbed between each range's keyframe and its start
+        n_decoded += sum(start - reader.index.keyframe_before(start) for start, _ in ranges)
+
+    if metrics is not None:
+        metrics.count("frames_exported", n_written)
+    return {"paths": paths, "frames": n_written, "frames_decoded": n_decoded, "ranges": ranges}
@@ -0,0 +1,209 @@
+import queue
+import threading
+import sys
+sys.path.append("../")
+from utils import *
+from .streaming_pipeline import draw_stream
+
+_END = object() # marks the end of a stage's output
+
+class _StageError():
+    def __init__(self, error):
+        self.error = error # exception raised inside a worker, re-raised by the consumer
+
+def _put(q, item, stop_event):
+    while not stop_event.is_set(): # retry so a worker can exit if the consumer stops early
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(q, stop_event=None):
+    while True:
+        try:
+            item = q.get(timeout=0.1)
+            break
+        except queue.Empty:
+            if stop_event is not None and stop_event.is_set(): # consumer stopped early, wind down
+                return _END
+    if isinstance(item, _StageError):
+        raise item.error
+    return item
+
+def threaded_stage(items, queue_size=8, name="stage", metrics=None):
+    """
+    Run an iterable on a background thread and yield its items through a bounded queue.
+
+    Args:
+        items (iterable): Iterable to run on the worker thread, e.g. read_video_stream(path).
+        queue_size (int): Maximum number of items buffered ahead of the consumer.
+        name (str): Name of the worker thread.
+        metrics (Metrics, optional): Records the queue depth as the gauge {name}_queue_depth.
+
+    Yields:
+        Items from the iterable, in order.
+    """
+    q = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+
+    def worker():
+        try:
+            for item in items:
+                if not _put(q, item, stop_event):
+                    return
+            _put(q, _END, stop_event)
+        except Exception as e:
+            _put(q, _StageError(e), stop_event)
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None: # finish the source on the thread that ran it, e.g. release a decoder's capture
+                close()
+
+    thread = threading.Thread(target=worker, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            if metrics is not None:
+                metrics.gauge(f"{name}_queue_depth", q.qsize())
+            item = _get(q)
+            if item is _END:
+                break
+            yield item
+    finally:
+        stop_event.set() # release the worker if the consumer stopped early
+
+class ConcurrentExecutor():
+    def __init__(self, player_tracker, ball_tracker, queue_size=8, batch_size=1, metrics=None):
+        """
+        Runs player and ball detection on separate worker threads connected by bounded queues.
+
+        Both models release the GIL during inference, so the detectors overlap with each other and with
+        whatever decodes the frames and consumes the results.
+
+        Args:
+            player_tracker (PlayerTracker): Tracker used for player detection.
+            ball_tracker (BallTracker): Tracker used for ball detection.
+            queue_size (int): Maximum number of batches waiting between stages.
+            batch_size (int): Number of frames sent through each model per inference call.
+            metrics (Metrics, optional): Records the depth of the queues between stages.
+        """
+        self.metrics = metrics
+        self.player_tracker = player_tracker
+        self.ball_tracker = ball_tracker
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+
+    def detect(self, video_frames):
+        """
+        Detect players and ball on every frame, running both detectors in parallel.
+
+        Args:
+            video_frames (iterable): Frames in video order.
+
+        Yields:
+            tuple: (frame, player_dict, ball_dict) for each frame, in video order.
+        """
+        stop_event = threading.Event()
+        player_in, ball_in = queue.Queue(maxsize=self.queue_size), queue.Queue(maxsize=self.queue_size)
+        player_out, ball_out = queue.Queue(maxsize=self.queue_size), queue.Queue(maxsize=self.queue_size)
+        batches = queue.Queue(maxsize=self.queue_size * 2) # frames waiting to be matched with their detections
+
+        def feed():
+            try:
+                for batch in batch_frames(video_frames, self.batch_size):
+                    if not (_put(batches, batch, stop_event) and _put(player_in, batch, stop_event) and _put(ball_in, batch, stop_event)):
+                        return
+                for q in (batches, player_in, ball_in):
+                    _put(q, _END, stop_event)
+            except Exception as e:
+                for q in (batches, player_in, ball_in):
+                    _put(q, _StageError(e), stop_event)
+            finally:
+                close = getattr(video_frames, "close", None)
+                if close is not None: # stop an upstream stage (e.g. threaded_stage) when the consumer stops early
+                    close()
+
+        def detect_worker(tracker, in_q, out_q):
+            try:
+                while not stop_event.is_set():
+                    batch = _get(in_q, stop_event)
+                    if batch is _END:
+                        _put(out_q, _END, stop_event)
+                        return
+                    if not _put(out_q, tracker.detect_batch(batch), stop_event): # one worker per model keeps tracker updates in frame order
+                        return
+            except Exception as e:
+                _put(out_q, _StageError(e), stop_event)
+
+        threads = [
+            threading.Thread(target=feed, name="decode", daemon=True),
+            threading.Thread(target=detect_worker, args=(self.player_tracker, player_in, player_out), name="player_model", daemon=True),
+            threading.Thread(target=detect_worker, args=(self.ball_tracker, ball_in, ball_out), name="ball_model", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                if self.metrics is not None:
+                    self.metrics.gauge("player_queue_depth", player_in.qsize())
+                    self.metrics.gauge("ball_queue_depth", ball_in.qsize())
+                batch = _get(batches)
+                if batch is _END:
+                    break
+                player_detections = _get(player_out)
+                ball_detections = _get(ball_out)
+                for frame, player_dict, ball_dict in zip(batch, player_detections, ball_detections):
+                    yield frame, player_dict, ball_dict
+        finally:
+            stop_event.set() # release the workers if the consumer stopped early
+
+def run_concurrent_pipeline(input_video_path, output_video_path, player_tracker, ball_tracker, court_detector=None, court_keypoints_path=None, batch_size=1, queue_size=8, metrics=None, max_lag=50):
+    """
+    Decode, detect (players and ball in parallel), draw and encode on separate workers.
+
+    Wall-clock time approaches the cost of the slowest stage instead of the sum of all stages. Court keypoints
+    are created from a copy of the first frame before the workers start, so any annotation made while
+    selecting them is not burnt into the output, and auto-detected ones are re-checked as in detect_stream.
+
+    Args:
+        input_video_path (str): Path to the input video file.
+        output_video_path (str): Path to save the annotated video.
+        player_tracker (PlayerTracker): Tracker used for player detection.
+        ball_tracker (BallTracker): Tracker used for ball detection.
+        court_detector (CourtDetector, optional): Detector used to create and draw court keypoints.
+        court_keypoints_path (str, optional): Path to save the court keypoints as a JSON file.
+        batch_size (int): Number of frames sent through each model per inference call.
+        queue_size (int): Maximum number of items waiting between stages.
+        metrics (Metrics, optional): Collects per-stage timings and queue depths; pass the same instance to the trackers.
+        max_lag (int): Most frames held back waiting for a ball detection (see draw_stream).
+    """
+    reader = VideoReader(input_video_path, prefetch=0, metrics=metrics) # the decode stage below already runs ahead on its own thread
+    video_frames = reader.read()
+    first_frame = next(video_frames, None)
+    if first_frame is None:
+        print(f"Error: Unable to read video {input_video_path}")
+        return
+
+    court_keypoints = None
+    if court_detector is not None: # manual selection needs the main thread
+        court_keypoints = court_detector.create_keypoints(first_frame.copy(), save_path=court_keypoints_path)
+
+    def all_frames():
+        yield first_frame
+        yield from video_frames
+
+    def with_court_keypoints(detected):
+        keypoints = court_keypoints
+        for frame_idx, (frame, player_dict, ball_dict) in enumerate(detected):
+            if court_detector is not None and frame_idx > 0: # re-check auto-detected keypoints in case the camera moved, as detect_stream does
+                keypoints = court_detector.update_keypoints(frame, keypoints, frame_idx)
+            yield frame, player_dict, ball_dict, keypoints
+
+    executor = ConcurrentExecutor(player_tracker, ball_tracker, queue_size=queue_size, batch_size=batch_size, metrics=metrics)
+    decoded = threaded_stage(all_frames(), queue_size=queue_size * batch_size, name="decode", metrics=metrics)
+    detections = with_court_keypoints(executor.detect(decoded))
+    drawn = threaded_stage(draw_stream(detections, player_tracker, ball_tracker, court_detector, metrics, max_lag), queue_size=queue_size, name="draw", metrics=metrics)
+    save_video_stream(drawn, output_video_path, metrics, fps=reader.fps) # encoded on the writer's thread at the source frame rate
@@ -0,0 +1,213 @@
+import sys
+import time
+import secrets
+from multiprocessing import resource_tracker, shared_memory
+import cv2
+import numpy as np
+
+class RingClosed(Exception):
+    """Raised by FrameRing.read once the writer has closed the ring and every frame has been read."""
+
+class RingStalled(RuntimeError):
+    """Raised by FrameRing.acquire when the slowest consumer stops releasing frames, e.g. because its process died."""
+
+class FrameRing():
+    # Header of the shared block: frames published, closed flag, then one released count per consumer
+    _PUBLISHED, _CLOSED, _CONSUMERS = 0, 1, 2
+
+    def __init__(self, frame_shape, n_slots=8, n_consumers=1, name=None, create=True, poll_s=0.0002, stall_timeout_s=30.0):
+        """
+        Fixed ring of preallocated frame slots in shared memory for handing frames between processes without pickling.
+
+        The writer fills slot seq % n_slots in place and publishes it by advancing the published count. Each consumer
+        reads frames in order as views into the slot and releases them when done; a slot is only reused once every
+        consumer has released it, so a slow consumer holds the writer back (back-pressure) instead of frames being
+        dropped or overwritten under it. Each slot also stores its sequence number and frame index.
+
+        Processes attach by name: create the ring in the parent, pass ring.name, frame_shape, n_slots and n_consumers
+        to the workers and attach there with create=False. Only the creating process tracks the block, so it is
+        unlinked once, by its owner.
+
+        Args:
+            frame_shape (tuple): (height, width, 3) of the frames.
+            n_slots (int): Number of frames in flight between the writer and the slowest consumer.
+            n_consumers (int): Number of consumers that must release every frame.
+            name (str, optional): Name of the shared memory block, generated when creating.
+            create (bool): Create the block (normally the parent) rather than attach to an existing one.
+            poll_s (float): Initial wait between checks while blocked, doubled up to 100 times that.
+            stall_timeout_s (float, optional): Seconds the writer waits for the slowest consumer to release a frame
+                before raising RingStalled, None waits forever.
+        """
+        self.frame_shape = tuple(frame_shape)
+        self.n_slots = n_slots
+        self.n_consumers = n_consumers
+        self.poll_s = poll_s
+        self.stall_timeout_s = stall_timeout_s
+        self.frame_bytes = int(np.prod(self.frame_shape))
+        header_words = self._CONSUMERS + n_consumers
+        self.header_bytes = 8 * header_words
+        self.slot_meta_bytes = 16 * n_slots # sequence number and frame index of each slot
+        size = self.header_bytes + self.slot_meta_bytes + self.frame_bytes * n_slots
+
+        name = name or f"frame_ring_{secrets.token_hex(4)}"
+        if create or sys.version_info < (3, 13):
+            self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+            if not create: # attaching registers the block with this process's resource tracker, which would unlink it on exit
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+        else:
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        self.owner = create
+        buf = self.shm.buf
+        self.header = np.ndarray((header_words,), dtype=np.int64, buffer=buf[:self.header_bytes])
+        self.slot_meta = np.ndarray((n_slots, 2), dtype=np.int64, buffer=buf[self.header_bytes:self.header_bytes + self.slot_meta_bytes])
+        self.slots = np.ndarray((n_slots,) + self.frame_shape, dtype=np.uint8, buffer=buf[self.header_bytes + self.slot_meta_bytes:size])
+        if create:
+            self.header[:] = 0
+            self.slot_meta[:] = -1
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def nbytes(self):
+        return self.shm.size
+
+    def _wait(self, ready, timeout):
+        # Back off from a tight poll to at most 100x poll_s while blocked, returns False on timeout
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        delay = self.poll_s
+        while not ready():
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, self.poll_s * 100)
+        return True
+
+    # Writer side
+
+    def acquire(self, timeout=None):
+        """
+        Wait until the next slot has been released by every consumer and return it as a writable view.
+
+        Fill it in place (e.g. cap.read(slot)) and call publish(), nothing else is written in between.
+
+        Returns:
+            numpy.ndarray: View of the slot, or None on timeout.
+
+        Raises:
+            RingStalled: If no consumer released a frame for stall_timeout_s while the writer was blocked.
+        """
+        seq = int(self.header[self._PUBLISHED])
+        progress = [int(self.header[self._CONSUMERS:].min()), time.perf_counter()] # frames released by the slowest consumer, and when that last changed
+
+        def ready():
+            released = int(self.header[self._CONSUMERS:].min())
+            if released != progress[0]:
+                progress[:] = [released, time.perf_counter()]
+            elif self.stall_timeout_s is not None and seq - released >= self.n_slots and time.perf_counter() - progress[1] > self.stall_timeout_s:
+                consumer = int(self.header[self._CONSUMERS:].argmin())
+                raise RingStalled(f"Consumer {consumer} has not released frame {released} in {self.stall_timeout_s} s")
+            return seq - released < self.n_slots
+
+        if not self._wait(ready, timeout):
+            return None
+        return self.slots[seq % self.n_slots]
+
+    def publish(self, frame_idx):
+        """Make the slot returned by acquire() visible to consumers."""
+        seq = int(self.header[self._PUBLISHED])
+        self.slot_meta[seq % self.n_slots] = (seq, frame_idx)
+        self.header[self._PUBLISHED] = seq + 1 # written last, consumers only look at slots below it
+
+    def write(self, frame, frame_idx, timeout=None):
+        """Copy a frame into the next slot and publish it, returns False on timeout."""
+        slot = self.acquire(timeout)
+        if slot is None:
+            return False
+        slot[...] = frame
+        self.publish(frame_idx)
+        return True
+
+    def close(self):
+        """Tell consumers no more frames are coming (the writer's side, the block stays until unlink)."""
+        self.header[self._CLOSED] = 1
+
+    # Consumer side
+
+    def read(self, consumer, timeout=None):
+        """
+        Wait for this consumer's next frame and return it without copying.
+
+        The view stays valid until the consumer calls release(); copy it if it must outlive that.
+
+        Args:
+            consumer (int): Index of the consumer, 0 to n_consumers - 1.
+            timeout (float, optional): Seconds to wait, None waits until a frame arrives or the ring closes.
+
+        Returns:
+            tuple: (seq, frame_idx, frame view), or None on timeout.
+
+        Raises:
+            RingClosed: Once the writer has closed the ring and this consumer has read every frame.
+        """
+        seq = int(self.header[self._CONSUMERS + consumer])
+        if not self._wait(lambda: self.header[self._PUBLISHED] > seq or self.header[self._CLOSED], timeout):
+            return None
+        if self.header[self._PUBLISHED] <= seq: # closed with nothing left
+            raise RingClosed()
+        slot_seq, frame_idx = (int(v) for v in self.slot_meta[seq % self.n_slots])
+        if slot_seq != seq: # can only happen if released counts were corrupted
+            raise RuntimeError(f"Slot holds frame {slot_seq}, expected {seq}")
+        return seq, frame_idx, self.slots[seq % self.n_slots]
+
+    def release(self, consumer):
+        """Mark this consumer's current frame as done so its slot can be reused once every consumer is done."""
+        self.header[self._CONSUMERS + consumer] += 1
+
+    def frames(self, consumer):
+        """Yield (frame_idx, frame view) for every frame in order, each released when the next one is requested."""
+        while True:
+            try:
+                _, frame_idx, frame = self.read(consumer)
+            except RingClosed:
+                return
+            try:
+                yield frame_idx, frame
+            finally:
+                self.release(consumer)
+
+    def detach(self):
+        """Unmap this process's views; the owner also frees the block."""
+        del self.header, self.slot_meta, self.slots # views must go before the block is closed
+        self.shm.close()
+        if self.owner:
+            if sys.version_info < (3, 13): # a consumer sharing this process's resource tracker may have unregistered it
+                resource_tracker.register(self.shm._name, "shared_memory")
+            self.shm.unlink()
+
+def decode_into_ring(video_path, ring, start=0, end=None):
+    """
+    Decode frames [start, end) of a video straight into ring slots, no intermediate frame buffers.
+
+    Returns:
+        int: Number of frames published.
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if start > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        frame_idx = start
+        while end is None or frame_idx < end:
+            slot = ring.acquire()
+            ok, frame = cap.read(slot) # OpenCV decodes into the slot when shape and dtype match
+            if not ok:
+                break
+            if frame is not slot: # the source changed size, fall back to copying
+                slot[...] = cv2.resize(frame, (slot.shape[1], slot.shape[0]))
+            ring.publish(frame_idx)
+            frame_idx += 1
+        return frame_idx - start
+    finally:
+        cap.release()
+        ring.close()
@@ -0,0 +1,118 @@
+import os
+import time
+import secrets
+import traceback
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+import sys
+sys.path.append("../")
+from trackers.model_cache import ModelCache
+
+DEFAULT_WORKER_ADDRESS = ("127.0.0.1", 47251)
+DEFAULT_AUTHKEY_PATH = os.path.join(os.path.expanduser("~"), ".padel_vision", "worker_authkey")
+
+def load_authkey(path=DEFAULT_AUTHKEY_PATH, create=False):
+    """
+    Read the key model worker clients must present, a random key kept in a file only this user can read.
+
+    The worker unpickles whatever an authenticated client sends, so the key must be secret: it is generated on the
+    worker's first start and never shared between users or installs.
+
+    Args:
+        path (str): Key file.
+        create (bool): Generate the key if the file does not exist yet (the worker does, clients don't).
+
+    Returns:
+        bytes: The key.
+
+    Raises:
+        FileNotFoundError: If the key file does not exist and create is False (no worker has been started).
+        PermissionError: If other users can read or write the key file.
+    """
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600) # created with its final permissions
+            with os.fdopen(fd, "wb") as f:
+                f.write(secrets.token_bytes(32))
+        except FileExistsError: # another worker created it first
+            pass
+    if os.name == "posix" and os.stat(path).st_mode & 0o077:
+        raise PermissionError(f"{path} can be read or written by other users, remove it so a new key is generated")
+    with open(path, "rb") as f:
+        return f.read()
+
+class ModelWorker():
+    def __init__(self, jobs, address=DEFAULT_WORKER_ADDRESS, authkey=None):
+        """
+        Long-lived process that runs jobs with models kept loaded between them.
+
+        Jobs run one at a time, in the order they arrive, on the worker's own working directory, so relative
+        output paths are relative to where the worker was started.
+
+        Args:
+            jobs (dict): Job name -> callable(model_cache, **kwargs) run for each request.
+            address (tuple or str): Address to listen on, (host, port) or a socket path.
+            authkey (bytes, optional): Key clients must present, defaults to this user's key (see load_authkey).
+        """
+        self.jobs = jobs
+        self.address = address
+        self.authkey = authkey if authkey is not None else load_authkey(create=True)
+        self.model_cache = ModelCache()
+        self.jobs_run = 0
+
+    def handle(self, name, kwargs):
+        if name == "shutdown":
+            return None
+        if name not in self.jobs:
+            raise ValueError(f"Unknown job {name!r}, expected one of {sorted(self.jobs)}")
+        return self.jobs[name](self.model_cache, **kwargs)
+
+    def serve(self):
+        """Accept jobs until a shutdown job arrives."""
+        with Listener(self.address, authkey=self.authkey) as listener:
+            print(f"Model worker listening on {listener.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except (AuthenticationError, OSError) as e: # a client without the key is turned away, the worker keeps serving
+                    print(f"Rejected a connection: {e}")
+                    continue
+                with conn:
+                    name, kwargs = conn.recv()
+                    start_time = time.time()
+                    try:
+                        result = self.handle(name, kwargs)
+                        conn.send(("ok", result))
+                    except Exception:
+                        conn.send(("error", traceback.format_exc()))
+                    self.jobs_run += 1
+                    print(f"Job {name} finished in {time.time() - start_time:.2f} s ({len(self.model_cache.models)} models loaded, {self.model_cache.hits} reused)")
+                if name == "shutdown":
+                    return
+
+def submit_job(name, kwargs=None, address=DEFAULT_WORKER_ADDRESS, authkey=None):
+    """
+    Run a job on a model worker and wait for its result.
+
+    Args:
+        name (str): Job name, one of the worker's jobs or "shutdown".
+        kwargs (dict, optional): Keyword arguments of the job, must be picklable.
+        address (tuple or str): Address the worker listens on.
+        authkey (bytes, optional): Key the worker expects, defaults to this user's key (see load_authkey).
+
+    Returns:
+        object: Value the job returned.
+
+    Raises:
+        ConnectionRefusedError: If no worker is listening on the address.
+        FileNotFoundError: If no key has been generated, i.e. no worker was ever started by this user.
+        RuntimeError: If the job failed on the worker, with the worker's traceback.
+    """
+    authkey = authkey if authkey is not None else load_authkey()
+    with Client(address, authkey=authkey) as conn:
+        conn.send((name, kwargs or {}))
+        status, result = conn.recv()
+    if status == "error":
+        raise RuntimeError(f"Job {name} failed on the model worker:\n{result}")
+    return result
@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import queue
+import tempfile
+import threading
+import shutil
+import subprocess
+import types
+import numpy as np
+import sys
+sys.path.append("../")
+from utils import *
+from trackers.ball_tracker import BallTracker
+from trackers.ball_interpolator import OnlineBallInterpolator
+from .concurrent_executor import _END, _StageError, _put
+
+def create_byte_tracker(frame_rate=30, tracker_config="bytetrack.yaml"):
+    """Create a ByteTrack tracker with the settings model.track would use."""
+    from ultralytics.trackers.byte_tracker import BYTETracker
+    from ultralytics.utils import IterableSimpleNamespace, yaml_load
+    from ultralytics.utils.checks import check_yaml
+    config = IterableSimpleNamespace(**yaml_load(check_yaml(tracker_config)))
+    return BYTETracker(args=config, frame_rate=int(round(frame_rate)))
+
+def results_to_detections(results):
+    """Convert one frame's YOLO results to the conf/xywh/cls arrays the trackers' update() reads."""
+    xyxy = results.boxes.xyxy.cpu().numpy().reshape(-1, 4)
+    xywh = np.empty_like(xyxy)
+    xywh[:, 0] = (xyxy[:, 0] + xyxy[:, 2]) / 2 # centre x
+    xywh[:, 1] = (xyxy[:, 1] + xyxy[:, 3]) / 2 # centre y
+    xywh[:, 2] = xyxy[:, 2] - xyxy[:, 0]
+    xywh[:, 3] = xyxy[:, 3] - xyxy[:, 1]
+    return types.SimpleNamespace(conf=results.boxes.conf.cpu().numpy().reshape(-1), xywh=xywh, cls=results.boxes.cls.cpu().numpy().reshape(-1))
+
+def convert_tracks(tracks, names):
+    """Convert tracker output rows (x1, y1, x2, y2, track_id, score, cls, idx) to a player dict of people."""
+    tracks = np.asarray(tracks, dtype=float).reshape(-1, 8)
+    person_ids = [class_id for class_id, name in names.items() if name == "person"]
+    tracks = tracks[np.isin(tracks[:, 6].astype(int), person_ids)]
+    return dict(zip(tracks[:, 4].astype(int).tolist(), tracks[:, :4].tolist()))
+
+class CameraStream():
+    def __init__(self, name, source, ball_tracker, tracker_factory=create_byte_tracker, queue_size=2, max_lag=5):
+        """
+        One camera feeding the server: its decoder thread and all the tracking state that must not be shared.
+
+        Args:
+            name (str): Name of the stream in reports.
+            source (str): Video file, pipe or URL of the camera.
+            ball_tracker (BallTracker): Ball tracker of this stream (sharing the server's ball model).
+            tracker_factory (callable): Creates the stream's player tracker from its frame rate.
+            queue_size (int): Frames decoded ahead of the models.
+            max_lag (int): Frames the ball interpolator may hold back waiting for a detection.
+        """
+        self.name = name
+        self.reader = VideoReader(source, prefetch=0) # decoded on the stream's own thread below
+        self.player_tracker = tracker_factory(self.reader.fps) # ByteTrack state is per camera, the detector is shared
+        self.ball_tracker = ball_tracker
+        self.ball_interpolator = OnlineBallInterpolator(max_lag=max_lag, mode="velocity")
+        self.metrics = Metrics()
+        self.frame_idx = 0
+        self.finished = False
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.decode_worker, name=f"decode_{name}", daemon=True)
+
+    def decode_worker(self):
+        try:
+            for frame in self.reader.read():
+                if not _put(self.queue, (frame, time.perf_counter()), self.stop_event): # arrival time for latency
+                    return
+            _put(self.queue, _END, self.stop_event)
+        except Exception as e:
+            _put(self.queue, _StageError(e), self.stop_event)
+
+    def poll(self):
+        """Return the next decoded (frame, arrival_time), or None if none is ready. Marks the stream finished at its end."""
+        try:
+            item = self.queue.get_nowait()
+        except queue.Empty:
+            return None
+        if isinstance(item, _StageError):
+            raise item.error
+        if item is _END:
+            self.finished = True
+            return None
+        return item
+
+class MultiStreamServer():
+    def __init__(self, player_tracker, ball_tracker, tracker_factory=create_byte_tracker, max_batch=None, queue_size=2, max_lag=5, metrics=None):
+        """
+        Track players and ball on several camera streams in one process, sharing one copy of each model.
+
+        Frames waiting on every stream are batched into one player call and one ball call. Player IDs come from a
+        separate ByteTrack tracker per stream and ball search windows and interpolation are per stream, so streams
+        never see each other's detections.
+
+        Args:
+            player_tracker (PlayerTracker): Tracker whose player model is shared by all streams.
+            ball_tracker (BallTracker): Tracker whose ball model and settings are shared by all streams.
+            tracker_factory (callable): Creates a stream's player tracker from its frame rate.
+            max_batch (int, optional): Maximum frames per inference call, defaults to one frame per stream.
+            queue_size (int): Frames decoded ahead of the models on each stream.
+            max_lag (int): Frames the ball interpolator may hold back waiting for a detection.
+            metrics (Metrics, optional): Collects batch sizes and inference timings across streams.
+        """
+        self.player_tracker = player_tracker
+        self.ball_tracker = ball_tracker
+        self.tracker_factory = tracker_factory
+        self.max_batch = max_batch
+        self.queue_size = queue_size
+        self.max_lag = max_lag
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.streams = []
+
+    def add_stream(self, source, name=None):
+        """Add a camera, returns its CameraStream."""
+        name = name or f"stream_{len(self.streams)}"
+        ball_tracker = BallTracker( # shares the model, keeps its own search window
+            self.ball_tracker.model_path,
+            roi_size=self.ball_tracker.roi_size,
+            max_roi_misses=self.ball_tracker.max_roi_misses,
+            model=self.ball_tracker.model,
+            metrics=self.metrics,
+        )
+        stream = CameraStream(name, source, ball_tracker, self.tracker_factory, self.queue_size, self.max_lag)
+        self.streams.append(stream)
+        return stream
+
+    def detect_players(self, frames):
+        with time_stage(self.metrics, "player_inference"):
+            # conf=0.1 like model.track, ByteTrack also uses the low-confidence boxes
+            results = self.player_tracker.model.predict(list(frames), conf=0.1, classes=self.player_tracker.classes, verbose=False)
+        with time_stage(self.metrics, "player_conversion"):
+            return [results_to_detections(frame_results) for frame_results in results], results[0].names if results else {}
+
+    def detect_balls(self, streams, frames):
+        if self.ball_tracker.roi_size is None: # full-frame search is stateless, one call for every stream
+            return self.ball_tracker.detect_batch(frames)
+        return [stream.ball_tracker.detect_frame(frame) for stream, frame in zip(streams, frames)] # each crop follows its own stream's ball
+
+    def gather(self, timeout=0.005):
+        """Collect at most one waiting frame per stream, waiting briefly if none is ready."""
+        deadline = time.perf_counter() + timeout
+        while True:
+            batch = []
+            for stream in self.streams:
+                if stream.finished:
+                    continue
+                item = stream.poll()
+                if item is not None:
+                    batch.append((stream, item[0], item[1]))
+                if self.max_batch is not None and len(batch) >= self.max_batch:
+                    return batch
+            if batch or all(stream.finished for stream in self.streams) or time.perf_counter() >= deadline:
+                return batch
+            time.sleep(0.0005)
+
+    def step(self, on_frame=None):
+        """
+        Run one batched inference over the frames waiting on all streams.
+
+        Args:
+            on_frame (callable, optional): Called as on_frame(stream, frame_idx, frame, player_dict, ball_dict)
+                for each frame once its ball position is known.
+
+        Returns:
+            int: Number of frames sent through the models.
+        """
+        batch = self.gather()
+        if not batch:
+            return 0
+        streams = [stream for stream, _, _ in batch]
+        frames = [frame for _, frame, _ in batch]
+        self.metrics.count("batches")
+        self.metrics.count("batched_frames", len(batch))
+
+        detections, names = self.detect_players(frames)
+        ball_detections = self.detect_balls(streams, frames)
+
+        for (stream, frame, arrival_time), frame_detections, ball_dict in zip(batch, detections, ball_detections):
+            if len(frame_detections.conf) > 0:
+                player_dict = convert_tracks(stream.player_tracker.update(frame_detections, frame), names)
+            else: # nothing to associate, the tracker would only age its tracks
+                player_dict = {}
+            payload = (stream.frame_idx, frame, player_dict, arrival_time)
+            stream.frame_idx += 1
+            for released_payload, released_ball_dict in stream.ball_interpolator.update(ball_dict, payload):
+                self.release(stream, released_payload, released_ball_dict, on_frame)
+        return len(batch)
+
+    def release(self, stream, payload, ball_dict, on_frame):
+        frame_idx, frame, player_dict, arrival_time = payload
+        if on_frame is not None:
+            on_frame(stream, frame_idx, frame, player_dict, ball_dict)
+        stream.metrics.add_duration("latency", time.perf_counter() - arrival_time) # decoded -> tracked (and drawn)
+        stream.metrics.count("frames")
+
+    def run(self, on_frame=None):
+        """
+        Process every stream until all of them end.
+
+        Args:
+            on_frame (callable, optional): Called as on_frame(stream, frame_idx, frame, player_dict, ball_dict).
+
+        Returns:
+            dict: Report from report().
+        """
+        start_time = time.perf_counter()
+        start_cpu = time.process_time()
+        for stream in self.streams:
+            stream.thread.start()
+        try:
+            while not all(stream.finished for stream in self.streams):
+                self.step(on_frame)
+            for stream in self.streams: # frames still waiting for a ball position at the end of each stream
+                for payload, ball_dict in stream.ball_interpolator.flush():
+                    self.release(stream, payload, ball_dict, on_frame)
+        finally:
+            for stream in self.streams:
+                stream.stop_event.set()
+        return self.report(time.perf_counter() - start_time, time.process_time() - start_cpu)
+
+    def report(self, elapsed, cpu_time):
+        """Per-stream fps and latency percentiles, plus the CPU time and peak memory of the whole server process."""
+        streams = {}
+        for stream in self.streams:
+            summary = stream.metrics.summary()
+            frames = summary["counters"].get("frames", 0)
+            latency = summary["timers"].get("latency", {})
+            streams[stream.name] = {
+                "frames": frames,
+                "fps": frames / elapsed if elapsed > 0 else 0.0,
+                "latency_p50_ms": latency.get("p50_ms", 0.0),
+                "latency_p99_ms": latency.get("p99_ms", 0.0),
+                "latency_max_ms": latency.get("max_ms", 0.0),
+            }
+        self.metrics.sample_memory()
+        return {
+            "streams": streams,
+            "elapsed_s": elapsed,
+            "cpu_s": cpu_time,
+            "peak_rss_mb": peak_rss_mb(),
+            "mean_batch_size": self.metrics.counters.get("batched_frames", 0) / max(1, self.metrics.counters.get("batches", 0)),
+        }
+
+def run_separate_processes(sources, script=None, extra_args=()):
+    """
+    Run each source on its own process at the same time, the baseline the shared-model server is measured against.
+
+    Every process runs multi_stream_main.py on its one source, so it loads its own models and does the same work as
+    the server on every frame (batched detection, ByteTrack and ball interpolation) without drawing or encoding.
+    CPU time and peak memory are read from each child's resource usage when it exits (Unix only, None elsewhere),
+    so they are what the separate processes really used rather than a total divided by the number of streams.
+
+    Args:
+        sources (list): Video files, pipes or URLs, one process each.
+        script (str, optional): Script run per source, defaults to multi_stream_main.py of this repository.
+        extra_args (tuple): Arguments added to every process, e.g. ("--ball-roi", "320") to match the server.
+
+    Returns:
+        dict: Wall time, summed frames, CPU time and peak memory, and each process's exit code, frames, CPU time and peak memory.
+    """
+    script = script or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "multi_stream_main.py")
+    output_dir = tempfile.mkdtemp(prefix="separate_streams_")
+    start_time = time.perf_counter()
+    processes = []
+    for i, source in enumerate(sources):
+        metrics_dir = os.path.join(output_dir, f"stream_{i}")
+        command = [sys.executable, script, source, "--metrics-dir", metrics_dir, *extra_args]
+        processes.append((subprocess.Popen(command, stdout=subprocess.DEVNULL), metrics_dir))
+
+    per_process = []
+    for process, metrics_dir in processes:
+        cpu_time, peak_rss = None, None
+        if hasattr(os, "wait4"): # resource usage of this child alone
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            cpu_time = usage.ru_utime + usage.ru_stime
+            peak_rss = usage.ru_maxrss / 1024 ** 2 if sys.platform == "darwin" else usage.ru_maxrss / 1024 # bytes on macOS, KB on Linux
+        else: # Windows
+            process.wait()
+        frames = 0
+        report_path = os.path.join(metrics_dir, "multi_stream_report.json")
+        if os.path.exists(report_path):
+            with open(report_path) as f:
+                frames = sum(stream["frames"] for stream in json.load(f)["streams"].values())
+        per_process.append({"returncode": process.returncode, "frames": frames, "cpu_s": cpu_time, "peak_rss_mb": peak_rss})
+    elapsed = time.perf_counter() - start_time
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+    measured = all(process["cpu_s"] is not None for process in per_process)
+    return {
+        "elapsed_s": elapsed,
+        "frames": sum(process["frames"] for process in per_process),
+        "cpu_s": sum(process["cpu_s"] for process in per_process) if measured else None,
+        "peak_rss_mb": sum(process["peak_rss_mb"] for process in per_process) if measured else None, # every process holds its own models at once
+        "processes": per_process,
+    }
@@ -0,0 +1,164 @@
+import os
+import sys
+import math
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+sys.path.append("../")
+from utils import *
+from detection_io import *
+from .segment_parallel import plan_segments, _init_segment_worker
+
+PLAYER_COLOUR = (0, 255, 0)
+BALL_COLOUR = (0, 0, 255)
+
+# Function to draw saved detection boxes with their IDs on a frame
+def draw_detection_boxes(frame, detections, color):
+    for obj_id, coords in detections.items():
+        x1, y1, x2, y2 = coords  # [x1, y1, x2, y2]
+        thickness = 2
+        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, thickness)
+        cv2.putText(frame, f"ID: {obj_id}", (int(x1), int(y1)-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    return frame
+
+# Function to draw the saved player and ball detections of one frame
+def draw_saved_detections(frame, frame_idx, player_detections, ball_detections):
+    p_detections = player_detections.frame_dict(frame_idx) if frame_idx < len(player_detections) else {}
+    b_detections = ball_detections.frame_dict(frame_idx) if frame_idx < len(ball_detections) else {}
+    frame = draw_detection_boxes(frame, p_detections, PLAYER_COLOUR)
+    return draw_detection_boxes(frame, b_detections, BALL_COLOUR)
+
+def render_segment(video_path, player_detections_path, ball_detections_path, start, end, output_path, fourcc="XVID"):
+    """
+    Draw the saved detections on frames [start, end) of a video and encode them to their own file.
+
+    Args:
+        video_path (str): Path to a seekable video file.
+        player_detections_path (str): Player detections, a columnar store is memory-mapped rather than read whole.
+        ball_detections_path (str): Ball detections.
+        start (int): First frame to render.
+        end (int): Frame after the last frame to render.
+        output_path (str): Video file for this segment.
+        fourcc (str): Four-character codec code.
+
+    Returns:
+        int: Number of frames written.
+    """
+    player_detections = load_detections(player_detections_path)
+    ball_detections = load_detections(ball_detections_path)
+    reader = VideoReader(video_path, prefetch=4) # decode ahead while this process draws and encodes
+    with VideoWriter.like(reader, output_path, fourcc=fourcc, queue_size=0) as out:
+        frame_idx = start
+        for frame in reader.read(start, end):
+            out.write(draw_saved_detections(frame, frame_idx, player_detections, ball_detections))
+            frame_idx += 1
+    return frame_idx - start
+
+def concat_segments(segment_paths, output_path, n_frames, ffmpeg=None):
+    """
+    Join segment videos into one by copying their packets, never re-encoding them.
+
+    ffmpeg's concat demuxer is used when available, otherwise AVI segments are joined in Python (concat_avi).
+    The joined video's packets are counted afterwards and a join that lost or repeated frames is deleted.
+
+    Args:
+        segment_paths (list): Segment videos in order, each starting on a keyframe.
+        output_path (str): Joined video.
+        n_frames (int): Number of frames the joined video must have.
+        ffmpeg (str, optional): Path to ffmpeg, looked up on PATH if not given.
+
+    Returns:
+        str: "ffmpeg" or "avi", how the streams were joined.
+    """
+    ffmpeg = ffmpeg or shutil.which("ffmpeg")
+    join = None
+    if ffmpeg is not None:
+        list_path = f"{output_path}.segments.txt"
+        with open(list_path, "w") as f:
+            for path in segment_paths:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+        try: # segments share codec settings and each starts on a keyframe, so the packets can be copied as they are
+            subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path], check=True)
+            join = "ffmpeg"
+        except subprocess.CalledProcessError:
+            pass # try the AVI stream copy
+        finally:
+            os.remove(list_path)
+    if join is None:
+        if not output_path.lower().endswith(".avi"):
+            raise ValueError(f"Joining segments into {output_path} needs ffmpeg, only AVI output can be joined without it")
+        concat_avi(segment_paths, output_path)
+        join = "avi"
+
+    index = VideoIndex.build(output_path) # counts packets without decoding them
+    n_joined = index.n_frames if index is not None else probe_video(output_path)["n_frames"]
+    if n_joined != n_frames:
+        os.remove(output_path)
+        raise RuntimeError(f"Joined video has {n_joined} frames, expected {n_frames}")
+    return join
+
+def render_video_parallel(video_path, player_detections_path, ball_detections_path, output_path, n_workers=None, segment_length=None, fourcc="XVID", metrics=None):
+    """
+    Render saved detections onto a video in frame-range segments on a process pool and join them into one video.
+
+    Every frame belongs to exactly one segment and segments are joined in order by copying their packets (see
+    concat_segments), so the output has the source's frames and fps with nothing dropped, repeated or encoded
+    twice. Without ffmpeg only AVI output can be joined, so other outputs are rendered on one process.
+
+    Args:
+        video_path (str): Path to a seekable video file.
+        player_detections_path (str): Player detections (columnar directory, JSON or pickle).
+        ball_detections_path (str): Ball detections (columnar directory, JSON or pickle).
+        output_path (str): Rendered video.
+        n_workers (int, optional): Number of worker processes, defaults to the number of CPUs.
+        segment_length (int, optional): Frames per segment, defaults to an even split over the workers.
+        fourcc (str): Four-character codec code.
+        metrics (Metrics, optional): Collects render and concat timings.
+
+    Returns:
+        dict: Frames rendered, number of segments and how they were joined ("ffmpeg", "avi", or "none" for one segment).
+    """
+    reader = VideoReader(video_path, prefetch=0)
+    n_frames = reader.n_frames
+    if n_frames == 0:
+        raise ValueError(f"Unable to count the frames of {video_path}, segments need a seekable video file")
+    n_workers = n_workers or os.cpu_count() or 1
+    if shutil.which("ffmpeg") is None and not output_path.lower().endswith(".avi"): # no stream copy join for this container
+        n_workers, segment_length = 1, None
+    segments = plan_segments(n_frames, segment_length or math.ceil(n_frames / n_workers), overlap=0)
+    if len(segments) == 1: # nothing to join, write the output directly
+        with time_stage(metrics, "render_segments"):
+            frames_rendered = render_segment(video_path, player_detections_path, ball_detections_path, 0, n_frames, output_path, fourcc)
+        if frames_rendered != n_frames:
+            raise RuntimeError(f"Rendered {frames_rendered} frames of {n_frames}")
+        return {"frames": frames_rendered, "segments": 1, "join": "none"}
+    threads_per_worker = max(1, (os.cpu_count() or 1) // n_workers)
+
+    segment_dir = tempfile.mkdtemp(prefix="render_segments_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        # JSON and pickle detections are converted once so every worker memory-maps them instead of parsing them
+        if not is_columnar_detections(player_detections_path):
+            save_detections(load_detections(player_detections_path), os.path.join(segment_dir, "player_detections"))
+            player_detections_path = os.path.join(segment_dir, "player_detections")
+        if not is_columnar_detections(ball_detections_path):
+            save_detections(load_detections(ball_detections_path), os.path.join(segment_dir, "ball_detections"))
+            ball_detections_path = os.path.join(segment_dir, "ball_detections")
+        segment_paths = [os.path.join(segment_dir, f"segment_{i:04d}.avi") for i in range(len(segments))]
+
+        context = multiprocessing.get_context("spawn")
+        with time_stage(metrics, "render_segments"):
+            with ProcessPoolExecutor(max_workers=min(n_workers, len(segments)), mp_context=context, initializer=_init_segment_worker, initargs=(threads_per_worker,)) as pool:
+                futures = [pool.submit(render_segment, video_path, player_detections_path, ball_detections_path, start, end, path, fourcc) for (_, start, end), path in zip(segments, segment_paths)]
+                frames_rendered = sum(future.result() for future in futures)
+
+        with time_stage(metrics, "concat_segments"):
+            join = concat_segments(segment_paths, output_path, frames_rendered)
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+    if frames_rendered != n_frames:
+        raise RuntimeError(f"Rendered {frames_rendered} frames of {n_frames}")
+    return {"frames": frames_rendered, "segments": len(segments), "join": join}
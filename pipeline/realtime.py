@@ -0,0 +1,411 @@
+import os
+import sys
+import time
+import queue
+import threading
+import subprocess
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+sys.path.append("../")
+from utils import *
+from trackers.ball_interpolator import OnlineBallInterpolator
+
+class LatestFrameReader():
+    def __init__(self, source, pace=None, metrics=None):
+        """
+        Decodes a source on a background thread and only ever hands out its newest frame.
+
+        Frames decoded while the consumer is still busy replace the waiting frame and are counted as dropped, so
+        the consumer never works on a backlog of stale frames.
+
+        Args:
+            source (str or VideoReader): Camera, pipe, URL or video file, or a VideoReader already opened on one
+                (a pipe can only be opened once, so pass the reader its properties were read from).
+            pace (bool, optional): Release frames at the source frame rate, as a camera would. Defaults to True for
+                video files (which would otherwise decode as fast as possible) and False for live sources.
+            metrics (Metrics, optional): Counts frames_decoded and frames_dropped.
+        """
+        self.reader = source if isinstance(source, VideoReader) else VideoReader(source, prefetch=0) # decoded on this reader's own thread
+        self.fps = self.reader.fps
+        self.pace = is_video_file(self.reader.path) if pace is None else pace
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.condition = threading.Condition()
+        self.latest = None # (frame_idx, frame, arrival_time) not yet taken by the consumer
+        self.finished = False
+        self.error = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.decode_worker, name="latest_frame_reader", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def decode_worker(self):
+        start_time = time.perf_counter()
+        try:
+            for frame_idx, frame in enumerate(self.reader.read()):
+                if self.stop_event.is_set():
+                    return
+                if self.pace: # wait for the moment a camera would deliver this frame
+                    delay = start_time + frame_idx / self.fps - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                with self.condition:
+                    if self.latest is not None: # the consumer never got to the previous frame
+                        self.metrics.count("frames_dropped")
+                    self.latest = (frame_idx, frame, time.perf_counter()) # arrival time for end-to-end latency
+                    self.metrics.count("frames_decoded")
+                    self.condition.notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            with self.condition:
+                self.finished = True
+                self.condition.notify()
+
+    def get(self):
+        """Wait for and return the newest (frame_idx, frame, arrival_time), or None once the source has ended."""
+        with self.condition:
+            while self.latest is None and not self.finished:
+                self.condition.wait(timeout=0.1)
+            if self.error is not None:
+                raise self.error
+            item, self.latest = self.latest, None
+            return item
+
+    def stop(self):
+        self.stop_event.set()
+
+# Degradation levels tried in order as processing falls behind the budget: (run ball model every n frames or 0 for never, player imgsz or None for the model's own)
+DEFAULT_LEVELS = ((1, None), (2, None), (2, 480), (0, 480), (0, 320))
+
+class DeadlineController():
+    def __init__(self, budget_s, levels=DEFAULT_LEVELS, smoothing=0.2, recover_ratio=0.7, hold_frames=30, warmup_frames=1, settle_frames=None):
+        """
+        Picks how much work to do per frame so processing time stays within a per-frame latency budget.
+
+        Processing time is smoothed with an exponential moving average that carries over level changes. Above the
+        budget the controller moves to the next (cheaper) level, then gives the average settle_frames frames to
+        reflect that level before moving again, so one slow frame can't cascade down every level. It only moves
+        back once the average has stayed below recover_ratio of the budget for hold_frames frames, so it doesn't
+        oscillate between levels. The first warmup_frames frames (court detection, model warm-up) are not timed.
+
+        Args:
+            budget_s (float): Per-frame processing budget in seconds, normally 1 / fps.
+            levels (tuple): (ball_every, player_imgsz) per level, cheapest last. ball_every=0 skips the ball model.
+            smoothing (float): Weight of the newest frame in the moving average.
+            recover_ratio (float): Fraction of the budget the average must stay under to move back a level.
+            hold_frames (int): Frames the average must stay under it first.
+            warmup_frames (int): Frames at the start left out of the average.
+            settle_frames (int, optional): Frames after a level change before the next one, defaults to 1 / smoothing.
+        """
+        self.budget_s = budget_s
+        self.levels = levels
+        self.smoothing = smoothing
+        self.recover_ratio = recover_ratio
+        self.hold_frames = hold_frames
+        self.warmup_frames = warmup_frames
+        self.settle_frames = settle_frames if settle_frames is not None else int(round(1 / smoothing))
+        self.level = 0
+        self.average_s = None
+        self.frames_under = 0
+        self.frames_processed = 0 # processed frames, source frame indices skip the dropped ones
+        self.frames_since_change = 0
+
+    @property
+    def ball_every(self):
+        return self.levels[self.level][0]
+
+    @property
+    def player_imgsz(self):
+        return self.levels[self.level][1]
+
+    def run_ball(self):
+        # Counted over processed frames: once frames are dropped the source indices are sparse and may share a parity
+        return self.ball_every > 0 and self.frames_processed % self.ball_every == 0
+
+    def update(self, elapsed_s):
+        """Add the processing time of a frame, returns the level to use for the next one."""
+        self.frames_processed += 1
+        if self.frames_processed <= self.warmup_frames:
+            return self.level
+        self.average_s = elapsed_s if self.average_s is None else self.smoothing * elapsed_s + (1 - self.smoothing) * self.average_s
+        self.frames_since_change += 1
+        if self.average_s > self.budget_s:
+            self.frames_under = 0
+            if self.level < len(self.levels) - 1 and self.frames_since_change >= self.settle_frames:
+                self.level += 1
+                self.frames_since_change = 0
+        elif self.average_s < self.budget_s * self.recover_ratio and self.level > 0:
+            self.frames_under += 1
+            if self.frames_under >= self.hold_frames:
+                self.level -= 1
+                self.frames_under = 0
+                self.frames_since_change = 0
+        else:
+            self.frames_under = 0
+        return self.level
+
+class NonBlockingSink():
+    def __init__(self, write_frame, close=None, queue_size=2, name="sink", metrics=None):
+        """
+        Hands frames to a slow output on a background thread without ever blocking the caller.
+
+        When the output falls behind, the oldest waiting frame is dropped to make room for the newest.
+
+        Args:
+            write_frame (callable): Writes one frame, runs on the sink's thread.
+            close (callable, optional): Releases the output once every waiting frame is written.
+            queue_size (int): Frames waiting for the output.
+            name (str): Name of the sink's thread.
+            metrics (Metrics, optional): Counts sink_frames_dropped and times sink_write.
+        """
+        self.write_frame = write_frame
+        self.close_output = close
+        self.metrics = metrics
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.thread = threading.Thread(target=self.worker, name=name, daemon=True)
+        self.thread.start()
+
+    def worker(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                return
+            if self.error is None: # keep draining after an error so write() never blocks
+                try:
+                    with time_stage(self.metrics, "sink_write"):
+                        self.write_frame(frame)
+                except Exception as e:
+                    self.error = e
+
+    def write(self, frame):
+        if self.error is not None:
+            raise self.error
+        while True:
+            try:
+                self.queue.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait() # drop the oldest waiting frame, the newest is worth more
+                    if self.metrics is not None:
+                        self.metrics.count("sink_frames_dropped")
+                except queue.Empty:
+                    pass
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.close_output is not None:
+            self.close_output()
+        if self.error is not None:
+            raise self.error
+
+def create_file_sink(path, fps, frame_size, fourcc="MJPG", metrics=None):
+    """Sink encoding frames to a video file."""
+    writer = VideoWriter(path, fps, frame_size, fourcc=fourcc, queue_size=0) # already on the sink's thread
+    return NonBlockingSink(writer.write, writer.close, name="file_sink", metrics=metrics)
+
+def create_pipe_sink(command=None, metrics=None):
+    """
+    Sink writing raw BGR frames to stdout, or to the stdin of a command, e.g. for a live preview:
+    ffplay -f rawvideo -pixel_format bgr24 -video_size 1280x720 -framerate 30 -
+    """
+    if command is None:
+        stream, process = sys.stdout.buffer, None
+    else:
+        process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        stream = process.stdin
+
+    def write_frame(frame):
+        stream.write(np.ascontiguousarray(frame).tobytes())
+        stream.flush()
+
+    def close():
+        if process is not None:
+            process.stdin.close()
+            process.wait()
+
+    return NonBlockingSink(write_frame, close, name="pipe_sink", metrics=metrics)
+
+class SharedMemoryFrame():
+    HEADER_BYTES = 16 # sequence number and frame index, both int64
+
+    def __init__(self, name, frame_shape, create=False):
+        """
+        Single-slot shared-memory frame another process can poll for the newest frame without any copies in between.
+
+        The writer makes the sequence number odd while it copies the frame and even once the copy is complete, so a
+        reader that sees the same even number before and after copying knows its copy is whole (a seqlock).
+
+        Args:
+            name (str): Name of the shared memory block.
+            frame_shape (tuple): (height, width, 3) of the frames.
+            create (bool): Create the block (writer) rather than attach to an existing one (reader).
+        """
+        self.frame_shape = tuple(frame_shape)
+        size = self.HEADER_BYTES + int(np.prod(self.frame_shape))
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.owner = create
+        self.header = np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf[:self.HEADER_BYTES])
+        self.frame = np.ndarray(self.frame_shape, dtype=np.uint8, buffer=self.shm.buf[self.HEADER_BYTES:size])
+        if create:
+            self.header[:] = (0, -1)
+
+    def write(self, frame, frame_idx):
+        self.header[0] += 1 # odd: copy in progress
+        self.frame[...] = frame
+        self.header[1] = frame_idx
+        self.header[0] += 1 # even: copy complete
+
+    def read(self, last_sequence=None):
+        """Return (sequence, frame_idx, frame copy) of the newest complete frame, or None if nothing newer than last_sequence."""
+        while True:
+            sequence = int(self.header[0])
+            if sequence == 0 or sequence == last_sequence:
+                return None
+            if sequence % 2 == 1: # the writer is mid-copy
+                time.sleep(0)
+                continue
+            frame, frame_idx = self.frame.copy(), int(self.header[1])
+            if int(self.header[0]) == sequence:
+                return sequence, frame_idx, frame
+
+    def close(self):
+        del self.header, self.frame # views must go before the block is closed
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def create_shared_memory_sink(name, frame_shape, metrics=None):
+    """Sink publishing the newest frame in shared memory, see SharedMemoryFrame for the reader side."""
+    slot = SharedMemoryFrame(name, frame_shape, create=True)
+    frame_counter = iter(range(sys.maxsize))
+    return NonBlockingSink(lambda frame: slot.write(frame, next(frame_counter)), slot.close, name="shm_sink", metrics=metrics)
+
+class RealtimeProcessor():
+    def __init__(self, player_tracker, ball_tracker, sink, budget_s=None, court_detector=None, levels=DEFAULT_LEVELS, metrics=None, max_predict=10):
+        """
+        Tracks players and ball on a live source within a per-frame latency budget.
+
+        Always works on the newest frame (older ones are dropped), runs the player and ball models in parallel,
+        degrades through DeadlineController levels when processing falls behind, and writes to a sink that never
+        blocks. Ball positions are extrapolated straight away for frames without one, nothing is held back, and for at
+        most max_predict frames after the last detection so a skipped ball model doesn't send the ball off the court.
+
+        Args:
+            player_tracker (PlayerTracker): Tracker used for player detection.
+            ball_tracker (BallTracker): Tracker used for ball detection.
+            sink (NonBlockingSink): Where annotated frames go, e.g. from create_file_sink.
+            budget_s (float, optional): Per-frame processing budget in seconds, defaults to one source frame interval.
+            court_detector (CourtDetector, optional): Detects and draws the court keypoints, re-checked periodically.
+            levels (tuple): Degradation levels, see DeadlineController.
+            metrics (Metrics, optional): Collects latencies and frame counts, created if not given.
+            max_predict (int): Most processed frames the ball is extrapolated for without a detection.
+        """
+        self.player_tracker = player_tracker
+        self.ball_tracker = ball_tracker
+        self.sink = sink
+        self.budget_s = budget_s
+        self.court_detector = court_detector
+        self.levels = levels
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.ball_interpolator = OnlineBallInterpolator(max_lag=0, mode="velocity", max_predict=max_predict)
+        self.ball_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ball_model")
+        self.court_keypoints = None
+        self.court_overlay = None
+        self.level_frames = collections.Counter() # frames processed at each level
+
+    def process_frame(self, frame_idx, frame, controller):
+        # Ball model on its own thread while the player model runs, both release the GIL
+        ball_future = self.ball_pool.submit(self.ball_tracker.detect_frame, frame) if controller.run_ball() else None
+        player_dict = self.player_tracker.detect_frame(frame, imgsz=controller.player_imgsz)
+        ball_dict = ball_future.result() if ball_future is not None else {}
+        ((_, ball_dict),) = self.ball_interpolator.update(ball_dict) # max_lag=0 releases every frame immediately
+
+        if self.court_detector is not None:
+            processed_idx = controller.frames_processed # re-check cadence in processed frames, dropped frames never arrive
+            keypoints = self.court_detector.update_keypoints(frame, self.court_keypoints, processed_idx) if processed_idx > 0 else self.court_detector.create_keypoints(frame)
+            if keypoints is not self.court_keypoints:
+                self.court_keypoints = keypoints
+                self.court_overlay = self.court_detector.create_keypoints_overlay(frame.shape, keypoints) if keypoints is not None else None
+
+        with time_stage(self.metrics, "drawing", frame_idx):
+            frame = self.player_tracker.draw_bounding_box(frame, player_dict)
+            frame = self.ball_tracker.draw_bounding_box(frame, ball_dict)
+            if self.court_overlay is not None:
+                frame = self.court_overlay.apply(frame)
+            cv2.putText(frame, f"Frame {frame_idx}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 255), 2)
+        return frame
+
+    def run(self, source, pace=None, on_frame=None):
+        """
+        Process a source until it ends.
+
+        Args:
+            source (str or VideoReader): Camera, pipe, URL or video file, see LatestFrameReader.
+            pace (bool, optional): Release file frames at the source frame rate, see LatestFrameReader.
+            on_frame (callable, optional): Called as on_frame(frame_idx, frame) with every annotated frame.
+
+        Returns:
+            dict: Report from report().
+        """
+        reader = LatestFrameReader(source, pace=pace, metrics=self.metrics)
+        if not reader.reader.opened:
+            raise IOError(f"Could not open {source}")
+        controller = DeadlineController(self.budget_s or 1.0 / reader.fps, self.levels)
+        start_time = time.perf_counter()
+        reader.start()
+        try:
+            while True:
+                item = reader.get()
+                if item is None:
+                    break
+                frame_idx, frame, arrival_time = item
+                self.level_frames[controller.level] += 1
+                process_start = time.perf_counter()
+                frame = self.process_frame(frame_idx, frame, controller)
+                processing_s = time.perf_counter() - process_start
+                self.sink.write(frame)
+                if on_frame is not None:
+                    on_frame(frame_idx, frame)
+
+                # End-to-end latency includes the wait for the previous frame to finish, the budget only bounds processing
+                self.metrics.add_duration("latency", time.perf_counter() - arrival_time, frame_idx=frame_idx) # frame available -> handed to the sink
+                self.metrics.add_duration("processing", processing_s, start=process_start, frame_idx=frame_idx)
+                self.metrics.count("frames_processed")
+                if processing_s > controller.budget_s:
+                    self.metrics.count("deadline_misses")
+                self.metrics.gauge("degradation_level", controller.update(processing_s))
+        finally:
+            reader.stop()
+            self.ball_pool.shutdown(wait=True)
+        return self.report(time.perf_counter() - start_time, controller.budget_s)
+
+    def report(self, elapsed, budget_s):
+        """End-to-end latency percentiles, drop rate and the share of frames processed at each degradation level."""
+        summary = self.metrics.summary()
+        counters = summary["counters"]
+        latency = summary["timers"].get("latency", {})
+        processing = summary["timers"].get("processing", {})
+        processed, dropped = counters.get("frames_processed", 0), counters.get("frames_dropped", 0)
+        return {
+            "frames_processed": processed,
+            "frames_dropped": dropped,
+            "drop_rate": dropped / (processed + dropped) if processed + dropped else 0.0,
+            "sink_frames_dropped": counters.get("sink_frames_dropped", 0),
+            "fps": processed / elapsed if elapsed > 0 else 0.0,
+            "budget_ms": budget_s * 1000,
+            "deadline_miss_rate": counters.get("deadline_misses", 0) / processed if processed else 0.0,
+            "latency_p50_ms": latency.get("p50_ms", 0.0),
+            "latency_p99_ms": latency.get("p99_ms", 0.0),
+            "latency_max_ms": latency.get("max_ms", 0.0),
+            "processing_p50_ms": processing.get("p50_ms", 0.0),
+            "processing_p99_ms": processing.get("p99_ms", 0.0),
+            "level_fractions": {level: n / processed for level, n in sorted(self.level_frames.items())} if processed else {},
+        }
@@ -0,0 +1,141 @@
+import os
+import sys
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+sys.path.append("../")
+from utils import *
+
+def create_default_trackers(player_model_path="./models/yolov5nu.pt", ball_model_path="./models/yolov5n6u_ball.pt"):
+    """Create the player and ball trackers used by colab_stream.py, one pair per segment."""
+    from trackers import PlayerTracker, BallTracker # imported in the worker process
+    return PlayerTracker(model_path=player_model_path), BallTracker(model_path=ball_model_path)
+
+def plan_segments(n_frames, segment_length, overlap=30):
+    """
+    Split a video into consecutive frame-range segments, each read with a few frames of overlap.
+
+    Every frame is owned by exactly one segment, [start, end). A segment also decodes the `overlap` frames before
+    its start so its tracker is warmed up by the time it reaches its own frames, and so its track IDs can be matched
+    against the previous segment's on those frames.
+
+    Args:
+        n_frames (int): Number of frames in the video.
+        segment_length (int): Number of frames owned by each segment.
+        overlap (int): Number of frames before each segment's start that it also processes.
+
+    Returns:
+        list: (read_start, start, end) for each segment.
+    """
+    segment_length = max(1, int(segment_length))
+    segments = []
+    for start in range(0, n_frames, segment_length):
+        end = min(start + segment_length, n_frames)
+        segments.append((max(0, start - overlap), start, end))
+    return segments
+
+def _init_segment_worker(threads_per_worker):
+    # Keep each worker from spreading its OpenCV and torch kernels over every core the other workers are using
+    cv2.setNumThreads(threads_per_worker)
+    try:
+        import torch # imported here because the trackers only import it when their model loads, after this runs
+        torch.set_num_threads(threads_per_worker)
+    except ImportError: # backends without torch (e.g. ONNX Runtime, OpenVINO) size their own thread pools
+        pass
+
+def detect_segment(video_path, read_start, end, tracker_factory, batch_size=1):
+    """
+    Run player and ball detection on frames [read_start, end) with trackers of their own.
+
+    Args:
+        video_path (str): Path to the video file.
+        read_start (int): First frame to decode, including the overlap with the previous segment.
+        end (int): Frame after the last frame to decode.
+        tracker_factory (callable): Returns a fresh (player_tracker, ball_tracker) pair, must be picklable.
+        batch_size (int): Number of frames sent through each model per inference call.
+
+    Returns:
+        tuple: (player_detections, ball_detections) lists with one dict per decoded frame.
+    """
+    player_tracker, ball_tracker = tracker_factory() # fresh trackers so track IDs only persist within the segment
+    player_detections, ball_detections = [], []
+    for batch in batch_frames(read_video_range(video_path, read_start, end), batch_size):
+        player_detections.extend(player_tracker.detect_batch(batch))
+        ball_detections.extend(ball_tracker.detect_batch(batch))
+    return player_detections, ball_detections
+
+def stitch_segments(segments, segment_results, min_iou=0.5):
+    """
+    Merge per-segment detections into one timeline with player IDs consistent across segment boundaries.
+
+    IDs of each segment are matched to the previous segment's by box overlap on their shared frames; IDs without a
+    match are new players and get IDs no earlier segment used.
+
+    Args:
+        segments (list): (read_start, start, end) for each segment, from plan_segments.
+        segment_results (list): (player_detections, ball_detections) for each segment, from detect_segment.
+        min_iou (float): Minimum mean IoU over the shared frames for two IDs to be the same player.
+
+    Returns:
+        tuple: (player_detections, ball_detections) lists with one dict per frame of the video.
+    """
+    player_detections, ball_detections = [], []
+    next_free_id = 1
+    for (read_start, start, end), (segment_players, segment_balls) in zip(segments, segment_results):
+        warm_up = start - read_start
+        first_segment = not player_detections
+        id_map = {}
+        if not first_segment and warm_up > 0:
+            shared = min(warm_up, len(player_detections))
+            id_map = match_track_ids(player_detections[start - shared:start], segment_players[warm_up - shared:warm_up], min_iou)
+
+        for player_dict in segment_players[warm_up:]:
+            remapped = {}
+            for track_id, bbox in player_dict.items():
+                if track_id not in id_map: # new player in this segment, the first segment keeps the tracker's IDs
+                    id_map[track_id] = track_id if first_segment else next_free_id
+                    next_free_id = max(next_free_id, id_map[track_id] + 1)
+                remapped[id_map[track_id]] = bbox
+            player_detections.append(remapped)
+        ball_detections.extend(segment_balls[warm_up:])
+
+    return player_detections, ball_detections
+
+def detect_segments_parallel(video_path, tracker_factory=create_default_trackers, n_workers=None, segment_length=None, overlap=30, batch_size=1, min_iou=0.5):
+    """
+    Run player and ball detection on segments of a video in a process pool and stitch the results together.
+
+    Args:
+        video_path (str): Path to a seekable video file.
+        tracker_factory (callable): Returns a fresh (player_tracker, ball_tracker) pair, must be picklable (a module-level function).
+        n_workers (int, optional): Number of worker processes, defaults to the number of CPUs.
+        segment_length (int, optional): Number of frames per segment, defaults to an even split over the workers.
+        overlap (int): Number of frames shared by consecutive segments for tracker warm-up and ID stitching.
+        batch_size (int): Number of frames sent through each model per inference call.
+        min_iou (float): Minimum mean IoU over the shared frames for two IDs to be the same player.
+
+    Returns:
+        tuple: (player_detections, ball_detections) lists with one dict per frame of the video.
+    """
+    n_frames = count_video_frames(video_path)
+    if n_frames == 0:
+        raise ValueError(f"Unable to count the frames of {video_path}, segments need a seekable video file")
+    n_workers = n_workers or os.cpu_count() or 1
+    if segment_length is None:
+        segment_length = math.ceil(n_frames / n_workers)
+    segments = plan_segments(n_frames, segment_length, overlap)
+    threads_per_worker = max(1, (os.cpu_count() or 1) // n_workers)
+
+    # Spawn rather than fork so workers don't inherit the parent's torch and OpenCV thread pools
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(segments)), mp_context=context, initializer=_init_segment_worker, initargs=(threads_per_worker,)) as pool:
+        futures = [pool.submit(detect_segment, video_path, read_start, end, tracker_factory, batch_size) for read_start, _, end in segments]
+        segment_results = [future.result() for future in futures]
+
+    # Stitching slices each segment by position, a segment that decoded fewer or more frames would shift every later frame
+    for (read_start, _, end), (segment_players, segment_balls) in zip(segments, segment_results):
+        if len(segment_players) != end - read_start or len(segment_balls) != end - read_start:
+            raise RuntimeError(f"Segment [{read_start}, {end}) of {video_path} returned {len(segment_players)} player and {len(segment_balls)} ball frames, expected {end - read_start}")
+
+    return stitch_segments(segments, segment_results, min_iou)
@@ -0,0 +1,116 @@
+import cv2
+import sys
+sys.path.append("../")
+from utils import *
+from trackers.ball_interpolator import OnlineBallInterpolator
+
+def detect_stream(video_frames, player_tracker, ball_tracker, court_detector=None, court_keypoints_path=None, batch_size=1):
+    """
+    Run player and ball detection on frames as they are decoded.
+
+    Args:
+        video_frames (iterable): Frames in video order, e.g. from read_video_stream.
+        player_tracker (PlayerTracker): Tracker used for player detection.
+        ball_tracker (BallTracker): Tracker used for ball detection.
+        court_detector (CourtDetector, optional): If given, court keypoints are created from the first frame and
+            auto-detected keypoints are re-checked periodically in case the camera moves.
+        court_keypoints_path (str, optional): Path to save the court keypoints as a JSON file.
+        batch_size (int): Number of frames sent through each model per inference call.
+
+    Yields:
+        tuple: (frame, player_dict, ball_dict, court_keypoints) for each frame. ball_dict is the raw detection.
+    """
+    court_keypoints = None
+    frame_idx = 0
+    for batch_idx, batch in enumerate(batch_frames(video_frames, batch_size)):
+        player_detections = player_tracker.detect_batch(batch) # detect players in the batch
+        ball_detections = ball_tracker.detect_batch(batch) # detect ball in the batch
+
+        # Detect court lines on the first frame once it has been through the detectors
+        if batch_idx == 0 and court_detector is not None:
+            court_keypoints = court_detector.create_keypoints(batch[0], save_path=court_keypoints_path)
+
+        for frame, player_dict, ball_dict in zip(batch, player_detections, ball_detections):
+            if court_detector is not None and frame_idx > 0:
+                court_keypoints = court_detector.update_keypoints(frame, court_keypoints, frame_idx)
+            yield frame, player_dict, ball_dict, court_keypoints
+            frame_idx += 1
+
+def draw_stream(detections, player_tracker, ball_tracker, court_detector=None, metrics=None, max_lag=50):
+    """
+    Interpolate ball positions and draw overlays on frames as they leave the detectors.
+
+    Frames without a ball are held back until the next detection so the gap can be interpolated, but never more
+    than max_lag of them: the oldest is then drawn with the last known ball position (none before the first
+    detection). Gaps up to max_lag frames
+    get the same positions as interpolate_ball_position; longer ones (the ball out of view between points) do
+    not, and in exchange memory is bounded by max_lag frames instead of the longest gap.
+
+    Args:
+        detections (iterable): (frame, player_dict, ball_dict, court_keypoints) tuples from detect_stream.
+        player_tracker (PlayerTracker): Tracker used to draw player boxes.
+        ball_tracker (BallTracker): Tracker used to draw the ball.
+        court_detector (CourtDetector, optional): Detector used to draw the court keypoints.
+        metrics (Metrics, optional): Collects interpolation and drawing timings and the memory high-water mark.
+        max_lag (int): Most frames held back waiting for a ball detection.
+
+    Yields:
+        numpy.ndarray: Annotated frames in video order.
+    """
+    interpolator = OnlineBallInterpolator(max_lag=max_lag) # holds frames back only during gaps in ball detections
+    court_overlay = None # rendered once, and again only if the court keypoints are re-detected
+    overlay_keypoints = None
+    frame_idx = 0
+
+    def interpolated():
+        for frame, player_dict, ball_dict, court_keypoints in detections:
+            with time_stage(metrics, "interpolation"):
+                released = interpolator.update(ball_dict, (frame, player_dict, court_keypoints))
+            yield from released
+        yield from interpolator.flush()
+
+    for (frame, player_dict, court_keypoints), ball_dict in interpolated():
+        with time_stage(metrics, "drawing", frame_idx):
+            frame = player_tracker.draw_bounding_box(frame, player_dict) # draw bounding boxes around players
+            frame = ball_tracker.draw_bounding_box(frame, ball_dict) # draw bounding box around ball
+            if court_detector is not None and court_keypoints is not None:
+                if court_overlay is None or court_keypoints is not overlay_keypoints:
+                    overlay_keypoints = court_keypoints
+                    court_overlay = court_detector.create_keypoints_overlay(frame.shape, court_keypoints)
+                frame = court_overlay.apply(frame) # draw court lines
+
+            # Add frame number to video
+            cv2.putText(frame, f"Frame {frame_idx}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 255), 2)
+
+        if metrics is not None:
+            metrics.count("frames_drawn")
+            if frame_idx % 100 == 0:
+                metrics.sample_memory()
+
+        yield frame
+        frame_idx += 1
+
+def run_streaming_pipeline(input_video_path, output_video_path, player_tracker, ball_tracker, court_detector=None, court_keypoints_path=None, batch_size=1, metrics=None, max_lag=50):
+    """
+    Decode, detect, interpolate, draw and encode one frame at a time.
+
+    Produces the same output as reading the whole video with read_video and running each step over the full
+    list of frames, except in gaps in ball detections longer than max_lag frames (see draw_stream). Peak memory
+    is bounded by the batch size and max_lag rather than the video length.
+
+    Args:
+        input_video_path (str): Path to the input video file.
+        output_video_path (str): Path to save the annotated video.
+        player_tracker (PlayerTracker): Tracker used for player detection.
+        ball_tracker (BallTracker): Tracker used for ball detection.
+        court_detector (CourtDetector, optional): Detector used to create and draw court keypoints.
+        court_keypoints_path (str, optional): Path to save the court keypoints as a JSON file.
+        batch_size (int): Number of frames sent through each model per inference call.
+        metrics (Metrics, optional): Collects per-stage timings; pass the same instance to the trackers.
+        max_lag (int): Most frames held back waiting for a ball detection.
+    """
+    reader = VideoReader(input_video_path, metrics=metrics) # decodes ahead on a background thread
+    video_frames = reader.read()
+    detections = detect_stream(video_frames, player_tracker, ball_tracker, court_detector, court_keypoints_path, batch_size)
+    output_video_frames = draw_stream(detections, player_tracker, ball_tracker, court_detector, metrics, max_lag)
+    save_video_stream(output_video_frames, output_video_path, metrics, fps=reader.fps)
@@ -1,2 +1,6 @@
+from .ball_interpolator import *
 from .ball_tracker import *
-from .player_tracker import *
\ No newline at end of file
+from .player_tracker import *
+from .keyframe_player_tracker import *
+from .model_cache import *
+from .inference_backends import *
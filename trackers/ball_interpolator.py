@@ -0,0 +1,115 @@
+from collections import deque
+
+class OnlineBallInterpolator():
+    def __init__(self, max_lag=10, mode="linear", max_predict=None):
+        """
+        Fills missed ball detections one frame at a time with a bounded delay.
+
+        Frames without a ball are held back for up to max_lag frames waiting for the next detection. If it
+        arrives in time the gap is filled by linear interpolation, giving the same positions as
+        BallTracker.interpolate_ball_position on the same sequence. Frames that have to be released before the
+        gap closes are filled according to mode.
+
+        Args:
+            max_lag (int or None): Maximum number of frames held back, 0 releases every frame immediately and
+                None waits as long as needed (exact offline behaviour).
+            mode (str): How frames released before the gap closes are filled, "linear" holds the last known
+                position and "velocity" extrapolates it with the velocity between the last two detections.
+            max_predict (int, optional): Most frames after the last detection that are filled this way, later
+                ones are released without a ball (no_ball). None fills every frame.
+        """
+        if mode not in ("linear", "velocity"):
+            raise ValueError(f"Unknown interpolation mode: {mode}")
+        self.max_lag = max_lag
+        self.mode = mode
+        self.max_predict = max_predict
+        self.reset()
+
+    def reset(self):
+        self.pending = deque() # ring buffer of payloads waiting for the next ball detection
+        self.frame_idx = -1 # index of the latest frame passed to update
+        self.last_bbox = None # last position used as an interpolation anchor
+        self.last_idx = None # frame index of the anchor
+        self.velocity = (0.0, 0.0, 0.0, 0.0) # per-frame ball velocity between the last two detections
+        self.last_detection_idx = None # frame index of the last real detection
+        self.last_detection_bbox = None # position of the last real detection
+
+    def predict(self, frame_idx):
+        """Return the predicted box at frame_idx from the last anchor, or None before the first detection."""
+        if self.last_bbox is None:
+            return None
+        if self.mode == "linear":
+            return list(self.last_bbox)
+        steps = frame_idx - self.last_idx
+        return [x0 + v * steps for x0, v in zip(self.last_bbox, self.velocity)]
+
+    def update(self, ball_dict, payload=None):
+        """
+        Add the detection of the next frame.
+
+        Args:
+            ball_dict (dict): Ball detection for the frame ({1: [x1, y1, x2, y2]} or empty).
+            payload (optional): Anything to keep alongside the frame, e.g. the frame itself.
+
+        Returns:
+            list: (payload, ball_dict) pairs released by this frame, in frame order.
+        """
+        self.frame_idx += 1
+        bbox = ball_dict.get(1, [])
+        released = []
+
+        if len(bbox) == 0: # no ball in this frame, hold it back until the gap closes
+            self.pending.append(payload)
+            if self.max_lag is not None and len(self.pending) > self.max_lag:
+                self.release_oldest(released)
+            return released
+
+        bbox = [float(x) for x in bbox]
+        first_idx = self.frame_idx - len(self.pending)
+        if self.last_bbox is None: # backfill the missing ball positions at beginning of the video
+            for pending_payload in self.pending:
+                released.append((pending_payload, {1: list(bbox)}))
+        else: # linearly interpolate between the anchor and current detection, same arithmetic as np.interp
+            gap = self.frame_idx - self.last_idx
+            slopes = [(x - x0) / gap for x0, x in zip(self.last_bbox, bbox)]
+            for step, pending_payload in enumerate(self.pending, start=first_idx - self.last_idx):
+                released.append((pending_payload, {1: [slope * step + x0 for slope, x0 in zip(slopes, self.last_bbox)]}))
+        self.pending.clear()
+
+        if self.last_detection_idx is not None: # velocity between the last two real detections
+            steps = self.frame_idx - self.last_detection_idx
+            self.velocity = tuple((x - x0) / steps for x0, x in zip(self.last_detection_bbox, bbox))
+        self.last_detection_idx = self.frame_idx
+        self.last_detection_bbox = bbox
+
+        self.last_bbox = bbox
+        self.last_idx = self.frame_idx
+        released.append((payload, {1: list(bbox)}))
+        return released
+
+    @staticmethod
+    def no_ball():
+        """Placeholder for a frame released without a ball position, the NaN box interpolate_ball_position gives it."""
+        return {1: [float("nan")] * 4}
+
+    def release_oldest(self, released):
+        """Release the oldest held-back frame with a predicted position, anchoring later fills to it."""
+        release_idx = self.frame_idx - len(self.pending) + 1
+        payload = self.pending.popleft()
+        bbox = self.predict(release_idx)
+        if bbox is not None and self.max_predict is not None and release_idx - self.last_detection_idx > self.max_predict:
+            bbox = None # the ball has been lost too long for its last velocity to say where it is
+        if bbox is None: # no ball seen yet or lost too long, nothing to fill with
+            released.append((payload, self.no_ball()))
+            return
+        self.last_bbox = bbox # keep the filled track continuous when the gap closes
+        self.last_idx = release_idx
+        released.append((payload, {1: list(bbox)}))
+
+    def flush(self):
+        """Release every held-back frame at the end of the stream, holding the last known position (NaN if none)."""
+        released = []
+        for payload in self.pending:
+            released.append((payload, {1: list(self.last_bbox)} if self.last_bbox is not None else self.no_ball()))
+        self.pending.clear()
+        return released
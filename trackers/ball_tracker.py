@@ -1,23 +1,143 @@
-from ultralytics import YOLO
 import cv2
 import pickle
-import pandas as pd
+import numpy as np
+import sys
+sys.path.append("../")
+from utils import *
+from detection_io import *
+from .ball_interpolator import OnlineBallInterpolator
+from .model_cache import load_model
+from .inference_backends import letterbox_shape
 
 class BallTracker:
-    def __init__(self, model_path):
-        self.model = YOLO(model_path) # load ball track model from path
+    def __init__(self, model_path, roi_size=None, max_roi_misses=5, model=None, metrics=None, backend=None):
+        """
+        Args:
+            model_path (str): Path to the ball detection model.
+            roi_size (int, optional): Side of the square crop searched around the predicted ball position (multiple
+                of 32). None searches the full frame every time.
+            max_roi_misses (int): Consecutive misses inside the crop before falling back to full-frame search.
+            model (optional): Already loaded model with the YOLO predict interface, used instead of loading model_path.
+            metrics (Metrics, optional): Collects inference and conversion timings.
+            backend (InferenceBackend, optional): Runtime the model is exported to and run on, defaults to PyTorch.
+        """
+        if roi_size is not None and roi_size % 32 != 0:
+            raise ValueError(f"roi_size must be a multiple of 32, got {roi_size}")
 
-    def detect_frame(self, frame):
-        results = self.model.predict(frame, conf=0.15)[0] # run object detection on the frame
+        self.model = model if model is not None else load_model(model_path, backend) # load ball track model from path unless one is given
+        self.model_path = model_path
+        self.metrics = metrics
+        self.conf = 0.15 # minimum confidence for a ball detection
+        self.roi_size = roi_size
+        self.max_roi_misses = max_roi_misses
+        self.imgsz = backend.imgsz if backend is not None else 640 # model input size of a full-frame search
+        self.inference_params = {"method": "predict", "conf": self.conf} # parameters that change the detections, part of the cache key
+        if roi_size is not None:
+            self.inference_params.update(roi_size=roi_size, max_roi_misses=max_roi_misses)
+        if backend is not None:
+            self.inference_params.update(backend.params)
+        self.reset_roi()
 
-        ball_dict = {}
-        for box in results.boxes: # iterate through each detected box
-            result = box.xyxy.tolist()[0] # get the bounding box coordinates
-            ball_dict[1] = result # add the bounding box coordinates to the ball dictionary
+    def reset_roi(self):
+        self.roi_centre = None # last known ball centre
+        self.roi_velocity = (0.0, 0.0) # ball centre velocity in pixels per frame
+        self.roi_misses = 0 # consecutive frames without a ball inside the crop
+        self.pixels_processed = 0 # letterboxed model input pixels actually run
+        self.full_frame_pixels = 0 # letterboxed model input pixels a full-frame search would have run
+
+    def detect_frame(self, frame, imgsz=None):
+        if self.roi_size is not None: # the crop is already small
+            return self.detect_frame_roi(frame)
+
+        size = {"imgsz": imgsz} if imgsz is not None else {} # smaller input size when running behind real time
+        with time_stage(self.metrics, "ball_inference"):
+            results = self.model.predict(frame, conf=self.conf, **size)[0] # run object detection on the frame
+
+        with time_stage(self.metrics, "ball_conversion"):
+            return self.convert_results(results)
+
+    def detect_batch(self, frames):
+        if self.roi_size is not None: # each crop depends on the previous detection
+            return [self.detect_frame_roi(frame) for frame in frames]
+
+        with time_stage(self.metrics, "ball_inference"):
+            results = self.model.predict(list(frames), conf=self.conf) # run object detection on all frames in one call
+
+        with time_stage(self.metrics, "ball_conversion"):
+            return [self.convert_results(frame_results) for frame_results in results]
+
+    def roi_window(self, frame_shape):
+        """Return the (x0, y0, x1, y1) crop around the predicted ball position, or None to search the full frame."""
+        if self.roi_centre is None or self.roi_misses >= self.max_roi_misses:
+            return None
+
+        frame_height, frame_width = frame_shape[:2]
+        if self.roi_size >= frame_width and self.roi_size >= frame_height:
+            return None
+
+        steps = self.roi_misses + 1 # frames since the last detection
+        centre_x = self.roi_centre[0] + self.roi_velocity[0] * steps # constant velocity prediction
+        centre_y = self.roi_centre[1] + self.roi_velocity[1] * steps
+        crop_width, crop_height = min(self.roi_size, frame_width), min(self.roi_size, frame_height)
+        x0 = int(min(max(centre_x - crop_width / 2, 0), frame_width - crop_width)) # keep the crop inside the frame
+        y0 = int(min(max(centre_y - crop_height / 2, 0), frame_height - crop_height))
+
+        return x0, y0, x0 + crop_width, y0 + crop_height
+
+    def detect_frame_roi(self, frame):
+        """Detect the ball in a crop around its predicted position, falling back to the full frame after repeated misses."""
+        window = self.roi_window(frame.shape)
+        full_height, full_width = letterbox_shape(frame.shape, self.imgsz) # what the model sees, not the source resolution
+        self.full_frame_pixels += full_height * full_width
+
+        if window is None: # full-frame search
+            with time_stage(self.metrics, "ball_inference"):
+                results = self.model.predict(frame, conf=self.conf)[0]
+            with time_stage(self.metrics, "ball_conversion"):
+                ball_dict = self.convert_results(results)
+            self.pixels_processed += full_height * full_width
+        else:
+            x0, y0, x1, y1 = window
+            with time_stage(self.metrics, "ball_inference"):
+                results = self.model.predict(frame[y0:y1, x0:x1], conf=self.conf, imgsz=self.roi_size)[0]
+            with time_stage(self.metrics, "ball_conversion"):
+                ball_dict = self.convert_results(results, offset=(x0, y0)) # map crop boxes back into the full frame
+            crop_height, crop_width = letterbox_shape((y1 - y0, x1 - x0), self.roi_size)
+            self.pixels_processed += crop_height * crop_width
+
+        if len(ball_dict) == 0:
+            self.roi_misses += 1
+            return ball_dict
+
+        centre = get_bbox_centre(ball_dict[1])
+        if self.roi_centre is not None:
+            steps = self.roi_misses + 1
+            self.roi_velocity = ((centre[0] - self.roi_centre[0]) / steps, (centre[1] - self.roi_centre[1]) / steps)
+        self.roi_centre = centre
+        self.roi_misses = 0
 
         return ball_dict
+
+    def roi_stats(self):
+        """Return the letterboxed input pixels run through the model and the fraction saved against full-frame search."""
+        saved = 1 - self.pixels_processed / self.full_frame_pixels if self.full_frame_pixels else 0.0
+        return {"pixels_processed": self.pixels_processed, "full_frame_pixels": self.full_frame_pixels, "pixels_saved": saved}
+
+    def convert_results(self, results, offset=(0, 0)):
+        if len(results.boxes) == 0:
+            return {}
+
+        # Keep the most confident ball candidate, pulling boxes and confidences out in one transfer each
+        xyxy = results.boxes.xyxy.cpu().numpy().reshape(-1, 4)
+        best = int(np.argmax(results.boxes.conf.cpu().numpy().reshape(-1)))
+        x1, y1, x2, y2 = xyxy[best].tolist()
+
+        return {1: [x1 + offset[0], y1 + offset[1], x2 + offset[0], y2 + offset[1]]} # crop to frame coordinates
     
-    def detect_frames(self, frames, read_from_stub=False, stub_path=None):
+    def create_cache(self, video_path, cache_dir="./tracker_stubs/cache", chunk_size=500):
+        return DetectionCache(cache_dir, video_path, self.model_path, self.inference_params, chunk_size) # keyed by video, weights and params
+
+    def detect_frames(self, frames, read_from_stub=False, stub_path=None, batch_size=1, cache=None):
         ball_detections = []
 
         if read_from_stub and stub_path is not None:
@@ -25,9 +145,11 @@ class BallTracker:
                 ball_detections = pickle.load(f)
             return ball_detections
 
-        for frame in frames: # iterate through each video frame
-            ball_dict = self.detect_frame(frame) # detect ball in the frame
-            ball_detections.append(ball_dict) # append the ball detections to the list
+        if cache is not None: # only run inference on chunks missing from the cache
+            return list(cache.detect(frames, self.detect_batch, batch_size))
+
+        for batch in batch_frames(frames, batch_size): # iterate through the video frames in batches
+            ball_detections.extend(self.detect_batch(batch)) # detect ball in the batch and append the detections to the list
 
         if stub_path is not None:
             with open(stub_path, "wb") as f:
@@ -36,22 +158,52 @@ class BallTracker:
         return ball_detections
     
     def interpolate_ball_position(self, ball_positions):
-        ball_positions = [x.get(1, []) for x in ball_positions] # get the ball positions from the ball detections
-        df_ball_positions = pd.DataFrame(ball_positions, columns=["x1", "y1", "x2", "y2"]) # create a dataframe from the ball positions
-        df_ball_positions = df_ball_positions.interpolate() # interpolate the missing ball positions
-        df_ball_positions = df_ball_positions.bfill() # backfill the missing ball positions at beginning of the video
+        with time_stage(self.metrics, "interpolation"):
+            return interpolate_ball_positions(ball_positions)
+    
+    def interpolate_ball_stream(self, ball_stream):
+        """
+        Streaming equivalent of interpolate_ball_position.
 
-        ball_positions = [{1: x} for x in df_ball_positions.to_numpy().tolist()] # convert the ball positions back to the original format
+        Args:
+            ball_stream (iterable): (ball_dict, payload) pairs in frame order. The payload (e.g. the frame) is
+                passed through untouched so callers can keep it alongside its detection.
+
+        Yields:
+            tuple: (payload, ball_dict) pairs in frame order with the same values interpolate_ball_position
+                would produce. Frames are held back only while waiting for the end of a gap in detections.
+        """
+        interpolator = OnlineBallInterpolator(max_lag=None) # wait for every gap to close, exact offline behaviour
+        for ball_dict, payload in ball_stream:
+            yield from interpolator.update(ball_dict, payload)
+        yield from interpolator.flush()
+
+    def draw_bounding_box(self, frame, ball_dict):
+        for track_id, bbox in ball_dict.items(): # iterate through each ball detection
+            if np.isnan(bbox).any(): # no ball seen yet, nothing to draw
+                continue
+            x1, y1, x2, y2 = bbox # get the bounding box coordinates
+            cv2.putText(frame, f"Ball ID {track_id}", (int(bbox[0]), int(bbox[1]-10)), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 255), 2) # add ball ID text to the frame
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (255, 0, 255), 2) # draw bounding box around ball
+
+        return frame
 
-        return ball_positions
-    
     def draw_bounding_boxes(self, video_frames, ball_detections):
         output_video_frames = []
         for frame, ball_dict in zip(video_frames, ball_detections): # iterate through each frame and ball detection
-            for track_id, bbox in ball_dict.items(): # iterate through each ball detection
-                x1, y1, x2, y2 = bbox # get the bounding box coordinates
-                cv2.putText(frame, f"Ball ID {track_id}", (int(bbox[0]), int(bbox[1]-10)), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 255), 2) # add ball ID text to the frame
-                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (255, 0, 255), 2) # draw bounding box around ball
+            frame = self.draw_bounding_box(frame, ball_dict) # draw the ball bounding box on the frame
             output_video_frames.append(frame) # append the frame with bounding boxes to the output list
 
-        return output_video_frames
\ No newline at end of file
+        return output_video_frames
+
+# Function to fill missed ball detections, usable without loading a ball model (e.g. after merging segments)
+def interpolate_ball_positions(ball_positions):
+    import pandas as pd # only needed here, keeps pandas out of the import of every entry point
+    ball_positions = [x.get(1, []) for x in ball_positions] # get the ball positions from the ball detections
+    df_ball_positions = pd.DataFrame(ball_positions, columns=["x1", "y1", "x2", "y2"]) # create a dataframe from the ball positions
+    df_ball_positions = df_ball_positions.interpolate() # interpolate the missing ball positions
+    df_ball_positions = df_ball_positions.bfill() # backfill the missing ball positions at beginning of the video
+
+    ball_positions = [{1: x} for x in df_ball_positions.to_numpy().tolist()] # convert the ball positions back to the original format
+
+    return ball_positions
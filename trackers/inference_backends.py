@@ -0,0 +1,200 @@
+import os
+import json
+import shutil
+import hashlib
+import cv2
+import numpy as np
+import sys
+sys.path.append("../")
+from utils import *
+
+BACKENDS = ("torch", "onnx", "openvino")
+PRECISIONS = ("fp32", "int8")
+DEFAULT_EXPORT_DIR = "./tracker_stubs/cache/exported_models"
+
+# Function to resize a BGR frame into a padded square the way YOLO preprocessing does, returns (1,3,size,size) float32 RGB
+def letterbox_frame(frame, size=640, pad_value=114):
+    height, width = frame.shape[:2]
+    scale = min(size / height, size / width)
+    resized = cv2.resize(frame, (int(round(width * scale)), int(round(height * scale))), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((size, size, 3), pad_value, dtype=np.uint8)
+    top, left = (size - resized.shape[0]) // 2, (size - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return (canvas[..., ::-1].transpose(2, 0, 1)[None] / 255.0).astype(np.float32)
+
+# Function to find the (height, width) a frame is fed to the model at by YOLO predict: the long side scaled to size, each side padded up to a multiple of stride
+def letterbox_shape(shape, size=640, stride=32):
+    height, width = shape[:2]
+    scale = min(size / height, size / width)
+    resized_height, resized_width = int(round(height * scale)), int(round(width * scale))
+    return -(-resized_height // stride) * stride, -(-resized_width // stride) * stride
+
+def build_calibration_set(video_paths, output_dir, n_frames=200, names=None):
+    """
+    Sample frames evenly from our own footage for INT8 calibration.
+
+    Args:
+        video_paths (list): Videos to sample from, frames are split evenly between them.
+        output_dir (str): Directory the frames (images/) and an ultralytics data.yaml are written to.
+        n_frames (int): Total number of frames to sample.
+        names (dict, optional): Class names of the model, written to data.yaml.
+
+    Returns:
+        str: output_dir.
+    """
+    images_dir = os.path.join(output_dir, "images")
+    os.makedirs(images_dir, exist_ok=True)
+    per_video = max(1, n_frames // max(1, len(video_paths)))
+    n_written = 0
+    for video_path in video_paths:
+        reader = VideoReader(video_path, prefetch=0)
+        if reader.n_frames <= 0:
+            continue
+        for frame_idx in np.linspace(0, reader.n_frames - 1, num=min(per_video, reader.n_frames)).astype(int):
+            frame = reader.read_frame(int(frame_idx))
+            if frame is not None:
+                cv2.imwrite(os.path.join(images_dir, f"{n_written:05d}.jpg"), frame)
+                n_written += 1
+    if n_written == 0:
+        raise ValueError(f"No calibration frames could be read from {video_paths}")
+
+    # Images without labels are enough for calibration, JSON is valid YAML
+    with open(os.path.join(output_dir, "data.yaml"), "w") as f:
+        json.dump({"path": os.path.abspath(output_dir), "train": "images", "val": "images", "names": names or {0: "object"}}, f)
+    return output_dir
+
+def quantize_onnx(fp32_path, int8_path, calibration_dir, imgsz=640):
+    """Statically quantize an ONNX model to INT8 (QDQ, per-channel weights) with activations calibrated on calibration_dir."""
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    image_paths = sorted(os.path.join(calibration_dir, "images", name) for name in os.listdir(os.path.join(calibration_dir, "images")))
+    input_name = onnx.load(fp32_path, load_external_data=False).graph.input[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter(image_paths)
+
+        def get_next(self):
+            path = next(self.paths, None)
+            return None if path is None else {input_name: letterbox_frame(cv2.imread(path), imgsz)}
+
+    quantize_static(fp32_path, int8_path, FrameReader(), quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+
+    # ultralytics reads class names, stride and image size from the model metadata, which quantization drops
+    fp32_model, int8_model = onnx.load(fp32_path), onnx.load(int8_path)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, int8_path)
+
+class InferenceBackend():
+    def __init__(self, name="torch", precision="fp32", imgsz=640, calibration_videos=None, calibration_frames=200, export_dir=DEFAULT_EXPORT_DIR):
+        """
+        Runtime the YOLO models run on: PyTorch eager, or weights exported to ONNX Runtime or OpenVINO, in FP32 or INT8.
+
+        Exported models keep the ultralytics predict/track interface, so trackers use them unchanged. Exports are
+        cached in export_dir by weights file, runtime, precision and image size and only built on first use.
+
+        Args:
+            name (str): "torch", "onnx" or "openvino".
+            precision (str): "fp32" or "int8". INT8 needs calibration_videos, which are part of its export cache key.
+            imgsz (int): Image size the model is exported at (exports accept other sizes, e.g. ball search crops).
+            calibration_videos (list, optional): Our own footage that INT8 activations are calibrated on.
+            calibration_frames (int): Number of frames sampled from calibration_videos.
+            export_dir (str): Directory caching exported models.
+        """
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown backend {name!r}, expected one of {BACKENDS}")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISIONS}")
+        if name == "torch" and precision != "fp32":
+            raise ValueError("The torch backend only runs in fp32, export to onnx or openvino for int8")
+        self.name = name
+        self.precision = precision
+        self.imgsz = imgsz
+        self.calibration_videos = calibration_videos or []
+        self.calibration_frames = calibration_frames
+        self.export_dir = export_dir
+
+    @classmethod
+    def parse(cls, spec, **kwargs):
+        """Create a backend from a "name" or "name:precision" string, e.g. "openvino:int8"."""
+        name, _, precision = spec.partition(":")
+        return cls(name, precision or "fp32", **kwargs)
+
+    def __str__(self):
+        return f"{self.name}:{self.precision}"
+
+    @property
+    def key(self):
+        return self.name, self.precision, self.imgsz, self.calibration_key # an INT8 model is a different model per calibration set
+
+    @property
+    def calibration_key(self):
+        """Hash of the calibration footage (paths, sizes and modification times) and frame count, None unless INT8."""
+        if self.precision != "int8":
+            return None
+        fields = []
+        for path in self.calibration_videos:
+            stat = os.stat(path)
+            fields.append(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}")
+        fields.append(str(self.calibration_frames))
+        return hashlib.sha256("|".join(fields).encode()).hexdigest()[:12]
+
+    @property
+    def params(self):
+        """Parameters that change the detections, added to the trackers' detection cache key."""
+        if self.name == "torch":
+            return {}
+        params = {"backend": self.name, "precision": self.precision, "imgsz": self.imgsz}
+        if self.precision == "int8": # INT8 detections depend on the frames the activations were calibrated on
+            params["calibration"] = self.calibration_key
+        return params
+
+    def export_path(self, model_path):
+        stat = os.stat(model_path)
+        weights = hashlib.sha256(f"{os.path.abspath(model_path)}|{stat.st_size}|{stat.st_mtime_ns}".encode()).hexdigest()[:12] # re-exported if the weights change
+        stem = os.path.splitext(os.path.basename(model_path))[0]
+        calibration = f"_{self.calibration_key}" if self.precision == "int8" else "" # re-exported if the calibration set changes
+        suffix = ".onnx" if self.name == "onnx" else "_openvino_model" # ultralytics picks the runtime from the name
+        return os.path.join(self.export_dir, f"{stem}_{weights}_{self.imgsz}_{self.precision}{calibration}{suffix}")
+
+    def calibration_dir(self, model_path, names):
+        if not self.calibration_videos:
+            raise ValueError(f"INT8 export of {model_path} needs calibration_videos (frames of our own footage)")
+        calibration_dir = os.path.join(self.export_dir, f"calibration_{self.calibration_key}")
+        if not os.path.exists(os.path.join(calibration_dir, "data.yaml")):
+            build_calibration_set(self.calibration_videos, calibration_dir, self.calibration_frames, names)
+        return calibration_dir
+
+    def export(self, model_path):
+        """Return the path of the model exported for this backend, exporting it on first use."""
+        if self.name == "torch":
+            return model_path
+        export_path = self.export_path(model_path)
+        if os.path.exists(export_path):
+            return export_path
+
+        from ultralytics import YOLO
+        model = YOLO(model_path)
+        os.makedirs(self.export_dir, exist_ok=True)
+        # Dynamic shapes so batches and ball search crops can differ from imgsz
+        if self.name == "openvino":
+            data = os.path.join(self.calibration_dir(model_path, model.names), "data.yaml") if self.precision == "int8" else None
+            exported = model.export(format="openvino", imgsz=self.imgsz, dynamic=True, int8=self.precision == "int8", data=data)
+        else:
+            exported = model.export(format="onnx", imgsz=self.imgsz, dynamic=True, simplify=True)
+            if self.precision == "int8":
+                int8_path = f"{os.path.splitext(exported)[0]}_int8.onnx"
+                quantize_onnx(exported, int8_path, self.calibration_dir(model_path, model.names), self.imgsz)
+                os.remove(exported)
+                exported = int8_path
+        shutil.move(exported, export_path) # ultralytics exports next to the weights
+        return export_path
+
+    def load(self, model_path):
+        """Load model_path on this backend with the YOLO predict/track interface."""
+        from ultralytics import YOLO
+        if self.name == "torch":
+            return YOLO(model_path)
+        return YOLO(self.export(model_path), task="detect")
@@ -0,0 +1,211 @@
+import time
+import pickle
+import cv2
+import numpy as np
+import sys
+sys.path.append("../")
+from utils import *
+from detection_io import *
+
+class KeyframePlayerTracker():
+    def __init__(self, player_tracker, keyframe_interval=5, motion_threshold=6.0, max_points_per_box=20):
+        """
+        Runs the player detector only on keyframes and carries boxes forward with sparse optical flow in between.
+
+        A keyframe is taken every keyframe_interval frames, or earlier when the mean absolute difference between
+        the (downscaled, grey) frame and the last keyframe exceeds motion_threshold. Between keyframes each box is
+        shifted by the median Lucas-Kanade flow of corner features inside it. Track IDs returned by the detector
+        on a keyframe are mapped back onto the propagated boxes they overlap, so IDs stay consistent.
+
+        Args:
+            player_tracker (PlayerTracker): Tracker used on keyframes.
+            keyframe_interval (int): Maximum number of frames between detector runs.
+            motion_threshold (float): Mean absolute grey level difference that forces a keyframe.
+            max_points_per_box (int): Maximum number of corner features tracked per box.
+        """
+        self.player_tracker = player_tracker
+        self.keyframe_interval = keyframe_interval
+        self.motion_threshold = motion_threshold
+        self.max_points_per_box = max_points_per_box
+        self.model_path = player_tracker.model_path
+        self.inference_params = dict(player_tracker.inference_params, keyframe_interval=keyframe_interval, motion_threshold=motion_threshold)
+        self.reset()
+
+    def reset(self):
+        self.prev_grey = None # grey version of the previous frame
+        self.keyframe_small = None # downscaled grey version of the last keyframe, for motion measurement
+        self.frames_since_keyframe = 0
+        self.player_dict = {} # boxes of the previous frame
+        self.id_map = {} # detector track ID -> ID reported to callers
+        self.next_id = 1 # lowest ID no box has been reported under
+        self.frames_processed = 0
+        self.keyframes = 0
+        self.detector_time = 0.0 # seconds spent in the detector
+        self.propagation_time = 0.0 # seconds spent in optical flow
+
+    def measure_motion(self, grey):
+        small = cv2.resize(grey, (grey.shape[1] // 8, grey.shape[0] // 8), interpolation=cv2.INTER_AREA)
+        if self.keyframe_small is None:
+            return small, float("inf")
+        return small, float(cv2.absdiff(small, self.keyframe_small).mean())
+
+    def propagate(self, grey):
+        """Shift each box of the previous frame by the median optical flow of the features inside it."""
+        propagated = {}
+        for track_id, bbox in self.player_dict.items():
+            x1, y1, x2, y2 = [int(round(v)) for v in bbox]
+            x1, y1 = max(x1, 0), max(y1, 0)
+            x2, y2 = min(x2, grey.shape[1]), min(y2, grey.shape[0])
+            if x2 - x1 < 4 or y2 - y1 < 4:
+                propagated[track_id] = bbox
+                continue
+
+            points = cv2.goodFeaturesToTrack(self.prev_grey[y1:y2, x1:x2], self.max_points_per_box, 0.01, 3)
+            if points is None:
+                propagated[track_id] = bbox
+                continue
+            points = points.reshape(-1, 1, 2) + np.array([x1, y1], dtype=np.float32) # crop to frame coordinates
+
+            next_points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_grey, grey, points, None, winSize=(15, 15), maxLevel=2)
+            back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(grey, self.prev_grey, next_points, None, winSize=(15, 15), maxLevel=2)
+            forward_backward_error = np.abs(back_points - points).reshape(-1, 2).max(axis=1)
+            good = (status.reshape(-1) == 1) & (back_status.reshape(-1) == 1) & (forward_backward_error < 1.0) # drop points that do not flow back to where they started
+            if good.sum() < 3: # too few features to trust, keep the box where it was
+                propagated[track_id] = bbox
+                continue
+
+            dx, dy = np.median((next_points - points).reshape(-1, 2)[good], axis=0)
+            propagated[track_id] = [bbox[0] + float(dx), bbox[1] + float(dy), bbox[2] + float(dx), bbox[3] + float(dy)]
+
+        return propagated
+
+    def remap_ids(self, player_dict):
+        """Report detector IDs under the IDs of the propagated boxes they overlap, never two boxes under one ID."""
+        matched = match_track_ids([self.player_dict], [player_dict], min_iou=0.3) # one-to-one, best overlap first
+        taken = set(matched.values())
+        remapped = {}
+        for track_id, bbox in player_dict.items():
+            reported_id = matched.get(track_id)
+            if reported_id is None: # no propagated box to inherit from, keep the ID this detector ID had before
+                reported_id = self.id_map.get(track_id, track_id)
+                if reported_id in taken: # already another player's this frame
+                    reported_id = self.next_id
+                taken.add(reported_id)
+            self.id_map[track_id] = reported_id
+            self.next_id = max(self.next_id, reported_id + 1)
+            remapped[reported_id] = bbox
+        return remapped
+
+    def detect_frame(self, frame, imgsz=None):
+        grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small, motion = self.measure_motion(grey)
+
+        if self.frames_since_keyframe + 1 >= self.keyframe_interval or motion > self.motion_threshold or self.prev_grey is None:
+            start_time = time.perf_counter()
+            detected = self.player_tracker.detect_frame(frame, imgsz)
+            self.detector_time += time.perf_counter() - start_time
+
+            if self.prev_grey is not None: # IoU against where the previous boxes would be now
+                self.player_dict = self.propagate(grey)
+            player_dict = self.remap_ids(detected)
+            self.keyframe_small = small
+            self.frames_since_keyframe = 0
+            self.keyframes += 1
+        else:
+            start_time = time.perf_counter()
+            player_dict = self.propagate(grey)
+            self.propagation_time += time.perf_counter() - start_time
+            self.frames_since_keyframe += 1
+
+        self.prev_grey = grey
+        self.player_dict = player_dict
+        self.frames_processed += 1
+
+        return player_dict
+
+    def detect_batch(self, frames):
+        return [self.detect_frame(frame) for frame in frames] # keyframe decisions depend on the previous frame
+
+    def create_cache(self, video_path, cache_dir="./tracker_stubs/cache", chunk_size=500):
+        return DetectionCache(cache_dir, video_path, self.model_path, self.inference_params, chunk_size) # keyed by video, weights and params
+
+    def detect_frames(self, frames, read_from_stub=False, stub_path=None, batch_size=1, cache=None):
+        player_detections = []
+
+        if read_from_stub and stub_path is not None:
+            with open(stub_path, "rb") as f:
+                player_detections = pickle.load(f)
+            return player_detections
+
+        if cache is not None: # only run inference on chunks missing from the cache
+            return list(cache.detect(frames, self.detect_batch, batch_size))
+
+        for batch in batch_frames(frames, batch_size): # frames still go through the detector one at a time, see detect_batch
+            player_detections.extend(self.detect_batch(batch))
+
+        if stub_path is not None:
+            with open(stub_path, "wb") as f:
+                pickle.dump(player_detections, f)
+
+        return player_detections
+
+    def cadence_stats(self):
+        """Return how often the detector ran and where the time went."""
+        return {
+            "frames": self.frames_processed,
+            "keyframes": self.keyframes,
+            "keyframe_fraction": self.keyframes / self.frames_processed if self.frames_processed else 0.0,
+            "detector_time": self.detector_time,
+            "propagation_time": self.propagation_time,
+        }
+
+    def draw_bounding_box(self, frame, player_dict):
+        return self.player_tracker.draw_bounding_box(frame, player_dict)
+
+    def draw_bounding_boxes(self, video_frames, player_detections):
+        return self.player_tracker.draw_bounding_boxes(video_frames, player_detections)
+
+def compare_cadence(video_frames, full_rate_tracker, cadence_tracker):
+    """
+    Run full-rate detection and keyframe cadence side by side and report time saved against box drift.
+
+    Args:
+        video_frames (iterable): Frames in video order.
+        full_rate_tracker (PlayerTracker): Tracker run on every frame, used as reference.
+        cadence_tracker (KeyframePlayerTracker): Tracker running the detector on keyframes only.
+
+    Returns:
+        dict: Detector time for both modes, the fraction of detector time saved, and the mean/95th percentile
+            centre drift (pixels) and mean IoU of cadence boxes against the full-rate boxes they match.
+    """
+    full_rate_time = 0.0
+    drifts, ious = [], []
+    for frame in video_frames:
+        start_time = time.perf_counter()
+        reference = full_rate_tracker.detect_frame(frame)
+        full_rate_time += time.perf_counter() - start_time
+
+        cadence = cadence_tracker.detect_frame(frame)
+        if len(reference) == 0 or len(cadence) == 0:
+            continue
+
+        reference_boxes, cadence_boxes = list(reference.values()), list(cadence.values())
+        frame_ious = measure_ious(reference_boxes, cadence_boxes)
+        reference_centres, cadence_centres = get_bbox_centres(reference_boxes), get_bbox_centres(cadence_boxes)
+        for row, col in match_greedy(frame_ious, min_score=0.1): # match by overlap, IDs differ between the two runs
+            ious.append(frame_ious[row, col])
+            drifts.append(measure_abs_distance(reference_centres[row], cadence_centres[col]))
+
+    stats = cadence_tracker.cadence_stats()
+    cadence_time = stats["detector_time"] + stats["propagation_time"]
+    return {
+        "frames": stats["frames"],
+        "keyframes": stats["keyframes"],
+        "full_rate_detector_time": full_rate_time,
+        "cadence_detector_time": stats["detector_time"],
+        "cadence_propagation_time": stats["propagation_time"],
+        "time_saved": 1 - cadence_time / full_rate_time if full_rate_time > 0 else 0.0,
+        "mean_drift": float(np.mean(drifts)) if drifts else 0.0,
+        "p95_drift": float(np.percentile(drifts, 95)) if drifts else 0.0,
+        "mean_iou": float(np.mean(ious)) if ious else 0.0,
+    }
@@ -0,0 +1,40 @@
+# Function to load a YOLO model, ultralytics (and torch) are only imported once a model is actually needed
+def load_model(model_path, backend=None):
+    if backend is not None: # exported ONNX Runtime / OpenVINO model, see InferenceBackend
+        return backend.load(model_path)
+    from ultralytics import YOLO
+    return YOLO(model_path)
+
+# Function to clear the state model.track keeps between calls, so a reused model starts a new video with fresh IDs
+def reset_model_state(model):
+    predictor = getattr(model, "predictor", None)
+    for tracker in getattr(predictor, "trackers", None) or []:
+        tracker.reset()
+
+class ModelCache():
+    def __init__(self, loader=load_model):
+        """
+        Keeps loaded models by path so jobs run in the same process (e.g. a model worker) don't reload the weights.
+
+        Args:
+            loader (callable): Loads a model from its path and InferenceBackend (or None).
+        """
+        self.loader = loader
+        self.models = {}
+        self.hits = 0 # models served without loading
+        self.loads = 0
+
+    def get(self, model_path, backend=None):
+        """Return the model for model_path on a backend, loading it on first use and resetting its tracker state on reuse."""
+        key = (model_path, backend.key if backend is not None else None)
+        model = self.models.get(key)
+        if model is None:
+            model = self.models[key] = self.loader(model_path, backend)
+            self.loads += 1
+        else:
+            reset_model_state(model)
+            self.hits += 1
+        return model
+
+    def clear(self):
+        self.models.clear()
@@ -1,32 +1,55 @@
-from ultralytics import YOLO
 import cv2
 import pickle
+import numpy as np
 import sys
 sys.path.append("../")
 from utils import *
+from detection_io import *
+from .model_cache import load_model
 
 class PlayerTracker():
-    def __init__(self, model_path):
-        self.model = YOLO(model_path) # load player tracker model from path
-
-    def detect_frame(self, frame):
-        results = self.model.track(frame, persist=True)[0] # run object detection on the frame
-        id_name_dict = results.names # get the class names from the model
-
-        player_dict = {}
-        for box in results.boxes: # iterate through each detected box
-            if box.id is None:  # Check if track ID exists
-                continue  # Skip this box if no ID is assigned
-            track_id = int(box.id.tolist()[0]) # get the track id of the object
-            result = box.xyxy.tolist()[0] # get the bounding box coordinates
-            object_cls_id = box.cls.tolist()[0] # get the class id of the object
-            object_cls_name = id_name_dict[object_cls_id] # get the class name of the object
-            if object_cls_name == "person": # check if the detected object is a person
-                player_dict[track_id] = result # add the bounding box coordinates to the player dictionary
-
-        return player_dict
+    def __init__(self, model_path, model=None, metrics=None, backend=None):
+        self.model = model if model is not None else load_model(model_path, backend) # load player tracker model from path unless one is given
+        self.metrics = metrics # optional Metrics for inference and conversion timings
+        self.model_path = model_path
+        self.classes = [class_id for class_id, name in self.model.names.items() if name == "person"] or None # only person boxes are run through NMS and the tracker
+        self.inference_params = {"method": "track", "persist": True, "classes": self.classes} # parameters that change the detections, part of the cache key
+        if backend is not None: # optional InferenceBackend (ONNX Runtime / OpenVINO, FP32 / INT8)
+            self.inference_params.update(backend.params)
+
+    def detect_frame(self, frame, imgsz=None):
+        size = {"imgsz": imgsz} if imgsz is not None else {} # smaller input size when running behind real time
+        with time_stage(self.metrics, "player_inference"):
+            results = self.model.track(frame, persist=True, classes=self.classes, **size)[0] # run object detection on the frame
+
+        with time_stage(self.metrics, "player_conversion"):
+            return self.convert_results(results)
+
+    def detect_batch(self, frames):
+        with time_stage(self.metrics, "player_inference"):
+            results = self.model.track(list(frames), persist=True, classes=self.classes) # run object detection on all frames in one call, tracker updates in frame order
+
+        with time_stage(self.metrics, "player_conversion"):
+            return [self.convert_results(frame_results) for frame_results in results]
+
+    def convert_results(self, results):
+        boxes = results.boxes
+        if boxes.id is None: # no tracked boxes in this frame
+            return {}
+
+        # Pull every box out in one transfer instead of one tolist() per box
+        track_ids = boxes.id.int().cpu().numpy().reshape(-1)
+        xyxy = boxes.xyxy.cpu().numpy().reshape(-1, 4)
+        class_ids = boxes.cls.int().cpu().numpy().reshape(-1)
+        person_ids = [class_id for class_id, name in results.names.items() if name == "person"]
+        is_person = np.isin(class_ids, person_ids) # the model call already filters classes, this keeps models that ignore it correct
+
+        return dict(zip(track_ids[is_person].tolist(), xyxy[is_person].tolist())) # track id -> [x1, y1, x2, y2]
     
-    def detect_frames(self, frames, read_from_stub=False, stub_path=None):
+    def create_cache(self, video_path, cache_dir="./tracker_stubs/cache", chunk_size=500):
+        return DetectionCache(cache_dir, video_path, self.model_path, self.inference_params, chunk_size) # keyed by video, weights and params
+
+    def detect_frames(self, frames, read_from_stub=False, stub_path=None, batch_size=1, cache=None):
         player_detections = []
 
         if read_from_stub and stub_path is not None:
@@ -34,9 +57,11 @@ class PlayerTracker():
                 player_detections = pickle.load(f)
             return player_detections
 
-        for frame in frames: # iterate through each video frame
-            player_dict = self.detect_frame(frame) # detect players in the frame
-            player_detections.append(player_dict) # append the player detections to the list
+        if cache is not None: # only run inference on chunks missing from the cache
+            return list(cache.detect(frames, self.detect_batch, batch_size))
+
+        for batch in batch_frames(frames, batch_size): # iterate through the video frames in batches
+            player_detections.extend(self.detect_batch(batch)) # detect players in the batch and append the detections to the list
 
         if stub_path is not None:
             with open(stub_path, "wb") as f:
@@ -45,26 +70,26 @@ class PlayerTracker():
         return player_detections
     
     def identify_players(self, court_keypoints, player_dict, n_players=2):
-        distances = []
-        for track_id, bbox in player_dict.items(): # iterate through each player detection
-            player_centre = get_bbox_centre(bbox) # get the centre of the player bounding box
+        track_ids = list(player_dict.keys())
+        if len(track_ids) == 0:
+            return []
 
-            min_distance = float("inf")
-            for i in range(0, len(court_keypoints), 2):
-                court_keypoint = (court_keypoints[i], court_keypoints[i+1]) # get the court keypoint
-                distance = measure_abs_distance(player_centre, court_keypoint) # calculate the distance between the player and the court keypoint
-                if distance < min_distance: # check if the distance is less than the minimum distance
-                    min_distance = distance # update the minimum distance
-            distances.append((track_id, min_distance)) # append the track id and distance to the list
+        player_centres = get_bbox_centres(list(player_dict.values())) # (N,2) centres of the player bounding boxes
+        distances = measure_abs_distances(player_centres, keypoints_to_array(court_keypoints)) # (N,K) distances from each player to each court keypoint
+        min_distances = distances.min(axis=1) # distance from each player to their closest court keypoint
 
-        distances.sort(key=lambda x: x[1]) # sort the distances in ascending order
-        chosen_players = [distances[i][0] for i in range(n_players)] # choose the n players with the smallest distances (singles=2, doubles=4)
+        order = np.argsort(min_distances, kind="stable") # sort the distances in ascending order
+        chosen_players = [track_ids[i] for i in order[:n_players]] # choose the n players with the smallest distances (singles=2, doubles=4)
 
         return chosen_players
     
     def select_identified_players_only(self, court_keypoints, player_detections, n_players=2):
+        if isinstance(player_detections, ColumnarDetections): # whole match filtered with a single mask
+            chosen_player = self.identify_players(court_keypoints, player_detections.frame_dict(0), n_players)
+            return player_detections.filter_track_ids(chosen_player)
+
         player_detections_first_frame = player_detections[0] # get player detections from the first frame
-        chosen_player = self.identify_players(court_keypoints, player_detections_first_frame, n_players) # choose players based on court keypoints
+        chosen_player = set(self.identify_players(court_keypoints, player_detections_first_frame, n_players)) # choose players based on court keypoints
         filtered_player_detections = []
         for player_dict in player_detections: # iterate through each player detection
             filtered_player_dict = {track_id: bbox for track_id, bbox in player_dict.items() if track_id in chosen_player} # filter out players that are not chosen
@@ -72,13 +97,18 @@ class PlayerTracker():
 
         return filtered_player_detections
     
+    def draw_bounding_box(self, frame, player_dict):
+        for track_id, bbox in player_dict.items(): # iterate through each player detection
+            x1, y1, x2, y2 = bbox # get the bounding box coordinates
+            cv2.putText(frame, f"Player ID {track_id}", (int(bbox[0]), int(bbox[1]-10)), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2) # add player ID text to the frame
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2) # draw bounding box around player
+
+        return frame
+
     def draw_bounding_boxes(self, video_frames, player_detections):
         output_video_frames = []
         for frame, player_dict in zip(video_frames, player_detections): # iterate through each frame and player detection
-            for track_id, bbox in player_dict.items(): # iterate through each player detection
-                x1, y1, x2, y2 = bbox # get the bounding box coordinates
-                cv2.putText(frame, f"Player ID {track_id}", (int(bbox[0]), int(bbox[1]-10)), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2) # add player ID text to the frame
-                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2) # draw bounding box around player
+            frame = self.draw_bounding_box(frame, player_dict) # draw the player bounding boxes on the frame
             output_video_frames.append(frame) # append the frame with bounding boxes to the output list
 
         return output_video_frames
\ No newline at end of file
@@ -1,2 +1,6 @@
+from .video_io import *
 from .video_utils import *
-from .bounding_box_utils import *
\ No newline at end of file
+from .bounding_box_utils import *
+from .overlay_utils import *
+from .metrics_utils import *
+from .avi_utils import *
\ No newline at end of file
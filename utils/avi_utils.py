@@ -0,0 +1,117 @@
+import io
+import os
+import struct
+
+AVIIF_KEYFRAME = 0x10 # idx1 flag of a packet decoding can start from
+AVI_MAX_SIZE = 0xFFFFFFFF # RIFF sizes are 32-bit, larger files need the OpenDML extension
+
+# Function to read the (fourcc, size, data offset) of every chunk between two file positions
+def _read_chunks(f, start, end):
+    chunks = []
+    f.seek(start)
+    while f.tell() + 8 <= end:
+        fourcc, size = struct.unpack("<4sI", f.read(8))
+        chunks.append((fourcc, size, f.tell()))
+        f.seek(size + (size & 1), 1) # chunks are padded to an even size
+    return chunks
+
+# Function to split an AVI file into its header list, its video packets (fourcc, offset, size) and their keyframe flags
+def _read_avi(path):
+    with open(path, "rb") as f:
+        riff, riff_size, form = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or form != b"AVI ":
+            raise ValueError(f"{path} is not an AVI file")
+        if os.path.getsize(path) > riff_size + 8:
+            raise ValueError(f"{path} is an OpenDML AVI (over 1 GB), which can't be joined by stream copy")
+
+        hdrl, movi, idx1 = None, None, None
+        for fourcc, size, offset in _read_chunks(f, 12, riff_size + 8):
+            f.seek(offset)
+            if fourcc == b"LIST":
+                list_type = f.read(4)
+                if list_type == b"hdrl":
+                    hdrl = f.read(size - 4)
+                elif list_type == b"movi":
+                    movi = (offset + 4, offset + size)
+            elif fourcc == b"idx1":
+                idx1 = f.read(size)
+        if hdrl is None or movi is None or idx1 is None:
+            raise ValueError(f"{path} has no header, packet list or idx1 index")
+
+        packets = [(fourcc, offset, size) for fourcc, size, offset in _read_chunks(f, *movi) if fourcc[2:] in (b"dc", b"db")]
+    keyframes = [flags & AVIIF_KEYFRAME != 0 for fourcc, flags, _, _ in struct.iter_unpack("<4sIII", idx1) if fourcc[2:] in (b"dc", b"db")]
+    if len(keyframes) != len(packets):
+        raise ValueError(f"{path} has {len(packets)} video packets but {len(keyframes)} idx1 entries")
+    return hdrl, packets, keyframes
+
+# Function to find the main (avih), stream (strh) and format (strf) headers in the header list of a one-stream AVI
+def _stream_headers(hdrl, path):
+    f = io.BytesIO(hdrl)
+    chunks = {}
+    for fourcc, size, offset in _read_chunks(f, 0, len(hdrl)):
+        f.seek(offset)
+        if fourcc == b"LIST" and f.read(4) == b"strl":
+            for inner_fourcc, _, inner_offset in _read_chunks(f, offset + 4, offset + size):
+                chunks.setdefault(inner_fourcc, []).append(inner_offset)
+        else:
+            chunks.setdefault(fourcc, []).append(offset)
+    if len(chunks.get(b"strh", [])) != 1 or b"indx" in chunks or b"odml" in chunks:
+        raise ValueError(f"{path} must hold exactly one video stream without an OpenDML index")
+    return chunks[b"avih"][0], chunks[b"strh"][0], chunks[b"strf"][0]
+
+def concat_avi(segment_paths, output_path):
+    """
+    Join AVI files encoded with the same settings into one AVI by copying their packets, without decoding.
+
+    Each segment must start on a keyframe (a fresh encoder does), so the joined stream decodes across the joins.
+    The header of the first segment is kept with its frame counts and buffer size updated, and a new idx1 index
+    is written for the joined packets.
+
+    Args:
+        segment_paths (list): AVI files in order, each with one video stream.
+        output_path (str): Joined AVI file.
+
+    Returns:
+        int: Number of video packets (frames) written.
+    """
+    segments = [_read_avi(path) for path in segment_paths]
+    hdrl = bytearray(segments[0][0])
+    avih, strh, strf = _stream_headers(hdrl, segment_paths[0])
+    for path, (segment_hdrl, packets, keyframes) in zip(segment_paths[1:], segments[1:]):
+        _, segment_strh, segment_strf = _stream_headers(segment_hdrl, path)
+        same_codec = segment_hdrl[segment_strh:segment_strh + 32] == hdrl[strh:strh + 32] # type, fourcc, scale and rate
+        same_format = segment_hdrl[segment_strf:segment_strf + 40] == hdrl[strf:strf + 40] # frame size and codec
+        if not same_codec or not same_format:
+            raise ValueError(f"{path} is encoded differently from {segment_paths[0]}")
+        if packets and not keyframes[0]:
+            raise ValueError(f"{path} does not start on a keyframe")
+
+    n_packets = sum(len(packets) for _, packets, _ in segments)
+    max_packet = max((size for _, packets, _ in segments for _, _, size in packets), default=0)
+    movi_size = 4 + sum(8 + size + (size & 1) for _, packets, _ in segments for _, _, size in packets)
+    riff_size = 4 + 8 + 4 + len(hdrl) + 8 + movi_size + 8 + 16 * n_packets
+    if riff_size + 8 > AVI_MAX_SIZE:
+        raise ValueError(f"Joined video would be {riff_size + 8} bytes, over the AVI 1.0 limit")
+
+    struct.pack_into("<I", hdrl, avih + 16, n_packets) # dwTotalFrames
+    struct.pack_into("<I", hdrl, avih + 28, max_packet) # dwSuggestedBufferSize
+    struct.pack_into("<I", hdrl, strh + 32, n_packets) # dwLength
+    struct.pack_into("<I", hdrl, strh + 36, max_packet) # dwSuggestedBufferSize
+
+    index = []
+    with open(output_path, "wb") as out:
+        out.write(struct.pack("<4sI4s", b"RIFF", riff_size, b"AVI "))
+        out.write(struct.pack("<4sI4s", b"LIST", 4 + len(hdrl), b"hdrl"))
+        out.write(hdrl)
+        out.write(struct.pack("<4sI4s", b"LIST", movi_size, b"movi"))
+        movi_start = out.tell() - 4 # idx1 offsets are relative to the movi list type
+        for path, (_, packets, keyframes) in zip(segment_paths, segments):
+            with open(path, "rb") as f:
+                for (fourcc, offset, size), keyframe in zip(packets, keyframes):
+                    f.seek(offset - 8)
+                    chunk_offset = out.tell() - movi_start
+                    out.write(f.read(8 + size + (size & 1)))
+                    index.append(struct.pack("<4sIII", fourcc, AVIIF_KEYFRAME if keyframe else 0, chunk_offset, size))
+        out.write(struct.pack("<4sI", b"idx1", 16 * n_packets))
+        out.write(b"".join(index))
+    return n_packets
@@ -1,3 +1,5 @@
+import numpy as np
+
 # Get centre of box by averaging x coordinates and y coordinates
 def get_bbox_centre(bbox):
     x1, y1, x2, y2 = bbox
@@ -36,4 +38,95 @@ def get_height_of_bounding_box(bbox):
 
 # Calc coordinate difference between two points
 def measure_xy_distance(p1, p2):
-    return abs(p1[0] - p2[0]), abs(p1[1] - p2[1])
\ No newline at end of file
+    return abs(p1[0] - p2[0]), abs(p1[1] - p2[1])
+
+# Convert flat keypoints [x0, y0, x1, y1, ...] into a (K,2) array
+def keypoints_to_array(keypoints):
+    return np.asarray(keypoints, dtype=float).reshape(-1, 2)
+
+# Get centres of an (N,4) array of boxes in one call, truncated to int like get_bbox_centre
+def get_bbox_centres(bboxes):
+    bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+    return ((bboxes[:, 0:2] + bboxes[:, 2:4]) / 2).astype(int) # average x and y coordinates of each box
+
+# Calc straight line distance between every point in points_a (N,2) and every point in points_b (K,2), returns (N,K)
+def measure_abs_distances(points_a, points_b):
+    diff = np.asarray(points_a, dtype=float).reshape(-1, 1, 2) - np.asarray(points_b, dtype=float).reshape(1, -1, 2)
+    return np.sqrt((diff ** 2).sum(axis=2)) # Euclidean distance for each pair of points
+
+# Calc centre of bottom of each box in an (N,4) array to use as foot positions, returns (N,2)
+def get_foot_positions(bboxes):
+    bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+    foot_positions = np.empty((len(bboxes), 2), dtype=float)
+    foot_positions[:, 0] = ((bboxes[:, 0] + bboxes[:, 2]) / 2).astype(int) # x truncated to int like get_foot_position
+    foot_positions[:, 1] = bboxes[:, 3]
+    return foot_positions
+
+# Get closest keypoint index (by vertical distance) for each point in an (N,2) array
+def get_closest_keypoint_indices(points, keypoints, keypoint_indices):
+    keypoint_indices = np.asarray(keypoint_indices, dtype=int)
+    keypoint_ys = keypoints_to_array(keypoints)[keypoint_indices, 1]
+    distances = np.abs(np.asarray(points, dtype=float).reshape(-1, 2)[:, 1:2] - keypoint_ys.reshape(1, -1)) # (N,K) vertical distances
+    return keypoint_indices[np.argmin(distances, axis=1)] # first index wins ties, like get_closest_keypoint_index
+
+# Calc intersection over union between every box in bboxes_a (N,4) and every box in bboxes_b (M,4), returns (N,M)
+def measure_ious(bboxes_a, bboxes_b):
+    a = np.asarray(bboxes_a, dtype=float).reshape(-1, 1, 4)
+    b = np.asarray(bboxes_b, dtype=float).reshape(1, -1, 4)
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+# Greedily match rows to columns of a score matrix by highest score first, returns list of (row, col) pairs
+def match_greedy(scores, min_score):
+    scores = np.asarray(scores, dtype=float)
+    matches = []
+    if scores.size == 0:
+        return matches
+    used_rows, used_cols = set(), set()
+    for flat_idx in np.argsort(-scores, axis=None, kind="stable"): # best pairs first
+        row, col = np.unravel_index(flat_idx, scores.shape)
+        if scores[row, col] < min_score:
+            break
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        matches.append((int(row), int(col)))
+    return matches
+
+def match_track_ids(previous_detections, next_detections, min_iou=0.5):
+    """
+    Match the track IDs of two tracker runs by how much their boxes overlap on frames both runs processed.
+
+    Args:
+        previous_detections (list): Player dicts of the earlier run on the shared frames, with final IDs.
+        next_detections (list): Player dicts of the later run on the same frames, with its own IDs.
+        min_iou (float): Minimum mean IoU over the shared frames for two IDs to be the same player.
+
+    Returns:
+        dict: Track ID of the later run -> track ID of the earlier run.
+    """
+    previous_ids = sorted({track_id for player_dict in previous_detections for track_id in player_dict})
+    next_ids = sorted({track_id for player_dict in next_detections for track_id in player_dict})
+    if not previous_ids or not next_ids:
+        return {}
+
+    # Mean IoU of every pair of IDs over the shared frames, frames where either ID is missing count as 0
+    previous_index = {track_id: i for i, track_id in enumerate(previous_ids)}
+    next_index = {track_id: i for i, track_id in enumerate(next_ids)}
+    scores = np.zeros((len(previous_ids), len(next_ids)))
+    for previous_dict, next_dict in zip(previous_detections, next_detections):
+        if not previous_dict or not next_dict:
+            continue
+        ious = measure_ious(list(previous_dict.values()), list(next_dict.values()))
+        rows = [previous_index[track_id] for track_id in previous_dict]
+        cols = [next_index[track_id] for track_id in next_dict]
+        scores[np.ix_(rows, cols)] += ious
+    scores /= max(1, len(previous_detections))
+
+    return {next_ids[col]: previous_ids[row] for row, col in match_greedy(scores, min_score=min_iou)}
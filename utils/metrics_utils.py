@@ -0,0 +1,158 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+import numpy as np
+
+# Peak resident set size of this process in MB
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024 # bytes on macOS, KB on Linux
+    except ImportError: # Windows
+        import psutil
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, "peak_wset", memory_info.rss) / 1024 ** 2
+
+# Time a block into metrics, or do nothing when metrics is None
+def time_stage(metrics, name, frame_idx=None):
+    if metrics is None:
+        return contextlib.nullcontext()
+    return metrics.timer(name, frame_idx)
+
+class Metrics():
+    def __init__(self, trace=False):
+        """
+        Named timers, counters and gauges shared by every stage of a run.
+
+        Timers keep every duration so percentiles can be reported; counters add up; gauges keep their last and
+        maximum value (e.g. queue depth). All methods are thread-safe so pipeline workers can share one instance.
+
+        Args:
+            trace (bool): Also record every timed block as an event for a Chrome trace (chrome://tracing).
+        """
+        self.trace = trace
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+        self.timers = {} # name -> list of durations in seconds
+        self.counters = {} # name -> total
+        self.gauges = {} # name -> {"last": value, "max": value}
+        self.trace_events = []
+
+    @contextlib.contextmanager
+    def timer(self, name, frame_idx=None):
+        """Time the enclosed block under name, optionally tagged with the frame index in the trace."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_duration(name, time.perf_counter() - start, start, frame_idx)
+
+    def add_duration(self, name, seconds, start=None, frame_idx=None):
+        with self.lock:
+            self.timers.setdefault(name, []).append(seconds)
+            if self.trace and start is not None:
+                event = {
+                    "name": name,
+                    "ph": "X", # complete event with a duration
+                    "ts": (start - self.start_time) * 1e6,
+                    "dur": seconds * 1e6,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                }
+                if frame_idx is not None:
+                    event["args"] = {"frame": frame_idx}
+                self.trace_events.append(event)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        with self.lock:
+            gauge = self.gauges.setdefault(name, {"last": value, "max": value})
+            gauge["last"] = value
+            gauge["max"] = max(gauge["max"], value)
+
+    def sample_memory(self):
+        """Record the memory high-water mark so far."""
+        self.gauge("peak_rss_mb", peak_rss_mb())
+
+    def summary(self):
+        """Return totals and latency percentiles (ms) for every timer, plus counters and gauges."""
+        self.sample_memory()
+        with self.lock:
+            timers = {}
+            for name, durations in self.timers.items():
+                durations_ms = np.asarray(durations, dtype=float) * 1000
+                timers[name] = {
+                    "count": int(len(durations_ms)),
+                    "total_s": float(durations_ms.sum() / 1000),
+                    "mean_ms": float(durations_ms.mean()),
+                    "p50_ms": float(np.percentile(durations_ms, 50)),
+                    "p90_ms": float(np.percentile(durations_ms, 90)),
+                    "p99_ms": float(np.percentile(durations_ms, 99)),
+                    "max_ms": float(durations_ms.max()),
+                }
+            return {
+                "wall_time_s": time.perf_counter() - self.start_time,
+                "timers": timers,
+                "counters": dict(self.counters),
+                "gauges": {name: dict(gauge) for name, gauge in self.gauges.items()},
+            }
+
+    def to_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def to_prometheus(self, path, prefix="padel_vision"):
+        """Write the summary in the Prometheus text exposition format."""
+        summary = self.summary()
+        lines = [f"# TYPE {prefix}_stage_seconds summary"]
+        for name, timer in summary["timers"].items():
+            for quantile in ("50", "90", "99"):
+                lines.append(f'{prefix}_stage_seconds{{stage="{name}",quantile="0.{quantile}"}} {timer[f"p{quantile}_ms"] / 1000:.6f}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {timer["total_s"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {timer["count"]}')
+        for name, value in summary["counters"].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, gauge in summary["gauges"].items():
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {gauge['last']}")
+            lines.append(f"# TYPE {prefix}_{name}_max gauge")
+            lines.append(f"{prefix}_{name}_max {gauge['max']}")
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def to_chrome_trace(self, path):
+        """Write the recorded per-frame events in the Chrome trace format."""
+        with self.lock:
+            events = list(self.trace_events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def export(self, output_dir, name):
+        """Write {name}_metrics.json, {name}_metrics.prom and, when tracing, {name}_trace.json to output_dir."""
+        os.makedirs(output_dir, exist_ok=True)
+        self.to_json(os.path.join(output_dir, f"{name}_metrics.json"))
+        self.to_prometheus(os.path.join(output_dir, f"{name}_metrics.prom"))
+        if self.trace:
+            self.to_chrome_trace(os.path.join(output_dir, f"{name}_trace.json"))
+        print("Metrics saved to:", output_dir)
+
+# Yield items from an iterable, timing how long each one takes to produce
+def timed_iter(items, metrics, name):
+    iterator = iter(items)
+    frame_idx = 0
+    while True:
+        with time_stage(metrics, name, frame_idx):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+        frame_idx += 1
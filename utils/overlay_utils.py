@@ -0,0 +1,53 @@
+import numpy as np
+
+class StaticOverlay():
+    def __init__(self, frame_shape):
+        """
+        Overlay of drawings that never change between frames, rendered once and composited onto each frame.
+
+        Drawing functions are run once on a black and a white canvas. Pixels that come out the same on both are
+        fully covered, pixels that differ by less than the full range are partly covered (anti-aliased edges)
+        and the difference gives how much of the frame shows through. Compositing then blends only the covered
+        pixels, in one vectorized op over their flat byte indices.
+
+        Args:
+            frame_shape (tuple): Shape of the frames the overlay is applied to, (height, width, 3).
+        """
+        self.frame_shape = tuple(frame_shape)
+        self.canvas_low = np.zeros(self.frame_shape, dtype=np.uint8) # background 0
+        self.canvas_high = np.full(self.frame_shape, 255, dtype=np.uint8) # background 255
+        self.built = False
+
+    def add(self, draw_fn, *args, **kwargs):
+        """Run a drawing function (e.g. CourtDetector.draw_keypoints) on the overlay, called as draw_fn(image, *args)."""
+        draw_fn(self.canvas_low, *args, **kwargs)
+        draw_fn(self.canvas_high, *args, **kwargs)
+        self.built = False # rebuild the cached mask on next apply
+        return self
+
+    def build(self):
+        """Cache the covered byte indices, their colours and how much of the frame shows through each one."""
+        low = self.canvas_low.reshape(-1, 3)
+        background_weight = (self.canvas_high.reshape(-1, 3).astype(np.int16) - low).max(axis=1) # 0 fully covered, 255 untouched
+        pixel_indices = np.flatnonzero(background_weight < 255)
+
+        self.indices = (pixel_indices[:, None] * 3 + np.arange(3)).ravel() # flat byte indices of the covered pixels
+        self.colours = low[pixel_indices].astype(np.uint32).ravel() * 255 # colour already scaled by coverage, x255 fixed point
+        self.weights = np.repeat(background_weight[pixel_indices].astype(np.uint32), 3) # x255 fixed point
+
+        self.built = True
+        return self
+
+    def apply(self, frame):
+        """Composite the overlay onto the frame in place and return it."""
+        if not self.built:
+            self.build()
+        if frame.shape != self.frame_shape:
+            raise ValueError(f"Overlay built for frames of shape {self.frame_shape}, got {frame.shape}")
+
+        flat = frame.reshape(-1) # view for contiguous frames
+        flat[self.indices] = (self.colours + self.weights * flat[self.indices] + 127) // 255
+        if not np.shares_memory(flat, frame): # non-contiguous frame, reshape made a copy
+            frame[...] = flat.reshape(self.frame_shape)
+
+        return frame
@@ -0,0 +1,368 @@
+import os
+import json
+import queue
+import bisect
+import hashlib
+import threading
+import cv2
+from .metrics_utils import time_stage
+
+DEFAULT_INDEX_DIR = "./tracker_stubs/cache/video_index"
+
+_END = object() # marks the end of the frames passed between threads
+
+class _ThreadError():
+    def __init__(self, error):
+        self.error = error # exception raised on the worker thread, re-raised on the caller's
+
+# Function to read the fps, frame size and frame count an open capture reports, without reading any frame
+def capture_info(cap):
+    return {
+        "opened": cap.isOpened(),
+        "fps": cap.get(cv2.CAP_PROP_FPS) or 0.0,
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "n_frames": max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))),
+    }
+
+# Function to tell video files (which can be opened again) from cameras, pipes and URLs (which can't be rewound)
+def is_video_file(path):
+    return isinstance(path, str) and os.path.isfile(path)
+
+def probe_video(path):
+    """
+    Return the fps, frame size and frame count a video's container reports (the count may be approximate).
+
+    Opening a pipe or live source consumes the start of it, so only probe files this way; VideoReader probes
+    other sources with the capture it then decodes from.
+    """
+    cap = cv2.VideoCapture(path)
+    info = capture_info(cap)
+    cap.release()
+    return info
+
+class VideoIndex():
+    def __init__(self, n_frames, fps, keyframes, timestamps_ms):
+        """
+        Frame count, keyframe positions and presentation timestamps of a video file.
+
+        Built from one pass over the compressed packets (no decoding), so seeking to a frame can start from the
+        keyframe before it instead of decoding from the start of the video, and seconds can be mapped to frames.
+
+        Args:
+            n_frames (int): Exact number of frames.
+            fps (float): Frame rate reported by the container.
+            keyframes (list): Sorted indices of the frames decoding can start from.
+            timestamps_ms (list): Presentation timestamp of every frame in milliseconds.
+        """
+        self.n_frames = n_frames
+        self.fps = fps
+        self.keyframes = keyframes
+        self.timestamps_ms = timestamps_ms
+
+    @classmethod
+    def build(cls, path):
+        """Index a video by reading its packets without decoding them, returns None if the backend can't."""
+        cap = cv2.VideoCapture(path)
+        try:
+            if not cap.isOpened() or not cap.set(cv2.CAP_PROP_FORMAT, -1): # -1 returns raw packets instead of decoded frames
+                return None
+            fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+            keyframe_timestamps_ms, timestamps_ms = [], []
+            while cap.grab():
+                timestamps_ms.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+                if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                    keyframe_timestamps_ms.append(timestamps_ms[-1])
+        finally:
+            cap.release()
+        if not timestamps_ms:
+            return None
+        # Packets come in decode order, so with B-frames their timestamps aren't monotonic: frame i is the one shown
+        # at the i-th smallest timestamp, and a keyframe's frame index is the rank of its timestamp
+        timestamps_ms.sort()
+        keyframes = sorted({bisect.bisect_left(timestamps_ms, timestamp) for timestamp in keyframe_timestamps_ms})
+        return cls(len(timestamps_ms), fps, keyframes or [0], timestamps_ms)
+
+    @classmethod
+    def load_or_build(cls, path, cache_dir=DEFAULT_INDEX_DIR):
+        """Load the cached index of a video file, building and caching it on first use. None for streams/URLs."""
+        if not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        key = hashlib.sha256(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|presentation_order".encode()).hexdigest()[:24] # rebuilt if the file changes
+        index_path = os.path.join(cache_dir, f"{key}.json")
+        if os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                return cls(**json.load(f))
+
+        index = cls.build(path)
+        if index is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{index_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(index.to_dict(), f)
+            os.replace(tmp_path, index_path) # atomic, concurrent readers never see a partial file
+        return index
+
+    def to_dict(self):
+        return {"n_frames": self.n_frames, "fps": self.fps, "keyframes": self.keyframes, "timestamps_ms": self.timestamps_ms}
+
+    def keyframe_before(self, frame_idx):
+        """Return the last keyframe at or before frame_idx."""
+        return self.keyframes[max(0, bisect.bisect_right(self.keyframes, frame_idx) - 1)]
+
+    def frame_at_time(self, seconds):
+        """Return the index of the frame shown at the given time."""
+        return max(0, min(self.n_frames - 1, bisect.bisect_right(self.timestamps_ms, seconds * 1000) - 1))
+
+class VideoReader():
+    def __init__(self, path, scale=None, prefetch=8, index_cache_dir=DEFAULT_INDEX_DIR, metrics=None):
+        """
+        Video reader that decodes ahead on a background thread and seeks to any frame range.
+
+        Args:
+            path (str): Path or URL of the video.
+            scale (float, optional): Resize decoded frames by this factor (e.g. 0.5 for inference on smaller
+                frames). Coordinates found on scaled frames must be divided by scale to match the source.
+            prefetch (int): Number of frames decoded ahead of the consumer. 0 decodes on the calling thread.
+            index_cache_dir (str): Directory caching the keyframe/timestamp index of video files.
+            metrics (Metrics, optional): Collects decode timings and counts frames_dropped, frames of a video file's
+                range that could not be decoded (e.g. a corrupt packet ends decoding early).
+        """
+        self.path = path
+        self.scale = scale
+        self.prefetch = prefetch
+        self.index_cache_dir = index_cache_dir
+        self.metrics = metrics
+        self._index = None
+        self._index_loaded = False
+        self._cap = None # capture a non-file source was probed with, handed to the first decode
+
+        if is_video_file(path):
+            info = probe_video(path)
+        else: # a pipe or live source can't be opened twice without losing its first frames
+            self._cap = cv2.VideoCapture(path)
+            info = capture_info(self._cap)
+        self.opened = info["opened"]
+        self.fps = info["fps"] or 24.0 # some streams don't report a rate
+        self.width = info["width"] # source resolution, before scaling
+        self.height = info["height"]
+        self.reported_frames = info["n_frames"]
+
+    @property
+    def index(self):
+        """Keyframe/timestamp index of the video, None if it can't be built (e.g. streams)."""
+        if not self._index_loaded:
+            self._index = VideoIndex.load_or_build(self.path, self.index_cache_dir)
+            self._index_loaded = True
+        return self._index
+
+    @property
+    def n_frames(self):
+        """Exact frame count from the index when available, otherwise the count the container reports."""
+        return self.index.n_frames if self.index is not None else self.reported_frames
+
+    @property
+    def frame_size(self):
+        """(width, height) of the frames this reader yields."""
+        if self.scale is None:
+            return self.width, self.height
+        return int(round(self.width * self.scale)), int(round(self.height * self.scale))
+
+    def frame_at_time(self, seconds):
+        if self.index is not None:
+            return self.index.frame_at_time(seconds)
+        return int(seconds * self.fps)
+
+    def seek(self, cap, frame_idx):
+        """
+        Position an open capture so its next read returns frame_idx.
+
+        With an index the capture jumps to the keyframe before frame_idx and decodes forward from there, so a seek
+        costs up to one keyframe interval of decoding (timed as decode and counted as frames_grabbed). Without one
+        the backend seeks by CAP_PROP_POS_FRAMES, which decodes forward the same way but out of sight.
+        """
+        if frame_idx <= 0:
+            return
+        if self.index is None: # no index, let the backend seek
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            return
+        keyframe = self.index.keyframe_before(frame_idx)
+        if keyframe > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe) # a keyframe needs no earlier frames to decode
+        for grab_idx in range(keyframe, frame_idx): # decode forward to the exact frame without converting to BGR
+            with time_stage(self.metrics, "decode", grab_idx): # grab() still decodes, it only skips the copy out
+                grabbed = cap.grab()
+            if not grabbed:
+                break
+            if self.metrics is not None:
+                self.metrics.count("frames_grabbed")
+
+    def decode(self, start=0, end=None):
+        """Decode frames [start, end) on the calling thread."""
+        cap, self._cap = self._cap, None
+        if cap is None:
+            cap = cv2.VideoCapture(self.path)
+        try:
+            self.seek(cap, start)
+            frame_idx = start
+            count_dropped = self.metrics is not None and is_video_file(self.path) # a pipe or live source has no known length
+            if count_dropped:
+                self.metrics.count("frames_dropped", 0) # exported even when nothing is lost
+            while end is None or frame_idx < end:
+                with time_stage(self.metrics, "decode", frame_idx):
+                    ret, frame = cap.read() # ret=True if the frame is read correctly
+                    if ret and self.scale is not None:
+                        frame = cv2.resize(frame, self.frame_size, interpolation=cv2.INTER_AREA)
+                if not ret:
+                    if count_dropped: # frames the video has but the decoder couldn't return
+                        # the exact count only if seeking already loaded the index, never a packet pass in a timed run
+                        n_frames = self._index.n_frames if self._index_loaded and self._index is not None else self.reported_frames
+                        expected = min(end, n_frames) if end is not None else n_frames
+                        self.metrics.count("frames_dropped", max(0, expected - frame_idx))
+                    break
+                yield frame
+                frame_idx += 1
+        finally:
+            cap.release()
+
+    def read(self, start=0, end=None):
+        """
+        Yield frames [start, end) in order, decoded ahead on a background thread.
+
+        Args:
+            start (int): First frame to read.
+            end (int, optional): Frame after the last frame to read, None reads to the end of the video.
+
+        Yields:
+            numpy.ndarray: Frames in video order.
+        """
+        frames = self.decode(start, end)
+        if self.prefetch <= 0:
+            yield from frames
+            return
+
+        q = queue.Queue(maxsize=self.prefetch)
+        stop_event = threading.Event()
+
+        def put(item):
+            while not stop_event.is_set(): # retry so the worker can exit if the consumer stops early
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def worker():
+            try:
+                for frame in frames:
+                    if not put(frame):
+                        return
+                put(_END)
+            except Exception as e:
+                put(_ThreadError(e))
+            finally:
+                frames.close() # release the capture on the thread that used it
+
+        threading.Thread(target=worker, name="video_reader", daemon=True).start()
+        try:
+            while True:
+                item = q.get()
+                if item is _END:
+                    break
+                if isinstance(item, _ThreadError):
+                    raise item.error
+                yield item
+        finally:
+            stop_event.set() # release the worker if the consumer stopped early
+
+    def read_frame(self, frame_idx):
+        """Return a single frame, or None past the end of the video."""
+        return next(self.decode(frame_idx, frame_idx + 1), None)
+
+    def __iter__(self):
+        return self.read()
+
+class VideoWriter():
+    def __init__(self, path, fps, frame_size=None, fourcc="MJPG", queue_size=16, metrics=None):
+        """
+        Video writer that encodes on a background thread.
+
+        Args:
+            path (str): Output video path.
+            fps (float): Frame rate of the output, normally the source video's.
+            frame_size (tuple, optional): (width, height) of the output, normally the source video's. Defaults to
+                the size of the first frame; frames of another size are resized to it.
+            fourcc (str): Four-character codec code.
+            queue_size (int): Number of frames waiting to be encoded. 0 encodes on the calling thread.
+            metrics (Metrics, optional): Collects encoding timings and counts frames_dropped, frames left unwritten
+                after an encoding error.
+        """
+        self.path = path
+        self.fps = fps
+        self.frame_size = frame_size
+        self.fourcc = fourcc
+        self.metrics = metrics
+        self.out = None
+        self.frame_idx = 0
+        self.error = None
+        self.queue = None
+        self.thread = None
+        if queue_size > 0:
+            self.queue = queue.Queue(maxsize=queue_size)
+            self.thread = threading.Thread(target=self._worker, name="video_writer", daemon=True)
+            self.thread.start()
+
+    @classmethod
+    def like(cls, reader, path, fourcc="MJPG", queue_size=16, metrics=None):
+        """Create a writer with the fps and resolution of the video a VideoReader reads."""
+        return cls(path, reader.fps, (reader.width, reader.height), fourcc, queue_size, metrics)
+
+    def _encode(self, frame):
+        if self.out is None: # frame size is only known once the first frame arrives
+            if self.frame_size is None:
+                self.frame_size = (frame.shape[1], frame.shape[0])
+            self.out = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, self.frame_size)
+        if (frame.shape[1], frame.shape[0]) != tuple(self.frame_size): # OpenCV silently drops frames of another size
+            frame = cv2.resize(frame, tuple(self.frame_size), interpolation=cv2.INTER_AREA)
+        with time_stage(self.metrics, "encoding", self.frame_idx):
+            self.out.write(frame)
+        self.frame_idx += 1
+
+    def _worker(self):
+        while True:
+            frame = self.queue.get()
+            if frame is _END:
+                return
+            if self.error is None: # keep draining after an error so write() never blocks
+                try:
+                    self._encode(frame)
+                except Exception as e:
+                    self.error = e
+            if self.error is not None and self.metrics is not None:
+                self.metrics.count("frames_dropped")
+
+    def write(self, frame):
+        if self.error is not None:
+            raise self.error
+        if self.queue is None:
+            self._encode(frame)
+        else:
+            self.queue.put(frame)
+
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(_END)
+            self.thread.join()
+            self.thread = None
+        if self.out is not None:
+            self.out.release()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,22 +1,55 @@
 import cv2
+from .video_io import VideoReader, VideoWriter
 
 # Function to read video and get frames
 def read_video(path):
-    cap = cv2.VideoCapture(path)
-    frames = []
-    while True: # runs until the video is over
-        ret, frame = cap.read() # ret=True if the frame is read correctly
-        if not ret:
-            break
-        frames.append(frame)
-    cap.release
-    return frames
-
-# Function to save video
-def save_video(output_video_frames, output_video_path):
-    fourcc = cv2.VideoWriter_fourcc(*'MJPG')
-    out = cv2.VideoWriter(output_video_path, fourcc, 24, (output_video_frames[0].shape[1], output_video_frames[0].shape[0]))
-    for frame in output_video_frames:
-        out.write(frame)
-    out.release()
-    print("Video saved to:", output_video_path)
\ No newline at end of file
+    return list(VideoReader(path).read()) # the reader releases its capture once the video is over
+
+# Function to save video at the frame rate of its source
+def save_video(output_video_frames, output_video_path, fps=24):
+    with VideoWriter(output_video_path, fps) as out:
+        for frame in output_video_frames:
+            out.write(frame)
+    print("Video saved to:", output_video_path)
+
+# Function to read video one frame at a time instead of loading every frame into memory
+def read_video_stream(path, metrics=None):
+    return VideoReader(path, metrics=metrics).read()
+
+# Function to read frames one at a time from an already opened capture, releasing it at the end
+def read_capture_stream(cap):
+    try:
+        while True: # runs until the video is over
+            ret, frame = cap.read() # ret=True if the frame is read correctly
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+# Function to count the frames of a video, exact for files (from the cached keyframe index), 0 if unknown for some streams
+def count_video_frames(path):
+    return VideoReader(path).n_frames
+
+# Function to read frames [start, end) of a video one at a time, seeking to start instead of decoding from the beginning
+def read_video_range(path, start, end=None):
+    return VideoReader(path).read(start, end)
+
+# Function to save video from any iterable of frames, writing each frame as it arrives
+def save_video_stream(output_video_frames, output_video_path, metrics=None, fps=24):
+    with VideoWriter(output_video_path, fps, metrics=metrics) as out: # encodes on a background thread
+        for frame in output_video_frames:
+            out.write(frame)
+    print("Video saved to:", output_video_path)
+
+# Function to group frames into lists of batch_size for batched model inference
+def batch_frames(frames, batch_size):
+    batch_size = max(1, int(batch_size))
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch: # final partial batch
+        yield batch